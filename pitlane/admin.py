@@ -1,26 +1,104 @@
+import re
+
 from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+
 from .models import (
     Customer, Vehicle, Mechanic, Part, Service,
     Order, OrderStatus, OrderService, OrderPart,
     Invoice, Payment, Notification
 )
 
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Counts an unfiltered changelist of a big PostgreSQL table with the
+    planner's row estimate (``pg_class.reltuples``, kept current by autovacuum)
+    instead of a ``COUNT(*)`` that reads the whole table. Filtered changelists,
+    small tables and other databases are counted exactly.
+    """
+
+    estimate_above = 100_000
+
+    @cached_property
+    def count(self):
+        if not self.object_list.query.where:
+            estimate = self.estimate()
+            if estimate is not None and estimate > self.estimate_above:
+                return estimate
+        return super().count
+
+    def estimate(self):
+        connection = connections[self.object_list.db]
+        if connection.vendor != "postgresql":
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT reltuples FROM pg_class WHERE oid = %s::regclass", [self.object_list.model._meta.db_table])
+            row = cursor.fetchone()
+        # -1 until the table has been analyzed once
+        return int(row[0]) if row and row[0] >= 0 else None
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """
+    Admin for tables with millions of rows: estimated counts and no second
+    ``COUNT(*)`` for the "x of y selected" total.
+
+    ``search_fields`` are complete lookups on indexed columns, mostly prefix
+    matches on the normalized columns of pitlane.search, instead of the
+    ``icontains`` the admin uses by default and no index can serve. Every
+    word of the search has to match one of them; ``search_values`` maps a
+    lookup to the function preparing a word for it (lower case by default),
+    which returns None if the word cannot match.
+    """
+
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    search_values = {}
+
+    def get_search_results(self, request, queryset, search_term):
+        for word in search_term.split():
+            conditions = []
+            for lookup in self.get_search_fields(request):
+                value = self.search_values.get(lookup, str.lower)(word)
+                if value is not None:
+                    conditions.append((lookup, value))
+            queryset = queryset.filter(Q.create(conditions, connector=Q.OR)) if conditions else queryset.none()
+        return queryset, False
+
+
+def as_id(word):
+    # bigint range
+    return int(word) if word.isdigit() and len(word) < 19 else None
+
+
+def as_phone_digits(word):
+    digits = re.sub(r"\D", "", word)
+    return digits if len(digits) >= 3 else None
+
+
 @admin.register(Customer)
-class CustomerAdmin(admin.ModelAdmin):
+class CustomerAdmin(LargeTableAdmin):
     list_display = ("first_name", "last_name", "email", "phone", "address", "date_joined")
-    search_fields = ("first_name", "last_name", "email", "phone", "address")
+    search_fields = ("last_name_lower__startswith", "first_name_lower__startswith", "email_lower__startswith", "phone_digits__startswith")
+    search_values = {"phone_digits__startswith": as_phone_digits}
     list_filter = ("date_joined",)
 
 @admin.register(Vehicle)
-class VehicleAdmin(admin.ModelAdmin):
+class VehicleAdmin(LargeTableAdmin):
     list_display = ("brand", "model", "year", "vin", "customer")
-    search_fields = ("brand", "model", "vin", "customer__name")
+    list_select_related = ("customer",)
+    search_fields = ("vin_upper__startswith", "brand_lower__startswith", "model_lower__startswith", "customer__last_name_lower__startswith")
+    search_values = {"vin_upper__startswith": str.upper}
     list_filter = ("brand", "year")
     autocomplete_fields = ("customer",)
 
 @admin.register(Mechanic)
 class MechanicAdmin(admin.ModelAdmin):
-    list_display = ("first_name", "last_name", "email", "phone", "hire_date", "is_active")
+    list_display = ("first_name", "last_name", "email", "phone", "hire_date", "is_active", "open_orders", "open_hours", "capacity_hours")
     search_fields = ("first_name", "last_name", "email", "phone")
     list_filter = ("is_active", "hire_date")
 
@@ -32,7 +110,7 @@ class PartAdmin(admin.ModelAdmin):
 
 @admin.register(Service)
 class ServiceAdmin(admin.ModelAdmin):
-    list_display = ("name", "price")
+    list_display = ("name", "price", "estimated_hours")
     search_fields = ("name",)
     list_filter = ("name",)
 
@@ -47,34 +125,51 @@ class OrderPartInline(admin.TabularInline):
     autocomplete_fields = ("part",)
 
 @admin.register(Order)
-class OrderAdmin(admin.ModelAdmin):
+class OrderAdmin(LargeTableAdmin):
     list_display = ("id", "customer", "vehicle", "mechanic", "order_date", "is_closed")
-    search_fields = ("customer__name", "vehicle__vin", "mechanic__last_name")
+    list_select_related = ("customer", "vehicle", "mechanic")
+    search_fields = ("id", "customer__last_name_lower__startswith", "vehicle__vin_upper__startswith", "mechanic__last_name__istartswith")
+    search_values = {"id": as_id, "vehicle__vin_upper__startswith": str.upper, "mechanic__last_name__istartswith": str}
     list_filter = ("is_closed", "order_date")
+    date_hierarchy = "order_date"
+    ordering = ("-order_date", "-id")
     autocomplete_fields = ("customer", "vehicle", "mechanic")
     inlines = [OrderServiceInline, OrderPartInline]
 
 @admin.register(OrderStatus)
-class OrderStatusAdmin(admin.ModelAdmin):
+class OrderStatusAdmin(LargeTableAdmin):
     list_display = ("order", "status", "timestamp", "note")
-    search_fields = ("order__id", "status")
+    list_select_related = ("order__customer", "order__vehicle")
+    search_fields = ("order_id", "status")
+    search_values = {"order_id": as_id}
     list_filter = ("status", "timestamp")
+    date_hierarchy = "timestamp"
+    ordering = ("-timestamp", "-id")
 
 @admin.register(Invoice)
-class InvoiceAdmin(admin.ModelAdmin):
+class InvoiceAdmin(LargeTableAdmin):
     list_display = ("id", "order", "issue_date", "due_date", "total_amount", "is_paid")
-    search_fields = ("order__id",)
+    list_select_related = ("order__customer", "order__vehicle")
+    search_fields = ("id", "order_id")
+    search_values = {"id": as_id, "order_id": as_id}
     list_filter = ("is_paid", "issue_date", "due_date")
+    date_hierarchy = "due_date"
+    ordering = ("-due_date", "-id")
 
 @admin.register(Payment)
-class PaymentAdmin(admin.ModelAdmin):
+class PaymentAdmin(LargeTableAdmin):
     list_display = ("invoice", "payment_date", "amount", "payment_method")
-    search_fields = ("invoice__id", "payment_method")
+    list_select_related = ("invoice",)
+    search_fields = ("invoice_id", "payment_method")
+    search_values = {"invoice_id": as_id}
     list_filter = ("payment_method", "payment_date")
+    date_hierarchy = "payment_date"
+    ordering = ("-payment_date", "-id")
 
 @admin.register(Notification)
-class NotificationAdmin(admin.ModelAdmin):
+class NotificationAdmin(LargeTableAdmin):
     list_display = ("message", "timestamp")
-    search_fields = ("message",)
+    search_fields = ("message__icontains",)
     list_filter = ("timestamp",)
-
+    date_hierarchy = "timestamp"
+    ordering = ("-timestamp", "-id")
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class PitlaneConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'pitlane'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,76 @@
+"""
+Read-through cache for the catalog endpoints (parts, services, mechanics).
+
+Every catalog has a version token in the cache. Saving or deleting a row of
+the catalog replaces the token once the transaction has committed (see
+signals.py), which makes all cached responses of that catalog unreachable at
+once. The token is also part of the ETag, so clients that send
+``If-None-Match`` get a 304 without a body as long as the catalog did not
+change - without touching the database.
+"""
+import hashlib
+import uuid
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.http import parse_etags
+
+CATALOGS = ("parts", "services", "mechanics")
+
+
+def _version_key(catalog):
+    return f"catalog:{catalog}:version"
+
+
+def catalog_version(catalog):
+    """Returns the current version token of a catalog, creating one if it is missing."""
+    version = cache.get(_version_key(catalog))
+    if version is None:
+        # tokens are never reused, so an evicted version cannot revive a stale ETag
+        cache.add(_version_key(catalog), uuid.uuid4().hex, timeout=None)
+        version = cache.get(_version_key(catalog))
+    return version
+
+
+def invalidate_catalogs(catalogs):
+    """Drops every cached response of the given catalogs."""
+    cache.set_many({_version_key(catalog): uuid.uuid4().hex for catalog in catalogs}, timeout=None)
+
+
+def cache_catalog(catalog):
+    """
+    View decorator (use via ninja's ``decorate_view``) that serves GET responses
+    of ``catalog`` from the cache and answers ``If-None-Match`` with 304.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method != "GET":
+                return view(request, *args, **kwargs)
+
+            fingerprint = f"{catalog_version(catalog)}:{request.get_full_path()}"
+            etag = '"%s"' % hashlib.md5(fingerprint.encode()).hexdigest()
+
+            if etag in parse_etags(request.headers.get("If-None-Match", "")):
+                response = HttpResponseNotModified()
+            else:
+                key = f"catalog:{catalog}:response:{etag}"
+                cached = cache.get(key)
+                if cached is not None:
+                    content, content_type = cached
+                    response = HttpResponse(content, content_type=content_type)
+                else:
+                    response = view(request, *args, **kwargs)
+                    if response.status_code != 200:
+                        return response
+                    cache.set(key, (response.content, response["Content-Type"]), settings.CATALOG_CACHE_TIMEOUT)
+
+            response["ETag"] = etag
+            response["Cache-Control"] = "no-cache"
+            return response
+
+        return wrapper
+
+    return decorator
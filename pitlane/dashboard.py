@@ -0,0 +1,196 @@
+"""
+Figures for the managers' dashboard, computed by the database.
+
+Current state (open orders per status, unpaid invoices) is read live through
+the partial indexes on ``Order`` and ``Invoice``, the open orders per mechanic
+from the counters on ``Mechanic`` (see workload.py). Daily figures
+(revenue, received and delivered orders, turnaround, parts used) come from
+``DailyRollup`` rows for every day that has one, and are aggregated live only
+for the days without one - usually just today. Without any rollups
+the whole range is aggregated live, so the table is an optimization only.
+
+``refresh_rollups`` (run by the ``refresh_dashboard_rollups`` command) writes
+the rollups of completed days with one grouped query per figure and an upsert.
+"""
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db.models import Count, Exists, F, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+from .models import DailyRollup, Invoice, Mechanic, Order, OrderPart, OrderStatus, Payment
+
+ZERO = Decimal("0.00")
+
+# Figures stored per day, in DailyRollup field order
+DAILY_FIELDS = ("revenue", "payments", "orders_received", "orders_delivered", "turnaround", "parts_used")
+
+# Days per upsert in refresh_rollups
+ROLLUP_CHUNK_DAYS = 31
+
+
+def _empty_day():
+    return {"revenue": ZERO, "payments": 0, "orders_received": 0, "orders_delivered": 0, "turnaround": timedelta(0), "parts_used": 0}
+
+
+def day_start(day):
+    """Start of a (local) day as an aware datetime."""
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def today():
+    return timezone.localdate()
+
+
+def _per_day(queryset, field, **aggregates):
+    return queryset.annotate(day=TruncDate(field)).values("day").annotate(**aggregates).order_by()
+
+
+def _deliveries(since, until):
+    """
+    First delivery of every order delivered in [since, until), with the time
+    since its first "received" status (or since the order date without one).
+    """
+    received = OrderStatus.objects.filter(order=OuterRef("order"), status="received").order_by("timestamp", "id").values("timestamp")[:1]
+    delivered_before = OrderStatus.objects.filter(order=OuterRef("order"), status="delivered", timestamp__lt=OuterRef("timestamp"))
+    return (
+        OrderStatus.objects.filter(status="delivered", timestamp__gte=since, timestamp__lt=until)
+        .exclude(Exists(delivered_before))
+        .annotate(received_at=Coalesce(Subquery(received), F("order__order_date")))
+    )
+
+
+def daily_figures(start, end):
+    """
+    Aggregates the daily figures of the days in [start, end) from the source
+    tables. Returns ``{day: {figure: value}}`` with an entry for every day.
+    """
+    since, until = day_start(start), day_start(end)
+    days = {start + timedelta(days=i): _empty_day() for i in range((end - start).days)}
+
+    def merge(rows):
+        for row in rows:
+            day = row.pop("day")
+            if day in days:
+                days[day].update({key: value for key, value in row.items() if value is not None})
+
+    merge(_per_day(Payment.objects.filter(payment_date__gte=since, payment_date__lt=until), "payment_date", revenue=Sum("amount"), payments=Count("id")))
+    merge(_per_day(Order.objects.filter(order_date__gte=since, order_date__lt=until), "order_date", orders_received=Count("id")))
+    merge(_per_day(OrderPart.objects.filter(order__order_date__gte=since, order__order_date__lt=until), "order__order_date", parts_used=Sum("quantity")))
+    merge(_per_day(_deliveries(since, until), "timestamp", orders_delivered=Count("id"), turnaround=Sum(F("timestamp") - F("received_at"))))
+    return days
+
+
+def refresh_rollups(start, end=None):
+    """
+    Recomputes and stores the rollups of the days in [start, end), by default
+    up to (excluding) today. Returns the number of days written.
+    """
+    end = min(end or today(), today())
+    written = 0
+    while start < end:
+        chunk_end = min(start + timedelta(days=ROLLUP_CHUNK_DAYS), end)
+        rollups = [DailyRollup(day=day, **figures) for day, figures in daily_figures(start, chunk_end).items()]
+        DailyRollup.objects.bulk_create(
+            rollups, update_conflicts=True, unique_fields=["day"], update_fields=[*DAILY_FIELDS, "refreshed_at"]
+        )
+        written += len(rollups)
+        start = chunk_end
+    return written
+
+
+def first_activity_day():
+    """The first day with an order or payment, or None on an empty database."""
+    firsts = [
+        value for value in (
+            Order.objects.order_by("order_date").values_list("order_date", flat=True).first(),
+            Payment.objects.order_by("payment_date").values_list("payment_date", flat=True).first(),
+        ) if value is not None
+    ]
+    return timezone.localdate(min(firsts)) if firsts else None
+
+
+def _missing_ranges(days, covered):
+    """Groups the days that are not in ``covered`` into [start, end) ranges."""
+    ranges = []
+    for day in days:
+        if day in covered:
+            continue
+        if ranges and ranges[-1][1] == day:
+            ranges[-1][1] = day + timedelta(days=1)
+        else:
+            ranges.append([day, day + timedelta(days=1)])
+    return ranges
+
+
+def daily_series(start, end):
+    """
+    Daily figures of [start, end): stored rollups where they exist, live
+    aggregates for the stretches without rollups (usually just today).
+    """
+    series = {
+        rollup.pop("day"): rollup
+        for rollup in DailyRollup.objects.filter(day__gte=start, day__lt=end).values("day", *DAILY_FIELDS)
+    }
+    days = [start + timedelta(days=i) for i in range((end - start).days)]
+    for missing_start, missing_end in _missing_ranges(days, series):
+        series.update(daily_figures(missing_start, missing_end))
+    return [{"day": day, **series[day]} for day in days]
+
+
+def current_state():
+    """Figures about the present, read live from the partial indexes and the workload counters."""
+    now = timezone.now()
+    mechanics = Mechanic.objects.filter(open_orders__gt=0).values("id", "first_name", "last_name", "open_orders").order_by("-open_orders", "id")
+    statuses = Order.objects.filter(is_closed=False).values("current_status").annotate(orders=Count("id")).order_by()
+    unpaid = Invoice.objects.filter(is_paid=False).aggregate(
+        count=Count("id"),
+        total=Coalesce(Sum("total_amount"), ZERO),
+        overdue_count=Count("id", filter=Q(due_date__lt=now)),
+        overdue_total=Coalesce(Sum("total_amount", filter=Q(due_date__lt=now)), ZERO),
+    )
+    return {
+        "open_orders_per_mechanic": [
+            {
+                "mechanic_id": row["id"],
+                "name": f"{row['first_name']} {row['last_name']}",
+                "open_orders": row["open_orders"],
+            }
+            for row in mechanics
+        ],
+        "open_orders_per_status": {row["current_status"] or "none": row["orders"] for row in statuses},
+        "unpaid_invoices": unpaid,
+    }
+
+
+def parts_consumption(start, end, limit=10):
+    """The most used parts on orders of [start, end)."""
+    return list(
+        OrderPart.objects.filter(order__order_date__gte=day_start(start), order__order_date__lt=day_start(end))
+        .values("part_id", "part__name")
+        .annotate(quantity=Sum("quantity"))
+        .order_by("-quantity", "part_id")[:limit]
+    )
+
+
+def dashboard(days=30):
+    """Everything the dashboard shows for the last ``days`` days including today."""
+    end = today() + timedelta(days=1)
+    start = end - timedelta(days=days)
+    series = daily_series(start, end)
+    delivered = sum(day["orders_delivered"] for day in series)
+    turnaround = sum((day["turnaround"] for day in series), timedelta(0))
+    return {
+        "start": start,
+        "end": end - timedelta(days=1),
+        **current_state(),
+        "revenue": sum((day["revenue"] for day in series), ZERO),
+        "orders_delivered": delivered,
+        "average_turnaround_hours": turnaround.total_seconds() / 3600 / delivered if delivered else None,
+        "parts_consumption": [
+            {"part_id": row["part_id"], "name": row["part__name"], "quantity": row["quantity"]}
+            for row in parts_consumption(start, end)
+        ],
+        "days": series,
+    }
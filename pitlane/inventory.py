@@ -0,0 +1,194 @@
+"""
+Stock reservation for the parts on orders.
+
+``Part.stock_quantity`` is the stock that is still free. Adding a part to an
+order reserves its quantity right away, so two counters can never sell the
+same last item; the reserved stock is consumed when the order is delivered
+or closed and released again when the line item of an order in progress is
+deleted or the order is cancelled. A cancelled order that gets a new status
+reserves its parts again. Of the stock withdrawn for a line item,
+``OrderPart.reserved_quantity`` is the part that can still go back to the
+shelf and ``OrderPart.consumed_quantity`` the part that is installed (or was
+taken before reservations existed); together they are what a change of the
+quantity is measured against, so a line item is never withdrawn twice.
+
+Every change is one conditional UPDATE per batch of parts:
+
+    UPDATE pitlane_part SET stock_quantity = stock_quantity - <needed>
+    WHERE id IN (...) AND stock_quantity >= <needed>
+
+The check and the decrement happen in the same statement under the row lock,
+so there is no read-modify-write window in which a concurrent sale could slip
+through. If fewer rows than parts were updated, some part lacks stock and the
+surrounding transaction is rolled back by raising ``InsufficientStock``.
+"""
+import math
+from collections import Counter
+from datetime import timedelta
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Case, Exists, F, FloatField, IntegerField, OuterRef, Sum, Value, When
+from django.db.models.functions import Cast
+from django.utils import timezone
+
+from .cache import invalidate_catalogs
+from .models import OrderPart, OrderStatus, Part
+
+# Parts per UPDATE statement
+BATCH_SIZE = 500
+
+
+class InsufficientStock(ValidationError):
+    """Raised when a reservation asks for more than the free stock of a part."""
+
+    def __init__(self, shortages):
+        self.shortages = shortages  # {part_id: (requested, available)}
+        super().__init__([
+            f"part {part_id}: {requested} requested, {available} in stock"
+            for part_id, (requested, available) in sorted(shortages.items())
+        ])
+
+
+def _per_part(quantities):
+    return Case(*[When(id=part_id, then=Value(quantity)) for part_id, quantity in quantities.items()], output_field=IntegerField())
+
+
+def _invalidate_parts_catalog():
+    # queryset updates skip the signals that normally drop the cached catalog;
+    # wait for the commit so no reader can cache the stock of before it
+    transaction.on_commit(lambda: invalidate_catalogs(["parts"]))
+
+
+def reserve_stock(quantities):
+    """
+    Withdraws ``{part_id: quantity}`` from the free stock, all or nothing.
+    Raises InsufficientStock if any part has too little stock left.
+    """
+    quantities = {part_id: quantity for part_id, quantity in quantities.items() if quantity > 0}
+    if not quantities:
+        return
+    part_ids = sorted(quantities)
+    with transaction.atomic():
+        for start in range(0, len(part_ids), BATCH_SIZE):
+            batch = {part_id: quantities[part_id] for part_id in part_ids[start:start + BATCH_SIZE]}
+            needed = _per_part(batch)
+            updated = Part.objects.filter(id__in=batch, stock_quantity__gte=needed).update(stock_quantity=F("stock_quantity") - needed)
+            if updated != len(batch):
+                available = dict(Part.objects.filter(id__in=batch).values_list("id", "stock_quantity"))
+                raise InsufficientStock({
+                    part_id: (quantity, available.get(part_id, 0))
+                    for part_id, quantity in batch.items() if available.get(part_id, 0) < quantity
+                })
+        _invalidate_parts_catalog()
+
+
+def release_stock(quantities):
+    """Returns ``{part_id: quantity}`` to the free stock."""
+    quantities = {part_id: quantity for part_id, quantity in quantities.items() if quantity > 0}
+    part_ids = sorted(quantities)
+    for start in range(0, len(part_ids), BATCH_SIZE):
+        batch = {part_id: quantities[part_id] for part_id in part_ids[start:start + BATCH_SIZE]}
+        Part.objects.filter(id__in=batch).update(stock_quantity=F("stock_quantity") + _per_part(batch))
+    if quantities:
+        _invalidate_parts_catalog()
+
+
+def reserve_line_items(order_parts):
+    """
+    Brings the reservation of the given (saved or unsaved) line items in line
+    with their quantity before they are written. Must run in the transaction
+    that saves them; sets ``reserved_quantity`` on the instances.
+    """
+    delta = Counter()
+    for order_part in order_parts:
+        delta[order_part.part_id] += order_part.quantity - order_part.reserved_quantity - order_part.consumed_quantity
+    with transaction.atomic():
+        reserve_stock({part_id: quantity for part_id, quantity in delta.items() if quantity > 0})
+        release_stock({part_id: -quantity for part_id, quantity in delta.items() if quantity < 0})
+    for order_part in order_parts:
+        # a smaller quantity gives back reserved stock first, then installed stock
+        order_part.consumed_quantity = min(order_part.consumed_quantity, order_part.quantity)
+        order_part.reserved_quantity = order_part.quantity - order_part.consumed_quantity
+
+
+def release_line_items(reservations):
+    """Releases deleted line items, given as ``(order_part_id, part_id, reserved_quantity)``."""
+    quantities = Counter()
+    for _, part_id, reserved in reservations:
+        quantities[part_id] += reserved
+    release_stock(quantities)
+
+
+def release_orders(order_ids):
+    """Releases the stock of all line items of the given (cancelled) orders."""
+    with transaction.atomic():
+        line_items = OrderPart.objects.select_for_update().filter(order__in=order_ids, reserved_quantity__gt=0)
+        reservations = list(line_items.values_list("id", "part_id", "reserved_quantity"))
+        OrderPart.objects.filter(id__in=[order_part_id for order_part_id, _, _ in reservations]).update(reserved_quantity=0)
+        release_line_items(reservations)
+
+
+def reserve_orders(order_ids):
+    """
+    Withdraws the stock again for the line items of the given orders that were
+    cancelled once and continue now (their current status is no longer
+    "cancelled"), as far as the line items hold less than their quantity.
+    Raises InsufficientStock if a part has too little stock left.
+    """
+    cancelled = OrderStatus.objects.filter(order=OuterRef("order"), status="cancelled")
+    with transaction.atomic():
+        line_items = list(
+            OrderPart.objects.select_for_update(of=("self",))
+            .filter(Exists(cancelled), order__in=order_ids, reserved_quantity__lt=F("quantity") - F("consumed_quantity"))
+            .exclude(order__current_status="cancelled")
+        )
+        reserve_line_items(line_items)
+        OrderPart.objects.bulk_update(line_items, ["reserved_quantity", "consumed_quantity"], batch_size=BATCH_SIZE)
+
+
+def consume_orders(order_ids):
+    """
+    The parts of the given (delivered or closed) orders are installed: their
+    stock stays withdrawn and is no longer released by deleting the line items.
+    """
+    OrderPart.objects.filter(order__in=order_ids, reserved_quantity__gt=0).update(
+        consumed_quantity=F("consumed_quantity") + F("reserved_quantity"), reserved_quantity=0,
+    )
+
+
+def reorder_report(window_days=30, threshold_days=14, cover_days=30, limit=100):
+    """
+    Parts that run out within ``threshold_days`` at the consumption rate of the
+    last ``window_days``, the most urgent first.
+
+    One grouped query over the line items of the window (found through the
+    order date index), so the cost follows the recent sales, not the size of
+    the catalog. Parts without sales in the window never run out and are not
+    listed. Line items of cancelled orders do not count as consumption.
+    """
+    since = timezone.now() - timedelta(days=window_days)
+    rows = (
+        OrderPart.objects.filter(order__order_date__gte=since)
+        .exclude(order__current_status="cancelled")
+        .values("part_id", "part__name", "part__part_number", "part__stock_quantity")
+        .annotate(consumed=Sum("quantity"), demand=Sum("quantity") * threshold_days)
+        # stock / (consumed / window) < threshold, kept in integers
+        .filter(consumed__gt=0, demand__gt=F("part__stock_quantity") * window_days)
+        .order_by(Cast("part__stock_quantity", FloatField()) / F("consumed"), "part_id")[:limit]
+    )
+    report = []
+    for row in rows:
+        daily = row["consumed"] / window_days
+        stock = row["part__stock_quantity"]
+        report.append({
+            "part_id": row["part_id"],
+            "name": row["part__name"],
+            "part_number": row["part__part_number"],
+            "stock_quantity": stock,
+            "consumed": row["consumed"],
+            "daily_consumption": round(daily, 3),
+            "days_left": round(max(stock, 0) / daily, 1),
+            "reorder_quantity": max(math.ceil(daily * cover_days) - stock, 0),
+        })
+    return report
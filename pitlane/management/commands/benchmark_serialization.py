@@ -0,0 +1,69 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from ninja.responses import NinjaJSONEncoder
+
+from pitlane.models import Order, Payment
+from pitlanebackend.api import OrderOut, PaymentOut
+from pitlanebackend.fields import page_adapter
+from pitlanebackend.renderers import renderer
+
+from .explain_hot_queries import Command as HotQueries
+
+BENCHMARKS = (("OrderOut", Order, OrderOut), ("PaymentOut", Payment, PaymentOut))
+
+
+def orm_path(queryset, schema):
+    """Model instances, from_orm per row, json.dumps - how list responses were built before."""
+    items = [schema.from_orm(item).model_dump() for item in queryset]
+    return json.dumps({"items": items, "limit": len(items), "next_cursor": None}, cls=NinjaJSONEncoder)
+
+
+def values_path(queryset, schema):
+    """``.values()`` rows, one TypeAdapter pass, the API renderer - the sparse_fields path."""
+    fields = tuple(schema.model_fields)
+    items = list(queryset.values(*fields))
+    page = page_adapter(schema, fields).validate_python({"items": items, "limit": len(items), "next_cursor": None})
+    return renderer.render(None, page, response_status=200)
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures how many rows per second the list endpoints serialize for OrderOut and "
+        "PaymentOut, through model instances and from_orm versus .values() and one TypeAdapter. "
+        "Runs inside a transaction that is rolled back, so --seed data leaves no trace."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--seed", type=int, default=0, help="Create this many synthetic orders first.")
+        parser.add_argument("--rows", type=int, default=1000, help="Rows per serialized list.")
+        parser.add_argument("--repeat", type=int, default=5, help="Runs per path; the best one counts.")
+
+    def handle(self, *args, seed, rows, repeat, **options):
+        self.stdout.write(f"renderer: {type(renderer.inner).__name__}")
+        with transaction.atomic():
+            if seed:
+                HotQueries().seed(seed)
+            for label, model, schema in BENCHMARKS:
+                queryset = model.objects.order_by("id")[:rows]
+                count = queryset.count()
+                if not count:
+                    self.stdout.write(f"{label}: no rows, use --seed")
+                    continue
+                before = self.rows_per_second(orm_path, queryset, schema, count, repeat)
+                after = self.rows_per_second(values_path, queryset, schema, count, repeat)
+                self.stdout.write(
+                    f"{label}: {count} rows, from_orm {before:,.0f} rows/s, values {after:,.0f} rows/s ({after / before:.1f}x)"
+                )
+            transaction.set_rollback(True)
+
+    def rows_per_second(self, path, queryset, schema, count, repeat):
+        best = min(self.timed(path, queryset, schema) for _ in range(repeat))
+        return count / best
+
+    def timed(self, path, queryset, schema):
+        start = time.perf_counter()
+        path(queryset.all(), schema)
+        return time.perf_counter() - start
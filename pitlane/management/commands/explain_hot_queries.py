@@ -0,0 +1,128 @@
+import random
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+from pitlane.models import (
+    Customer, Vehicle, Mechanic, Order, OrderStatus,
+    Invoice, Payment, Notification,
+)
+
+INDEXED_MODELS = (Order, OrderStatus, Invoice, Payment, Notification)
+
+
+def hot_queries():
+    """The filters the API runs most, as (label, queryset)."""
+    now = timezone.now()
+    some_order = Order.objects.order_by("-id").values_list("id", flat=True).first() or 0
+    return [
+        ("open orders per mechanic", Order.objects.filter(is_closed=False, mechanic__isnull=False).values_list("mechanic_id", flat=True).distinct()),
+        ("orders of the last week", Order.objects.filter(order_date__gte=now - timedelta(days=7)).order_by("order_date", "id")[:100]),
+        ("status history of an order", OrderStatus.objects.filter(order_id=some_order).order_by("timestamp")),
+        ("overdue unpaid invoices", Invoice.objects.filter(is_paid=False, due_date__lt=now)),
+        ("payments of the last day", Payment.objects.filter(payment_date__gte=now - timedelta(days=1))),
+        ("latest notifications", Notification.objects.order_by("-timestamp")[:50]),
+    ]
+
+
+class Command(BaseCommand):
+    help = (
+        "Shows the query plans of the hot API queries with and without the indexes of "
+        "migration 0006. Runs inside a transaction that is rolled back, so --seed data "
+        "and the temporarily dropped indexes leave no trace."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--seed", type=int, default=0, help="Create this many synthetic orders first.")
+        parser.add_argument("--repeat", type=int, default=5, help="Executions per query for the timing.")
+
+    def handle(self, *args, seed, repeat, **options):
+        with transaction.atomic():
+            if seed:
+                self.seed(seed)
+            self.analyze()
+            with_indexes = self.explain_all(repeat)
+
+            # plain DROP INDEX statements: SQLite's schema editor refuses to run inside atomic()
+            with connection.cursor() as cursor:
+                for model in INDEXED_MODELS:
+                    for index in model._meta.indexes:
+                        cursor.execute(f"DROP INDEX {connection.ops.quote_name(index.name)}")
+            self.analyze()
+            without_indexes = self.explain_all(repeat)
+
+            transaction.set_rollback(True)
+
+        for (label, plan_with, ms_with), (_, plan_without, ms_without) in zip(with_indexes, without_indexes):
+            self.stdout.write(self.style.MIGRATE_HEADING(f"== {label}"))
+            self.stdout.write(f"-- without indexes: {ms_without:.2f} ms")
+            self.stdout.write(plan_without)
+            self.stdout.write(f"-- with indexes: {ms_with:.2f} ms")
+            self.stdout.write(plan_with)
+            self.stdout.write("")
+
+    def analyze(self):
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+
+    def explain_all(self, repeat):
+        results = []
+        for label, queryset in hot_queries():
+            plan = queryset.explain()
+            start = time.perf_counter()
+            for _ in range(repeat):
+                list(queryset.all())
+            results.append((label, plan, (time.perf_counter() - start) * 1000 / repeat))
+        return results
+
+    def seed(self, count):
+        now = timezone.now()
+        rng = random.Random(42)
+        customers = Customer.objects.bulk_create(
+            Customer(first_name="Bench", last_name=str(i), email=f"bench{i}@example.invalid", address="-")
+            for i in range(max(count // 10, 1))
+        )
+        vehicles = Vehicle.objects.bulk_create(
+            Vehicle(brand="Bench", model="Car", year=2020, vin=f"BENCH{i:012d}", customer=customer)
+            for i, customer in enumerate(customers)
+        )
+        mechanics = Mechanic.objects.bulk_create(Mechanic(first_name="Bench", last_name=str(i)) for i in range(20))
+
+        orders = Order.objects.bulk_create(
+            (
+                Order(customer=vehicle.customer, vehicle=vehicle, mechanic=rng.choice(mechanics), is_closed=rng.random() > 0.02)
+                for vehicle in (rng.choice(vehicles) for _ in range(count))
+            ),
+            batch_size=5000,
+        )
+        # auto_now_add ignores given values on insert, so spread the dates afterwards
+        for order in orders:
+            order.order_date = now - timedelta(minutes=rng.randrange(3 * 365 * 24 * 60))
+        Order.objects.bulk_update(orders, ["order_date"], batch_size=5000)
+
+        statuses = OrderStatus.objects.bulk_create(
+            (OrderStatus(order=order, status=status) for order in orders for status in ("received", "in_progress", "delivered")),
+            batch_size=5000,
+        )
+        for status in statuses:
+            status.timestamp = status.order.order_date + timedelta(hours=rng.randrange(1, 72))
+        OrderStatus.objects.bulk_update(statuses, ["timestamp"], batch_size=5000)
+        invoices = Invoice.objects.bulk_create(
+            (
+                Invoice(order=order, due_date=order.order_date + timedelta(days=14), total_amount=Decimal("100.00"), is_paid=rng.random() > 0.05)
+                for order in orders
+            ),
+            batch_size=5000,
+        )
+        payments = Payment.objects.bulk_create(
+            (Payment(invoice=invoice, amount=Decimal("100.00"), payment_method="card") for invoice in invoices if invoice.is_paid),
+            batch_size=5000,
+        )
+        for payment in payments:
+            payment.payment_date = now - timedelta(minutes=rng.randrange(3 * 365 * 24 * 60))
+        Payment.objects.bulk_update(payments, ["payment_date"], batch_size=5000)
+        Notification.objects.bulk_create((Notification(message=f"Bench {i}") for i in range(count)), batch_size=5000)
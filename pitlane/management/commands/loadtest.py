@@ -0,0 +1,114 @@
+import io
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from pitlane.models import Customer
+
+
+def percentile(sorted_values, q):
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+class Command(BaseCommand):
+    help = (
+        "Sends GET /api/customers/{id} from several threads for a few seconds and reports "
+        "requests per second. The requests go through Django's WSGI handler like under a "
+        "threaded WSGI server, so connections are opened and closed exactly as in production. "
+        "Without --conn-max-age it compares CONN_MAX_AGE=0 with the configured settings."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--customer", type=int, help="Customer to request; defaults to the first one.")
+        parser.add_argument("--host", default="localhost", help="Host header; must be in ALLOWED_HOSTS.")
+        parser.add_argument("--threads", type=int, default=8, help="Concurrent worker threads.")
+        parser.add_argument("--seconds", type=float, default=5.0, help="Duration of each run.")
+        parser.add_argument(
+            "--conn-max-age", type=int, action="append", dest="conn_max_age",
+            help="CONN_MAX_AGE of a run; repeat the option for several runs.",
+        )
+
+    def handle(self, *args, customer, host, threads, seconds, conn_max_age, **options):
+        customer_id = customer or Customer.objects.order_by("id").values_list("id", flat=True).first()
+        if customer_id is None:
+            raise CommandError("No customers, create one first.")
+        path = f"/api/customers/{customer_id}"
+
+        settings_dict = connections["default"].settings_dict
+        configured = settings_dict["CONN_MAX_AGE"]
+        pooled = bool(settings_dict["OPTIONS"].get("pool"))
+        if conn_max_age is None:
+            # the pool cannot be switched off at runtime, so it is measured on its own
+            conn_max_age = [configured] if pooled or not configured else [0, configured]
+        elif pooled and any(conn_max_age):
+            raise CommandError("CONN_MAX_AGE must stay 0 with DB_POOL.")
+
+        connections.close_all()
+        handler = WSGIHandler()
+        self.stdout.write(f"GET {path}, {threads} threads, {seconds:g}s per run")
+        try:
+            for max_age in conn_max_age:
+                settings_dict["CONN_MAX_AGE"] = max_age
+                label = "pool" if pooled else f"CONN_MAX_AGE={max_age}"
+                self.report(label, self.run(handler, host, path, threads, seconds))
+        finally:
+            settings_dict["CONN_MAX_AGE"] = configured
+
+    def run(self, handler, host, path, threads, seconds):
+        """Returns the latencies of all successful requests and the status codes of the failed ones."""
+        deadline = time.perf_counter() + seconds
+        lock = threading.Lock()
+        latencies, failures = [], []
+
+        def worker():
+            own, failed = [], []
+            try:
+                while time.perf_counter() < deadline:
+                    start = time.perf_counter()
+                    status = self.request(handler, host, path)
+                    if status == 200:
+                        own.append(time.perf_counter() - start)
+                    else:
+                        failed.append(status)
+            finally:
+                # persistent connections belong to the thread; close them before the next run
+                connections.close_all()
+            with lock:
+                latencies.extend(own)
+                failures.extend(failed)
+
+        with ThreadPoolExecutor(threads) as executor:
+            for future in [executor.submit(worker) for _ in range(threads)]:
+                future.result()
+        return sorted(latencies), failures, seconds
+
+    def request(self, handler, host, path):
+        environ = {
+            "REQUEST_METHOD": "GET", "PATH_INFO": path, "QUERY_STRING": "",
+            "SERVER_NAME": host, "SERVER_PORT": "80", "SERVER_PROTOCOL": "HTTP/1.1",
+            "REMOTE_ADDR": "127.0.0.1", "wsgi.input": io.BytesIO(), "wsgi.errors": sys.stderr,
+            "wsgi.url_scheme": "http", "wsgi.multithread": True, "wsgi.multiprocess": False,
+        }
+        status = []
+        response = handler(environ, lambda code, headers: status.append(code))
+        try:
+            b"".join(response)
+        finally:
+            # fires request_finished, where Django closes connections older than CONN_MAX_AGE
+            response.close()
+        return int(status[0].split()[0])
+
+    def report(self, label, result):
+        latencies, failures, seconds = result
+        if not latencies:
+            raise CommandError(f"{label}: all {len(failures)} requests failed, e.g. with status {failures[0]}.")
+        self.stdout.write(
+            f"{label}: {len(latencies) / seconds:,.0f} req/s, "
+            f"p50 {percentile(latencies, 0.5) * 1000:.2f} ms, p95 {percentile(latencies, 0.95) * 1000:.2f} ms, "
+            f"{len(failures)} failed"
+        )
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from pitlane.statuses import BATCH_SIZE, rebuild_current_status
+
+
+class Command(BaseCommand):
+    help = "Rebuilds Order.current_status and Order.status_changed_at from the OrderStatus history."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, batch_size, **options):
+        updated = rebuild_current_status(batch_size=batch_size)
+        self.stdout.write(f"{updated} orders rebuilt.")
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from pitlane.models import Order
+from pitlane.pricing import BATCH_SIZE, compute_order_totals
+
+
+class Command(BaseCommand):
+    help = "Recomputes Order.total_amount from the line items and repairs drifted totals."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+        parser.add_argument("--dry-run", action="store_true", help="Only report orders with wrong totals.")
+
+    def handle(self, *args, batch_size, dry_run, **options):
+        checked = repaired = 0
+        last_id = 0
+        while True:
+            batch = list(
+                Order.objects.filter(id__gt=last_id).order_by("id").values_list("id", "total_amount")[:batch_size]
+            )
+            if not batch:
+                break
+            last_id = batch[-1][0]
+            totals = compute_order_totals([order_id for order_id, _ in batch], batch_size=batch_size)
+            wrong = [Order(id=order_id, total_amount=totals[order_id]) for order_id, stored in batch if stored != totals[order_id]]
+            if wrong and not dry_run:
+                Order.objects.bulk_update(wrong, ["total_amount"])
+            checked += len(batch)
+            repaired += len(wrong)
+
+        verb = "wrong" if dry_run else "repaired"
+        self.stdout.write(f"{checked} orders checked, {repaired} {verb}.")
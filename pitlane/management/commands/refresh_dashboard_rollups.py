@@ -0,0 +1,27 @@
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand
+
+from pitlane.dashboard import first_activity_day, refresh_rollups
+from pitlane.models import DailyRollup
+
+
+class Command(BaseCommand):
+    help = (
+        "Writes the dashboard rollups of all completed days since the last run. "
+        "The last --overlap stored days are recomputed to pick up late writes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--since", type=date.fromisoformat, help="Recompute every day from this date (YYYY-MM-DD) on.")
+        parser.add_argument("--overlap", type=int, default=2)
+
+    def handle(self, *args, since, overlap, **options):
+        if since is None:
+            last = DailyRollup.objects.order_by("-day").values_list("day", flat=True).first()
+            since = last - timedelta(days=overlap - 1) if last else first_activity_day()
+        if since is None:
+            self.stdout.write("Nothing to roll up.")
+            return
+        written = refresh_rollups(since)
+        self.stdout.write(f"{written} days rolled up from {since}.")
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from pitlane.workload import rebuild_workload
+
+
+class Command(BaseCommand):
+    help = "Recomputes Mechanic.open_orders and Mechanic.open_hours from the open orders and their services."
+
+    def handle(self, *args, **options):
+        updated = rebuild_workload()
+        self.stdout.write(f"{updated} mechanics refreshed.")
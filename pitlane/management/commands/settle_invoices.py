@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from pitlane.settlement import BATCH_SIZE, settle_invoices
+
+
+class Command(BaseCommand):
+    help = (
+        "Recomputes Invoice.amount_paid and Invoice.is_paid from the payments and repairs "
+        "the invoices that have drifted. With --check nothing is written."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--check", action="store_true", help="Only report drifted invoices and fail if there are any.")
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, check, batch_size, **options):
+        drifted = settle_invoices(repair=not check, batch_size=batch_size)
+        if check and drifted:
+            raise CommandError(f"{drifted} invoices out of sync with their payments.")
+        self.stdout.write(f"{drifted} invoices {'out of sync' if check else 'repaired'}.")
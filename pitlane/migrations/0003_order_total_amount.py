@@ -0,0 +1,42 @@
+# Generated by Django 5.2 on 2026-10-18 11:44
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_order_totals(apps, schema_editor):
+    Order = apps.get_model('pitlane', 'Order')
+    OrderService = apps.get_model('pitlane', 'OrderService')
+    OrderPart = apps.get_model('pitlane', 'OrderPart')
+    money = models.DecimalField(max_digits=10, decimal_places=2)
+
+    def line_item_sum(model, price_field):
+        line_items = (
+            model.objects.filter(order=OuterRef('pk'))
+            .order_by()
+            .values('order')
+            .annotate(total=Sum(F('quantity') * F(price_field), output_field=money))
+            .values('total')
+        )
+        return Coalesce(Subquery(line_items, output_field=money), Value(Decimal('0.00')), output_field=money)
+
+    Order.objects.update(total_amount=line_item_sum(OrderService, 'service__price') + line_item_sum(OrderPart, 'part__price'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pitlane', '0002_rename_owner_vehicle_customer'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='total_amount',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=10),
+        ),
+        migrations.RunPython(backfill_order_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,78 @@
+# Search indexes for pitlane.search. Database specific, so written by hand.
+
+from django.db import migrations
+
+POSTGRESQL_FORWARD = [
+    """
+    CREATE INDEX pitlane_part_search_idx ON pitlane_part USING gin ((
+        setweight(to_tsvector('simple', name), 'A') ||
+        setweight(to_tsvector('simple', part_number), 'A') ||
+        setweight(to_tsvector('simple', description), 'B')
+    ))
+    """,
+    "CREATE INDEX pitlane_part_number_prefix_idx ON pitlane_part (UPPER(part_number) text_pattern_ops)",
+]
+
+POSTGRESQL_BACKWARD = [
+    "DROP INDEX IF EXISTS pitlane_part_search_idx",
+    "DROP INDEX IF EXISTS pitlane_part_number_prefix_idx",
+]
+
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE pitlane_part_fts USING fts5(
+        name, part_number, description,
+        content='pitlane_part', content_rowid='id', prefix='2 3 4'
+    )
+    """,
+    """
+    CREATE TRIGGER pitlane_part_fts_insert AFTER INSERT ON pitlane_part BEGIN
+        INSERT INTO pitlane_part_fts(rowid, name, part_number, description)
+        VALUES (new.id, new.name, new.part_number, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER pitlane_part_fts_delete AFTER DELETE ON pitlane_part BEGIN
+        INSERT INTO pitlane_part_fts(pitlane_part_fts, rowid, name, part_number, description)
+        VALUES ('delete', old.id, old.name, old.part_number, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER pitlane_part_fts_update AFTER UPDATE ON pitlane_part BEGIN
+        INSERT INTO pitlane_part_fts(pitlane_part_fts, rowid, name, part_number, description)
+        VALUES ('delete', old.id, old.name, old.part_number, old.description);
+        INSERT INTO pitlane_part_fts(rowid, name, part_number, description)
+        VALUES (new.id, new.name, new.part_number, new.description);
+    END
+    """,
+    "INSERT INTO pitlane_part_fts(pitlane_part_fts) VALUES ('rebuild')",
+]
+
+SQLITE_BACKWARD = [
+    "DROP TRIGGER IF EXISTS pitlane_part_fts_insert",
+    "DROP TRIGGER IF EXISTS pitlane_part_fts_delete",
+    "DROP TRIGGER IF EXISTS pitlane_part_fts_update",
+    "DROP TABLE IF EXISTS pitlane_part_fts",
+]
+
+
+def run_for_vendor(postgresql, sqlite):
+    def run(apps, schema_editor):
+        statements = {"postgresql": postgresql, "sqlite": sqlite}.get(schema_editor.connection.vendor, [])
+        for statement in statements:
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pitlane', '0003_order_total_amount'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run_for_vendor(POSTGRESQL_FORWARD, SQLITE_FORWARD),
+            run_for_vendor(POSTGRESQL_BACKWARD, SQLITE_BACKWARD),
+        ),
+    ]
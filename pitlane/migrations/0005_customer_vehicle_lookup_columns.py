@@ -0,0 +1,49 @@
+# Generated by Django 5.2 on 2026-10-18 11:50
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pitlane', '0004_part_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customer',
+            name='email_lower',
+            field=models.GeneratedField(db_index=True, db_persist=True, expression=django.db.models.functions.text.Lower('email'), output_field=models.CharField(max_length=254)),
+        ),
+        migrations.AddField(
+            model_name='customer',
+            name='first_name_lower',
+            field=models.GeneratedField(db_index=True, db_persist=True, expression=django.db.models.functions.text.Lower('first_name'), output_field=models.CharField(max_length=200)),
+        ),
+        migrations.AddField(
+            model_name='customer',
+            name='last_name_lower',
+            field=models.GeneratedField(db_index=True, db_persist=True, expression=django.db.models.functions.text.Lower('last_name'), output_field=models.CharField(max_length=200)),
+        ),
+        migrations.AddField(
+            model_name='customer',
+            name='phone_digits',
+            field=models.GeneratedField(db_index=True, db_persist=True, expression=django.db.models.functions.text.Replace(django.db.models.functions.text.Replace(django.db.models.functions.text.Replace(django.db.models.functions.text.Replace(django.db.models.functions.text.Replace(django.db.models.functions.text.Replace(django.db.models.functions.text.Replace(models.F('phone'), models.Value(' '), models.Value('')), models.Value('-'), models.Value('')), models.Value('/'), models.Value('')), models.Value('('), models.Value('')), models.Value(')'), models.Value('')), models.Value('.'), models.Value('')), models.Value('+'), models.Value('')), output_field=models.CharField(max_length=30)),
+        ),
+        migrations.AddField(
+            model_name='vehicle',
+            name='brand_lower',
+            field=models.GeneratedField(db_index=True, db_persist=True, expression=django.db.models.functions.text.Lower('brand'), output_field=models.CharField(max_length=100)),
+        ),
+        migrations.AddField(
+            model_name='vehicle',
+            name='model_lower',
+            field=models.GeneratedField(db_index=True, db_persist=True, expression=django.db.models.functions.text.Lower('model'), output_field=models.CharField(max_length=150)),
+        ),
+        migrations.AddField(
+            model_name='vehicle',
+            name='vin_upper',
+            field=models.GeneratedField(db_index=True, db_persist=True, expression=django.db.models.functions.text.Upper('vin'), output_field=models.CharField(max_length=17)),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2 on 2026-10-18 11:53
+
+from django.db import migrations, models
+
+from pitlane.operations import AddIndexConcurrently
+
+
+class Migration(migrations.Migration):
+    # the indexes are built without locking the tables against writes
+    atomic = False
+
+    dependencies = [
+        ('pitlane', '0005_customer_vehicle_lookup_columns'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='invoice',
+            index=models.Index(condition=models.Q(('is_paid', False)), fields=['due_date'], name='invoice_unpaid_due_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='notification',
+            index=models.Index(fields=['timestamp'], name='notification_timestamp_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='order',
+            index=models.Index(condition=models.Q(('is_closed', False)), fields=['mechanic'], name='order_open_mechanic_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='order',
+            index=models.Index(fields=['order_date', 'id'], name='order_date_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='orderstatus',
+            index=models.Index(fields=['order', 'timestamp'], name='orderstatus_order_time_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='payment',
+            index=models.Index(fields=['payment_date'], name='payment_date_idx'),
+        ),
+    ]
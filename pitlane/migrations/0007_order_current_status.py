@@ -0,0 +1,39 @@
+# Generated by Django 5.2 on 2026-10-18 11:56
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_current_status(apps, schema_editor):
+    Order = apps.get_model('pitlane', 'Order')
+    OrderStatus = apps.get_model('pitlane', 'OrderStatus')
+
+    def latest(field):
+        return Subquery(OrderStatus.objects.filter(order=OuterRef('pk')).order_by('-timestamp', '-id').values(field)[:1])
+
+    Order.objects.update(current_status=latest('status'), status_changed_at=latest('timestamp'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pitlane', '0006_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='current_status',
+            field=models.CharField(editable=False, max_length=50, null=True),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='status_changed_at',
+            field=models.DateTimeField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['current_status', 'id'], name='order_current_status_idx'),
+        ),
+        migrations.RunPython(backfill_current_status, migrations.RunPython.noop),
+    ]
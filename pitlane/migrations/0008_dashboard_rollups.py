@@ -0,0 +1,32 @@
+# Generated by Django 5.2 on 2026-10-18 12:03
+
+import datetime
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pitlane', '0007_order_current_status'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(unique=True)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('payments', models.IntegerField(default=0)),
+                ('orders_received', models.IntegerField(default=0)),
+                ('orders_delivered', models.IntegerField(default=0)),
+                ('turnaround', models.DurationField(default=datetime.timedelta)),
+                ('parts_used', models.IntegerField(default=0)),
+                ('refreshed_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='orderstatus',
+            index=models.Index(fields=['status', 'timestamp'], name='orderstatus_status_time_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-18 12:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pitlane', '0008_dashboard_rollups'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='orderpart',
+            name='reserved_quantity',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2 on 2026-10-18 12:21
+
+from django.db import migrations, models
+
+from pitlane.operations import AddIndexConcurrently
+
+
+class Migration(migrations.Migration):
+    # the indexes are built without locking the tables against writes
+    atomic = False
+
+    dependencies = [
+        ('pitlane', '0009_orderpart_reserved_quantity'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='invoice',
+            index=models.Index(fields=['due_date', 'id'], name='invoice_due_date_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='order',
+            index=models.Index(fields=['customer', 'order_date', 'id'], name='order_customer_date_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='payment',
+            index=models.Index(fields=['payment_method', 'payment_date'], name='payment_method_date_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2 on 2026-10-18 12:25
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Sum
+
+
+def backfill_amount_paid(apps, schema_editor):
+    Invoice = apps.get_model('pitlane', 'Invoice')
+    Payment = apps.get_model('pitlane', 'Payment')
+
+    paid = Payment.objects.filter(invoice=OuterRef('pk')).order_by().values('invoice').annotate(total=Sum('amount')).values('total')
+    Invoice.objects.filter(id__in=Payment.objects.values('invoice')).update(amount_paid=Subquery(paid))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pitlane', '0010_list_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='invoice',
+            name='amount_paid',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=10),
+        ),
+        migrations.RunPython(backfill_amount_paid, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2 on 2026-10-18 12:38
+
+from django.db import migrations, models
+
+from pitlane.operations import AddIndexConcurrently
+
+
+class Migration(migrations.Migration):
+    # the indexes are built without locking the tables against writes
+    atomic = False
+
+    dependencies = [
+        ('pitlane', '0011_invoice_amount_paid'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='invoice',
+            index=models.Index(fields=['issue_date', 'id'], name='invoice_issue_date_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='orderstatus',
+            index=models.Index(fields=['timestamp', 'id'], name='orderstatus_timestamp_idx'),
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.2 on 2026-10-18 12:47
+
+from django.db import migrations, models
+from django.db.models import Count, F, OuterRef, Subquery, Sum
+
+
+def backfill_workload(apps, schema_editor):
+    Mechanic = apps.get_model('pitlane', 'Mechanic')
+    Order = apps.get_model('pitlane', 'Order')
+    OrderService = apps.get_model('pitlane', 'OrderService')
+
+    orders = Order.objects.filter(mechanic=OuterRef('pk'), is_closed=False).order_by().values('mechanic').annotate(n=Count('id')).values('n')
+    hours = (
+        OrderService.objects.filter(order__mechanic=OuterRef('pk'), order__is_closed=False).order_by()
+        .values('order__mechanic').annotate(h=Sum(F('quantity') * F('service__estimated_hours'))).values('h')
+    )
+    assigned = Order.objects.filter(is_closed=False).values('mechanic')
+    Mechanic.objects.filter(id__in=assigned).update(open_orders=Subquery(orders))
+    Mechanic.objects.filter(id__in=OrderService.objects.filter(order__is_closed=False).values('order__mechanic')).update(open_hours=Subquery(hours))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pitlane', '0012_admin_changelist_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mechanic',
+            name='capacity_hours',
+            field=models.DecimalField(decimal_places=2, default=40, max_digits=6),
+        ),
+        migrations.AddField(
+            model_name='mechanic',
+            name='open_hours',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=8),
+        ),
+        migrations.AddField(
+            model_name='mechanic',
+            name='open_orders',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='service',
+            name='estimated_hours',
+            field=models.DecimalField(decimal_places=2, default=1, max_digits=5),
+        ),
+        migrations.RunPython(backfill_workload, migrations.RunPython.noop),
+    ]
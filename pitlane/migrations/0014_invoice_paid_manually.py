@@ -0,0 +1,26 @@
+# Generated by Django 5.2 on 2026-10-18 12:59
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_paid_manually(apps, schema_editor):
+    # invoices marked paid although their payments do not cover them were marked by hand
+    Invoice = apps.get_model('pitlane', 'Invoice')
+    Invoice.objects.filter(is_paid=True, amount_paid__lt=F('total_amount')).update(paid_manually=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pitlane', '0013_mechanic_workload'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='invoice',
+            name='paid_manually',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.RunPython(backfill_paid_manually, migrations.RunPython.noop),
+    ]
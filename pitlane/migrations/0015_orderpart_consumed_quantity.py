@@ -0,0 +1,29 @@
+# Generated by Django 5.2 on 2026-10-18 13:11
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_consumed_quantity(apps, schema_editor):
+    # what is not reserved was consumed on delivery/closing or taken before reservations existed;
+    # cancelled orders have given their stock back
+    OrderPart = apps.get_model('pitlane', 'OrderPart')
+    OrderPart.objects.exclude(order__current_status='cancelled').filter(reserved_quantity__lt=F('quantity')).update(
+        consumed_quantity=F('quantity') - F('reserved_quantity'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pitlane', '0014_invoice_paid_manually'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='orderpart',
+            name='consumed_quantity',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_consumed_quantity, migrations.RunPython.noop),
+    ]
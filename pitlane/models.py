@@ -1,7 +1,18 @@
+from datetime import timedelta
+
 from django.db import models
+from django.db.models import Value
+from django.db.models.functions import Lower, Replace, Upper
 
 # Create your models here.
 
+def digits_only(field_name):
+    """Strips the usual phone number separators (portable, no regex support needed)."""
+    expression = models.F(field_name)
+    for char in " -/().+":
+        expression = Replace(expression, Value(char), Value(""))
+    return expression
+
 class Customer(models.Model):
     """
     this model saves information about the customer
@@ -14,6 +25,12 @@ class Customer(models.Model):
     address = models.CharField(max_length=200)
     date_joined = models.DateTimeField(auto_now_add=True)
 
+    # normalized, indexed copies for the front desk search (computed by the database)
+    first_name_lower = models.GeneratedField(expression=Lower("first_name"), output_field=models.CharField(max_length=200), db_persist=True, db_index=True)
+    last_name_lower = models.GeneratedField(expression=Lower("last_name"), output_field=models.CharField(max_length=200), db_persist=True, db_index=True)
+    email_lower = models.GeneratedField(expression=Lower("email"), output_field=models.CharField(max_length=254), db_persist=True, db_index=True)
+    phone_digits = models.GeneratedField(expression=digits_only("phone"), output_field=models.CharField(max_length=30), db_persist=True, db_index=True)
+
     def __str__(self):
         return self.first_name + " " + self.last_name
     
@@ -28,6 +45,11 @@ class Vehicle(models.Model):
     vin = models.CharField(max_length=17, unique=True) # Vehicle identification Number
     customer = models.ForeignKey(Customer, on_delete=models.CASCADE)
 
+    # normalized, indexed copies for the front desk search (computed by the database)
+    vin_upper = models.GeneratedField(expression=Upper("vin"), output_field=models.CharField(max_length=17), db_persist=True, db_index=True)
+    brand_lower = models.GeneratedField(expression=Lower("brand"), output_field=models.CharField(max_length=100), db_persist=True, db_index=True)
+    model_lower = models.GeneratedField(expression=Lower("model"), output_field=models.CharField(max_length=150), db_persist=True, db_index=True)
+
     def __str__(self):
         return f"{self.brand} {self.model} ({self.year})"
     
@@ -39,6 +61,11 @@ class Mechanic(models.Model):
     phone = models.CharField(max_length=20, blank=True)
     hire_date = models.DateField(null=True, blank=True)
     is_active = models.BooleanField(default=True)
+    # estimated hours of open work a mechanic takes on; auto-assignment skips mechanics without room
+    capacity_hours = models.DecimalField(max_digits=6, decimal_places=2, default=40)
+    # open orders assigned to the mechanic and their estimated hours, maintained by signals.py (see workload.py)
+    open_orders = models.IntegerField(default=0, editable=False)
+    open_hours = models.DecimalField(max_digits=8, decimal_places=2, default=0, editable=False)
 
     def __str__(self):
         return f"{self.first_name} {self.last_name}"
@@ -71,6 +98,8 @@ class Service(models.Model):
     name = models.CharField(max_length=100)
     description = models.TextField(blank=True)
     price = models.DecimalField(max_digits=10, decimal_places=2)
+    # planned working time per unit, the basis of the mechanics' workload
+    estimated_hours = models.DecimalField(max_digits=5, decimal_places=2, default=1)
 
     def __str__(self):
         return self.name
@@ -83,9 +112,25 @@ class Order(models.Model):
     order_date = models.DateTimeField(auto_now_add=True)
     description = models.TextField(blank=True)
     is_closed = models.BooleanField(default=False)
+    # sum of quantity * price over all line items, maintained by pitlane.pricing
+    total_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0, editable=False)
+    # latest OrderStatus of the order, maintained by pitlane.statuses; null while there is none
+    current_status = models.CharField(max_length=50, null=True, editable=False)
+    status_changed_at = models.DateTimeField(null=True, editable=False)
+
+    class Meta:
+        indexes = [
+            # open orders per mechanic (available mechanics, workload)
+            models.Index(fields=["mechanic"], condition=models.Q(is_closed=False), name="order_open_mechanic_idx"),
+            models.Index(fields=["order_date", "id"], name="order_date_idx"),
+            # /orders?status=... paginated by id
+            models.Index(fields=["current_status", "id"], name="order_current_status_idx"),
+            # /orders?customer_id=...&ordering=-order_date
+            models.Index(fields=["customer", "order_date", "id"], name="order_customer_date_idx"),
+        ]
 
     def __str__(self):
-        return f"Order {self.id} - {self.customer.name} - {self.vehicle.make} {self.vehicle.model}"
+        return f"Order {self.id} - {self.customer} - {self.vehicle.brand} {self.vehicle.model}"
 
 class OrderStatus(models.Model):
     """Tracks the status of an order over time."""
@@ -102,8 +147,17 @@ class OrderStatus(models.Model):
     timestamp = models.DateTimeField(auto_now_add=True)
     note = models.TextField(blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["order", "timestamp"], name="orderstatus_order_time_idx"),
+            # deliveries per day (dashboard turnaround)
+            models.Index(fields=["status", "timestamp"], name="orderstatus_status_time_idx"),
+            # admin changelist, newest first, and its date hierarchy
+            models.Index(fields=["timestamp", "id"], name="orderstatus_timestamp_idx"),
+        ]
+
     def __str__(self):
-        return f"Status: {self.status} - Order {self.order.id}"
+        return f"Status: {self.status} - Order {self.order_id}"
 
 class OrderService(models.Model):
     """Links orders with the services provided and tracks the quantity."""
@@ -112,16 +166,20 @@ class OrderService(models.Model):
     quantity = models.IntegerField(default=1)
 
     def __str__(self):
-        return f"{self.quantity} x {self.service.name} - Order {self.order.id}"
+        return f"{self.quantity} x {self.service.name} - Order {self.order_id}"
     
 class OrderPart(models.Model):
     """Tracks which parts were used for an order and in what quantity."""
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='parts')
     part = models.ForeignKey(Part, on_delete=models.CASCADE)
     quantity = models.IntegerField(default=1)
+    # stock withdrawn for this line item and not yet installed, maintained by pitlane.inventory
+    reserved_quantity = models.IntegerField(default=0, editable=False)
+    # stock withdrawn for this line item and installed (order delivered or closed)
+    consumed_quantity = models.IntegerField(default=0, editable=False)
 
     def __str__(self):
-        return f"{self.quantity} x {self.part.name} - Order {self.order.id}"
+        return f"{self.quantity} x {self.part.name} - Order {self.order_id}"
     
 class Invoice(models.Model):
     """Represents an invoice generated for an order."""
@@ -129,10 +187,24 @@ class Invoice(models.Model):
     issue_date = models.DateTimeField(auto_now_add=True)
     due_date = models.DateTimeField()
     total_amount = models.DecimalField(max_digits=10, decimal_places=2)
+    # sum of the payments, maintained by signals.py (see settlement.py)
+    amount_paid = models.DecimalField(max_digits=10, decimal_places=2, default=0, editable=False)
     is_paid = models.BooleanField(default=False)
+    # marked paid by hand (mark_paid, e.g. a write-off); stays paid whatever the payments add up to
+    paid_manually = models.BooleanField(default=False)
+
+    class Meta:
+        indexes = [
+            # open receivables / overdue invoices; paid invoices stay out of the index
+            models.Index(fields=["due_date"], condition=models.Q(is_paid=False), name="invoice_unpaid_due_idx"),
+            # /invoices?ordering=due_date over paid and unpaid invoices
+            models.Index(fields=["due_date", "id"], name="invoice_due_date_idx"),
+            # admin list filter on the issue date
+            models.Index(fields=["issue_date", "id"], name="invoice_issue_date_idx"),
+        ]
 
     def __str__(self):
-        return f"Invoice {self.id} - Order {self.order.id}"
+        return f"Invoice {self.id} - Order {self.order_id}"
     
 class Payment(models.Model):
     """Tracks payments made for invoices."""
@@ -147,13 +219,40 @@ class Payment(models.Model):
     ])
     note = models.TextField(blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["payment_date"], name="payment_date_idx"),
+            # /payments?payment_method=...&ordering=-payment_date
+            models.Index(fields=["payment_method", "payment_date"], name="payment_method_date_idx"),
+        ]
+
     def __str__(self):
-        return f"Payment {self.amount} for Invoice {self.invoice.id}"
+        return f"Payment {self.amount} for Invoice {self.invoice_id}"
     
 class Notification(models.Model):
     """Stores notifications sent to users."""
     message = models.TextField()
     timestamp = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["timestamp"], name="notification_timestamp_idx"),
+        ]
+
+    def __str__(self):
+        return self.message
+
+class DailyRollup(models.Model):
+    """Precomputed dashboard figures of one day, maintained by pitlane.dashboard."""
+    day = models.DateField(unique=True)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    payments = models.IntegerField(default=0)
+    orders_received = models.IntegerField(default=0)
+    orders_delivered = models.IntegerField(default=0)
+    # summed time from received to delivered of the orders delivered on this day
+    turnaround = models.DurationField(default=timedelta)
+    parts_used = models.IntegerField(default=0)
+    refreshed_at = models.DateTimeField(auto_now=True)
+
     def __str__(self):
-        return self.message
\ No newline at end of file
+        return f"Rollup {self.day}"
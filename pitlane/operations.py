@@ -0,0 +1,26 @@
+"""
+Migration operations.
+
+``AddIndexConcurrently`` builds an index with ``CREATE INDEX CONCURRENTLY`` on
+PostgreSQL, so the table stays writable while the index is built instead of
+being locked against writes for the whole build. Other databases (SQLite in
+development and the tests) get a plain ``CREATE INDEX``. The migration needs
+``atomic = False``. A concurrent build that fails leaves an invalid index
+behind, which has to be dropped before the migration is run again.
+"""
+from django.contrib.postgres import operations
+from django.db import migrations
+
+
+class AddIndexConcurrently(operations.AddIndexConcurrently):
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == "postgresql":
+            super().database_forwards(app_label, schema_editor, from_state, to_state)
+        else:
+            migrations.AddIndex.database_forwards(self, app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == "postgresql":
+            super().database_backwards(app_label, schema_editor, from_state, to_state)
+        else:
+            migrations.AddIndex.database_backwards(self, app_label, schema_editor, from_state, to_state)
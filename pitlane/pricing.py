@@ -0,0 +1,65 @@
+"""
+Server-side computation of order totals.
+
+The total of an order is the sum of ``quantity * price`` over its services and
+parts. It is stored denormalized in ``Order.total_amount`` and refreshed by a
+single UPDATE whenever a line item of the order changes (see signals.py), so
+invoices and reports read one column instead of scanning line items.
+"""
+from decimal import Decimal
+
+from django.db.models import DecimalField, F, OuterRef, QuerySet, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from .models import Order, OrderPart, OrderService
+
+ZERO = Decimal("0.00")
+MONEY = DecimalField(max_digits=10, decimal_places=2)
+
+# Orders per aggregate query in compute_order_totals
+BATCH_SIZE = 1000
+
+
+def _line_item_sum(model, price_field):
+    line_items = (
+        model.objects.filter(order=OuterRef("pk"))
+        .order_by()
+        .values("order")
+        .annotate(total=Sum(F("quantity") * F(price_field), output_field=MONEY))
+        .values("total")
+    )
+    return Coalesce(Subquery(line_items, output_field=MONEY), Value(ZERO), output_field=MONEY)
+
+
+def order_total_expression():
+    """
+    SQL expression for the total of the outer order, usable in annotate() and update().
+    """
+    return _line_item_sum(OrderService, "service__price") + _line_item_sum(OrderPart, "part__price")
+
+
+def compute_order_totals(order_ids, batch_size=BATCH_SIZE):
+    """
+    Computes the totals of many orders from their line items, one aggregate
+    query per batch. Returns ``{order_id: Decimal}``.
+    """
+    order_ids = list(order_ids)
+    totals = {}
+    for start in range(0, len(order_ids), batch_size):
+        batch = order_ids[start:start + batch_size]
+        totals.update(
+            Order.objects.filter(id__in=batch)
+            .annotate(computed_total=order_total_expression())
+            .values_list("id", "computed_total")
+        )
+    return totals
+
+
+def refresh_order_totals(orders):
+    """
+    Recomputes and stores ``Order.total_amount`` for the given orders (a queryset
+    or a list of ids) in one UPDATE statement. Returns the number of orders updated.
+    """
+    if not isinstance(orders, QuerySet):
+        orders = Order.objects.filter(id__in=list(orders))
+    return orders.update(total_amount=order_total_expression())
@@ -0,0 +1,97 @@
+"""
+Accounts receivable: what is still owed on the invoices, and for how long.
+
+An invoice is open while it is not marked paid and its payments do not cover
+its total. Everything is computed by the database from the unpaid invoices,
+which the partial index ``invoice_unpaid_due_idx`` holds apart from the paid
+ones, so the cost follows the open invoices, not the whole ledger:
+
+    outstanding = total_amount - amount_paid
+
+``amount_paid`` is the sum of the payments, kept on the invoice by settlement.py.
+
+The age of an open invoice is measured in whole days past ``due_date`` and
+sorted into the ``BUCKETS``; invoices that are not due yet are "current".
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db.models import Case, CharField, Count, DecimalField, F, Q, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Invoice
+
+ZERO = Decimal("0.00")
+
+# (bucket, oldest age in days past due it holds), youngest first
+AGES = (("0_30", 30), ("31_60", 60), ("61_90", 90))
+BUCKETS = ("current", *(name for name, _ in AGES), "over_90")
+
+
+def _money(expression):
+    return Coalesce(expression, Value(ZERO), output_field=DecimalField(max_digits=12, decimal_places=2))
+
+
+def _bucket(now):
+    # compared against due_date itself, so the index on it stays usable
+    return Case(
+        When(due_date__gte=now, then=Value("current")),
+        *[When(due_date__gt=now - timedelta(days=age + 1), then=Value(name)) for name, age in AGES],
+        default=Value("over_90"),
+        output_field=CharField(),
+    )
+
+
+def open_invoices(now=None):
+    """
+    Unpaid invoices with a balance left, annotated with ``customer_id``,
+    ``outstanding`` and their aging ``bucket``.
+    """
+    now = now or timezone.now()
+    return (
+        Invoice.objects.filter(is_paid=False, total_amount__gt=F("amount_paid"))
+        .annotate(
+            customer_id=F("order__customer_id"),
+            outstanding=F("total_amount") - F("amount_paid"),
+            bucket=_bucket(now),
+        )
+    )
+
+
+def _bucket_totals():
+    return {bucket: _money(Sum("outstanding", filter=Q(bucket=bucket))) for bucket in BUCKETS}
+
+
+def aging_summary(now=None):
+    """Total outstanding and the number of open invoices, overall and per bucket."""
+    totals = open_invoices(now).aggregate(
+        invoices=Count("id"),
+        total=_money(Sum("outstanding")),
+        **_bucket_totals(),
+    )
+    return {
+        "invoices": totals.pop("invoices"),
+        "outstanding": totals.pop("total"),
+        "buckets": totals,
+    }
+
+
+def aging_by_customer(now=None, limit=100):
+    """Outstanding per customer and bucket in one grouped query, the largest debts first."""
+    rows = (
+        open_invoices(now)
+        .values("customer_id", "order__customer__first_name", "order__customer__last_name")
+        .annotate(invoices=Count("id"), total=Sum("outstanding"), **_bucket_totals())
+        .order_by("-total", "customer_id")[:limit]
+    )
+    return [
+        {
+            "customer_id": row["customer_id"],
+            "name": f"{row['order__customer__first_name']} {row['order__customer__last_name']}",
+            "invoices": row["invoices"],
+            "outstanding": row["total"],
+            "buckets": {bucket: row[bucket] for bucket in BUCKETS},
+        }
+        for row in rows
+    ]
@@ -0,0 +1,175 @@
+"""
+Ranked search over parts.
+
+PostgreSQL: full-text search against a GIN expression index over name,
+part number and description, plus prefix matching on the part number through
+an ``UPPER(part_number) text_pattern_ops`` index (migration 0004). Every word
+of the query matches as a prefix, so "brems sch" finds "Bremsscheibe vorne".
+
+SQLite: the same search runs against an FTS5 table that triggers keep in
+sync with ``pitlane_part``, ranked with bm25.
+
+Other databases fall back to ``icontains`` without ranking.
+
+The front desk lookup (``lookup``) searches customers and vehicles through
+normalized columns the database computes (lower-cased names and email,
+digits-only phone, upper-case VIN). All predicates are equality or prefix
+matches on indexed columns, so the cost does not grow with the table size.
+"""
+import re
+
+from django.db import connections, router
+from django.db.models import Case, IntegerField, Q, Value, When
+
+from .models import Customer, Part, Vehicle
+
+# Must stay identical to the expression indexed in migration 0004
+PG_DOCUMENT = (
+    "setweight(to_tsvector('simple', name), 'A') || "
+    "setweight(to_tsvector('simple', part_number), 'A') || "
+    "setweight(to_tsvector('simple', description), 'B')"
+)
+
+PG_SEARCH_SQL = f"""
+    SELECT p.*,
+           ts_rank({PG_DOCUMENT}, q)
+           + CASE WHEN UPPER(p.part_number) LIKE %(prefix)s THEN 1 ELSE 0 END AS rank
+    FROM pitlane_part p, to_tsquery('simple', %(tsquery)s) q
+    WHERE {PG_DOCUMENT} @@ q OR UPPER(p.part_number) LIKE %(prefix)s
+    ORDER BY rank DESC, p.id
+    LIMIT %(limit)s
+"""
+
+SQLITE_SEARCH_SQL = """
+    SELECT p.*
+    FROM pitlane_part_fts f JOIN pitlane_part p ON p.id = f.rowid
+    WHERE pitlane_part_fts MATCH %s
+    ORDER BY bm25(pitlane_part_fts, 10.0, 10.0, 1.0), p.id
+    LIMIT %s
+"""
+
+
+def _words(query):
+    return re.findall(r"\w+", query)
+
+
+def _like_prefix(query):
+    escaped = query.upper().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return escaped + "%"
+
+
+def search_parts(query, limit=20):
+    """
+    Returns up to ``limit`` parts matching ``query``, best matches first.
+    """
+    query = query.strip()
+    words = _words(query)
+    if not words:
+        return []
+
+    db = router.db_for_read(Part)
+    vendor = connections[db].vendor
+
+    if vendor == "postgresql":
+        tsquery = " & ".join(f"{word}:*" for word in words)
+        params = {"prefix": _like_prefix(query), "tsquery": tsquery, "limit": limit}
+        return list(Part.objects.using(db).raw(PG_SEARCH_SQL, params))
+
+    if vendor == "sqlite":
+        match = " ".join('"%s"*' % word.replace('"', '""') for word in words)
+        return list(Part.objects.using(db).raw(SQLITE_SEARCH_SQL, [match, limit]))
+
+    return list(
+        Part.objects.using(db)
+        .filter(Q(name__icontains=query) | Q(part_number__icontains=query))
+        .order_by("name")[:limit]
+    )
+
+
+def _ranked(queryset, conditions, limit):
+    """
+    Filters by any of the ``(Q, score)`` conditions and orders by the best score.
+    """
+    conditions = sorted(conditions, key=lambda condition: -condition[1])
+    matches = Q()
+    for condition, _ in conditions:
+        matches |= condition
+    score = Case(*[When(condition, then=Value(points)) for condition, points in conditions], output_field=IntegerField())
+    return list(queryset.filter(matches).annotate(score=score).order_by("-score", "id")[:limit])
+
+
+def _customer_conditions(query, words, digits):
+    lowered = query.lower()
+    conditions = [
+        (Q(email_lower=lowered), 100),
+        (Q(email_lower__startswith=lowered), 60),
+    ]
+    if len(digits) >= 4:
+        conditions += [(Q(phone_digits=digits), 100), (Q(phone_digits__startswith=digits), 60)]
+    if len(words) >= 2:
+        first, last = words[0].lower(), words[-1].lower()
+        conditions += [
+            (Q(first_name_lower=first, last_name_lower=last), 80),
+            (Q(first_name_lower__startswith=first, last_name_lower__startswith=last), 50),
+            (Q(last_name_lower__startswith=first, first_name_lower__startswith=last), 50),
+        ]
+    elif words:
+        word = words[0].lower()
+        conditions += [
+            (Q(last_name_lower=word), 45),
+            (Q(last_name_lower__startswith=word), 40),
+            (Q(first_name_lower=word), 35),
+            (Q(first_name_lower__startswith=word), 30),
+        ]
+    return conditions
+
+
+def _vehicle_conditions(query, words):
+    vin = re.sub(r"\s", "", query).upper()
+    conditions = [(Q(vin_upper=vin), 100)]
+    if len(vin) >= 3:
+        conditions.append((Q(vin_upper__startswith=vin), 60))
+    if len(words) >= 2:
+        conditions.append((Q(brand_lower__startswith=words[0].lower(), model_lower__startswith=words[1].lower()), 50))
+    elif words:
+        word = words[0].lower()
+        conditions += [(Q(brand_lower__startswith=word), 30), (Q(model_lower__startswith=word), 30)]
+    return conditions
+
+
+def lookup(query, limit=20):
+    """
+    Finds customers (name, email, phone) and vehicles (VIN, brand, model)
+    for the front desk. Returns typed hits, best first.
+    """
+    query = query.strip()
+    if not query:
+        return []
+    words = _words(query)
+    digits = re.sub(r"\D", "", query)
+
+    customers = _ranked(Customer.objects.all(), _customer_conditions(query, words, digits), limit)
+    vehicles = _ranked(Vehicle.objects.all(), _vehicle_conditions(query, words), limit)
+
+    hits = [
+        {
+            "type": "customer",
+            "id": customer.id,
+            "label": f"{customer.first_name} {customer.last_name}",
+            "detail": customer.email,
+            "score": customer.score,
+        }
+        for customer in customers
+    ] + [
+        {
+            "type": "vehicle",
+            "id": vehicle.id,
+            "label": f"{vehicle.brand} {vehicle.model} ({vehicle.year})",
+            "detail": vehicle.vin,
+            "score": vehicle.score,
+            "customer_id": vehicle.customer_id,
+        }
+        for vehicle in vehicles
+    ]
+    hits.sort(key=lambda hit: -hit["score"])
+    return hits[:limit]
@@ -0,0 +1,105 @@
+"""
+Settlement of invoices by their payments.
+
+``Invoice.amount_paid`` is the sum of the payments of an invoice and
+``Invoice.is_paid`` says whether they cover ``total_amount``, or whether the
+invoice was marked paid by hand (``Invoice.paid_manually``, see ``mark_paid``).
+Both are kept up to date by the payment signals (see signals.py) in the
+transaction that writes the payment. Every change is applied relative to the
+stored value:
+
+    UPDATE pitlane_invoice SET amount_paid = amount_paid + <delta>,
+                               is_paid = (paid_manually OR amount_paid + <delta> >= total_amount)
+    WHERE id IN (...)
+
+so two payments booked at the same time on the same invoice add up under the
+row lock instead of overwriting each other's sum. ``settle_invoices`` (the
+``settle_invoices`` command) recomputes both columns from the payments and
+repairs the invoices that have drifted.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import BooleanField, Case, DecimalField, F, Sum, Value, When
+
+from .models import Invoice, Payment
+
+# Invoices per UPDATE statement
+BATCH_SIZE = 500
+
+AMOUNT = Payment._meta.get_field("amount")
+
+
+def as_amount(value):
+    """A payment amount as stored (floats from the API become 2-place Decimals)."""
+    return AMOUNT.to_python(value) if value is not None else Decimal("0.00")
+
+
+def _covered(amount_paid):
+    return Case(
+        When(paid_manually=True, then=Value(True)),
+        When(total_amount__lte=amount_paid, then=Value(True)),
+        default=Value(False),
+        output_field=BooleanField(),
+    )
+
+
+def _per_invoice(amounts):
+    return Case(
+        *[When(id=invoice_id, then=Value(amount)) for invoice_id, amount in amounts.items()],
+        output_field=DecimalField(max_digits=10, decimal_places=2),
+    )
+
+
+def mark_paid(invoice, paid=True):
+    """
+    Marks an invoice paid by hand, or with ``paid=False`` takes that back, after
+    which ``is_paid`` follows the payments again. The caller saves the invoice.
+    """
+    invoice.paid_manually = paid
+    invoice.is_paid = paid or as_amount(invoice.amount_paid) >= as_amount(invoice.total_amount)
+
+
+def apply_payment_changes(changes):
+    """
+    Books payment changes, given as ``(payment_id, invoice_id, amount)`` with a
+    negative amount for money taken back, on their invoices.
+    """
+    deltas = defaultdict(Decimal)
+    for _, invoice_id, amount in changes:
+        deltas[invoice_id] += amount
+    invoice_ids = sorted(invoice_id for invoice_id, delta in deltas.items() if delta)
+    with transaction.atomic():
+        for start in range(0, len(invoice_ids), BATCH_SIZE):
+            batch = invoice_ids[start:start + BATCH_SIZE]
+            amount_paid = F("amount_paid") + _per_invoice({invoice_id: deltas[invoice_id] for invoice_id in batch})
+            Invoice.objects.filter(id__in=batch).update(amount_paid=amount_paid, is_paid=_covered(amount_paid))
+
+
+def refresh_is_paid(invoice_ids):
+    """Re-evaluates ``is_paid`` after the total of the given invoices changed."""
+    Invoice.objects.filter(id__in=list(invoice_ids)).update(is_paid=_covered(F("amount_paid")))
+
+
+def settle_invoices(repair=True, batch_size=BATCH_SIZE):
+    """
+    Compares ``amount_paid``/``is_paid`` of every invoice with its payments,
+    summed by one grouped query, and with ``repair`` writes the correct values
+    into the invoices that differ. Returns the number of drifted invoices.
+    Payments booked while it runs may be overwritten, so run it when it is quiet.
+    """
+    paid = dict(
+        Payment.objects.order_by().values("invoice").annotate(total=Sum("amount")).values_list("invoice", "total")
+    )
+    drifted = []
+    rows = Invoice.objects.order_by("id").values_list("id", "total_amount", "amount_paid", "is_paid", "paid_manually")
+    for invoice_id, total_amount, amount_paid, is_paid, paid_manually in rows.iterator(chunk_size=batch_size):
+        expected = paid.get(invoice_id) or Decimal("0.00")
+        covered = paid_manually or expected >= total_amount
+        if amount_paid != expected or is_paid != covered:
+            drifted.append(Invoice(id=invoice_id, amount_paid=expected, is_paid=covered))
+    if repair:
+        with transaction.atomic():
+            Invoice.objects.bulk_update(drifted, ["amount_paid", "is_paid"], batch_size=batch_size)
+    return len(drifted)
@@ -0,0 +1,234 @@
+"""
+Signal receivers that keep denormalized data in sync with its source rows.
+
+Inside a ``batched()`` block the receivers only collect the affected keys and
+do their refresh work once when the block ends, so bulk writes touch every
+denormalized row once instead of once per written row.
+"""
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from .cache import invalidate_catalogs
+from .inventory import consume_orders, release_line_items, release_orders, reserve_orders
+from .models import Invoice, Mechanic, Order, OrderPart, OrderService, OrderStatus, Part, Payment, Service
+from .pricing import refresh_order_totals
+from .settlement import apply_payment_changes, as_amount, refresh_is_paid
+from .statuses import refresh_current_status
+from .workload import refresh_workload
+
+_pending = ContextVar("pitlane_pending_refreshes", default=None)
+
+
+@contextmanager
+def batched():
+    """Defers the refresh work of the receivers to the end of the block."""
+    if _pending.get() is not None:
+        yield
+        return
+    pending = defaultdict(set)
+    token = _pending.set(pending)
+    try:
+        yield
+    finally:
+        _pending.reset(token)
+    for refresh, keys in pending.items():
+        refresh(keys)
+
+
+def schedule(refresh, keys):
+    """Runs ``refresh(keys)`` now, or at the end of the surrounding batched() block."""
+    pending = _pending.get()
+    if pending is None:
+        refresh(set(keys))
+    else:
+        pending[refresh].update(keys)
+
+
+def refresh_totals_for_services(service_ids):
+    refresh_order_totals(Order.objects.filter(is_closed=False, services__service__in=service_ids))
+
+
+def refresh_totals_for_parts(part_ids):
+    refresh_order_totals(Order.objects.filter(is_closed=False, parts__part__in=part_ids))
+
+
+def refresh_workload_for_orders(order_ids):
+    refresh_workload(Order.objects.filter(id__in=order_ids, mechanic__isnull=False).values_list("mechanic_id", flat=True).distinct())
+
+
+def refresh_workload_for_services(service_ids):
+    open_orders = Order.objects.filter(is_closed=False, mechanic__isnull=False, services__service__in=service_ids)
+    refresh_workload(open_orders.values_list("mechanic_id", flat=True).distinct())
+
+
+def invalidate_catalogs_on_commit(catalogs):
+    # a reader between now and the commit would cache the old rows under the new version
+    transaction.on_commit(lambda: invalidate_catalogs(catalogs))
+
+
+def _affected_orders(instance):
+    """The order of a child row, plus the one it belonged to before it was moved."""
+    orders = {instance.order_id}
+    loaded = getattr(instance, "_loaded_order_id", None)
+    if loaded is not None:
+        orders.add(loaded)
+    instance._loaded_order_id = instance.order_id
+    return orders
+
+
+@receiver(post_init, sender=OrderService)
+@receiver(post_init, sender=OrderPart)
+@receiver(post_init, sender=OrderStatus)
+def remember_order(sender, instance, **kwargs):
+    # __dict__ instead of the attribute, so a deferred order_id is not loaded
+    instance._loaded_order_id = instance.__dict__.get("order_id")
+
+
+@receiver(post_save, sender=OrderService)
+@receiver(post_delete, sender=OrderService)
+@receiver(post_save, sender=OrderPart)
+@receiver(post_delete, sender=OrderPart)
+def update_order_total(sender, instance, **kwargs):
+    """Recomputes the total (and for services the workload) of the order whose line items changed."""
+    orders = _affected_orders(instance)
+    schedule(refresh_order_totals, orders)
+    if sender is OrderService:
+        schedule(refresh_workload_for_orders, orders)
+
+
+@receiver(post_init, sender=Order)
+def remember_assignment(sender, instance, **kwargs):
+    instance._loaded_assignment = (instance.__dict__.get("mechanic_id"), instance.__dict__.get("is_closed"))
+
+
+@receiver(post_save, sender=Order)
+def update_workload_for_order(sender, instance, created, **kwargs):
+    """A new, reassigned, closed or reopened order changes the workload of its mechanics."""
+    loaded, instance._loaded_assignment = instance._loaded_assignment, (instance.mechanic_id, instance.is_closed)
+    if created or loaded != instance._loaded_assignment:
+        mechanics = {loaded[0], instance.mechanic_id} - {None}
+        if mechanics:
+            schedule(refresh_workload, mechanics)
+
+
+@receiver(post_delete, sender=Order)
+def update_workload_for_deleted_order(sender, instance, **kwargs):
+    """Deleting an open order takes it off its mechanic's workload."""
+    if instance.mechanic_id is not None and not instance.is_closed:
+        schedule(refresh_workload, [instance.mechanic_id])
+
+
+@receiver(post_save, sender=OrderStatus)
+@receiver(post_delete, sender=OrderStatus)
+def update_current_status(sender, instance, **kwargs):
+    """Copies the latest status into the order after its history changed."""
+    schedule(refresh_current_status, _affected_orders(instance))
+
+
+@receiver(post_delete, sender=OrderPart)
+def release_deleted_line_item(sender, instance, **kwargs):
+    """Returns the stock reserved for a deleted line item."""
+    if instance.reserved_quantity:
+        schedule(release_line_items, [(instance.id, instance.part_id, instance.reserved_quantity)])
+
+
+@receiver(post_save, sender=OrderStatus)
+def release_cancelled_order(sender, instance, **kwargs):
+    """
+    Cancelling an order returns the stock reserved for its parts, any other
+    status reserves it again after a cancellation, delivering it consumes the stock.
+    """
+    if instance.status == "cancelled":
+        schedule(release_orders, [instance.order_id])
+        return
+    schedule(reserve_orders, [instance.order_id])
+    if instance.status == "delivered":
+        schedule(consume_orders, [instance.order_id])
+
+
+@receiver(post_init, sender=Order)
+def remember_closed(sender, instance, **kwargs):
+    instance._loaded_closed = instance.__dict__.get("is_closed")
+
+
+@receiver(post_save, sender=Order)
+def consume_closed_order(sender, instance, created, **kwargs):
+    """Closing an order consumes the stock reserved for its parts."""
+    loaded, instance._loaded_closed = instance._loaded_closed, instance.is_closed
+    if instance.is_closed and not loaded and not created:
+        schedule(consume_orders, [instance.id])
+
+
+@receiver(post_init, sender=Payment)
+def remember_payment(sender, instance, **kwargs):
+    instance._loaded_payment = (instance.__dict__.get("invoice_id"), instance.__dict__.get("amount"))
+
+
+@receiver(post_save, sender=Payment)
+def settle_saved_payment(sender, instance, created, **kwargs):
+    """Books a new or changed payment on its invoice (and off the one it was moved from)."""
+    changes = [(instance.id, instance.invoice_id, as_amount(instance.amount))]
+    loaded_invoice, loaded_amount = instance._loaded_payment
+    if not created and loaded_invoice is not None:
+        changes.append((instance.id, loaded_invoice, -as_amount(loaded_amount)))
+    instance._loaded_payment = (instance.invoice_id, instance.amount)
+    schedule(apply_payment_changes, changes)
+
+
+@receiver(post_delete, sender=Payment)
+def settle_deleted_payment(sender, instance, **kwargs):
+    """Takes a deleted payment back from its invoice."""
+    invoice_id, amount = instance._loaded_payment
+    if invoice_id is not None:
+        schedule(apply_payment_changes, [(instance.id, invoice_id, -as_amount(amount))])
+
+
+@receiver(post_init, sender=Invoice)
+def remember_invoice_total(sender, instance, **kwargs):
+    instance._loaded_total = instance.__dict__.get("total_amount")
+
+
+@receiver(post_save, sender=Invoice)
+def settle_changed_total(sender, instance, created, **kwargs):
+    """A new total can make the payments of an invoice (in)sufficient."""
+    loaded_total, instance._loaded_total = instance._loaded_total, instance.total_amount
+    if not created and loaded_total is not None and as_amount(loaded_total) != as_amount(instance.total_amount):
+        schedule(refresh_is_paid, [instance.id])
+
+
+@receiver(post_save, sender=Service)
+def update_totals_for_service_price(sender, instance, created, **kwargs):
+    """Open orders follow price changes, closed orders keep their totals."""
+    if not created:
+        schedule(refresh_totals_for_services, [instance.id])
+
+
+@receiver(post_save, sender=Service)
+def update_workload_for_service_hours(sender, instance, created, **kwargs):
+    """Open orders follow changed time estimates as well."""
+    if not created:
+        schedule(refresh_workload_for_services, [instance.id])
+
+
+@receiver(post_save, sender=Part)
+def update_totals_for_part_price(sender, instance, created, **kwargs):
+    """Open orders follow price changes, closed orders keep their totals."""
+    if not created:
+        schedule(refresh_totals_for_parts, [instance.id])
+
+
+@receiver(post_save, sender=Part)
+@receiver(post_delete, sender=Part)
+@receiver(post_save, sender=Service)
+@receiver(post_delete, sender=Service)
+@receiver(post_save, sender=Mechanic)
+@receiver(post_delete, sender=Mechanic)
+def invalidate_catalog_cache(sender, instance, **kwargs):
+    """Cached catalog responses become unreachable as soon as a row changes."""
+    catalog = {Part: "parts", Service: "services", Mechanic: "mechanics"}[sender]
+    schedule(invalidate_catalogs_on_commit, [catalog])
@@ -0,0 +1,45 @@
+"""
+Current-status projection of orders.
+
+The status history of an order lives in ``OrderStatus`` rows. Its latest entry
+is copied to ``Order.current_status`` / ``Order.status_changed_at`` by a single
+UPDATE whenever a status row of the order is written or deleted (see
+signals.py), so "all orders waiting for parts" is an index lookup on
+``pitlane_order`` instead of a scan over the whole history.
+"""
+from django.db.models import OuterRef, QuerySet, Subquery
+
+from .models import Order, OrderStatus
+
+# Orders per UPDATE in rebuild_current_status
+BATCH_SIZE = 1000
+
+
+def _latest_status(field):
+    latest = OrderStatus.objects.filter(order=OuterRef("pk")).order_by("-timestamp", "-id").values(field)[:1]
+    return Subquery(latest)
+
+
+def refresh_current_status(orders):
+    """
+    Copies the latest status of the given orders (a queryset or a list of ids)
+    into the projection in one UPDATE statement. Returns the number of orders updated.
+    """
+    if not isinstance(orders, QuerySet):
+        orders = Order.objects.filter(id__in=list(orders))
+    return orders.update(current_status=_latest_status("status"), status_changed_at=_latest_status("timestamp"))
+
+
+def rebuild_current_status(batch_size=BATCH_SIZE):
+    """
+    Recomputes the projection of every order, one UPDATE per id range.
+    Returns the number of orders updated.
+    """
+    updated = 0
+    last_id = 0
+    while True:
+        batch = list(Order.objects.filter(id__gt=last_id).order_by("id").values_list("id", flat=True)[:batch_size])
+        if not batch:
+            return updated
+        updated += refresh_current_status(Order.objects.filter(id__gte=batch[0], id__lte=batch[-1]))
+        last_id = batch[-1]
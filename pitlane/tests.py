@@ -1,3 +1,1215 @@
-from django.test import TestCase
+import json
+import threading
+from unittest import skipUnless
+
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+
+from asgiref.sync import iscoroutinefunction
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection, transaction
+from django.http import HttpResponse
+from django.test import Client, RequestFactory, TestCase, TransactionTestCase, override_settings, skipUnlessDBFeature
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from pitlanebackend.metrics import MetricsMiddleware, registry
+from pitlanebackend.pagination import encode_cursor
+from pitlanebackend.routers import PIN_COOKIE, ReplicaMiddleware, ReplicaRouter
+
+from .admin import EstimatedCountPaginator
+from .models import (
+    Customer, Vehicle, Mechanic, Part, Service,
+    Order, OrderStatus, OrderService, OrderPart,
+    Invoice, Payment, Notification, DailyRollup,
+)
+from .pricing import compute_order_totals
 
 # Create your tests here.
+
+class CursorPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Customer.objects.bulk_create([
+            Customer(first_name=f"Kunde{i}", last_name="Test", email=f"kunde{i}@example.com", address="Hauptstr. 1")
+            for i in range(7)
+        ])
+
+    def test_walks_all_pages_without_gaps_or_duplicates(self):
+        seen = []
+        cursor = None
+        while True:
+            params = {"limit": 3}
+            if cursor:
+                params["cursor"] = cursor
+            response = self.client.get("/api/customers", params)
+            self.assertEqual(response.status_code, 200)
+            data = response.json()
+            self.assertEqual(data["limit"], 3)
+            seen += [item["id"] for item in data["items"]]
+            cursor = data["next_cursor"]
+            if cursor is None:
+                break
+
+        self.assertEqual(seen, list(Customer.objects.order_by("id").values_list("id", flat=True)))
+
+    def test_page_costs_a_single_query(self):
+        first = self.client.get("/api/customers", {"limit": 2}).json()
+        with self.assertNumQueries(1):
+            self.client.get("/api/customers", {"limit": 2, "cursor": first["next_cursor"]})
+
+    def test_invalid_cursor_is_rejected(self):
+        response = self.client.get("/api/customers", {"cursor": "kaputt"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_null_or_wrongly_typed_cursor_values_are_rejected(self):
+        self.assertEqual(self.client.get("/api/customers", {"cursor": encode_cursor([None])}).status_code, 400)
+        for values in ([5, 1], [[1], 1]):
+            response = self.client.get("/api/orders", {"ordering": "-order_date", "cursor": encode_cursor(values)})
+            self.assertEqual(response.status_code, 400)
+
+class SparseFieldsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Customer.objects.bulk_create([
+            Customer(first_name=f"Kunde{i}", last_name="Test", email=f"kunde{i}@example.com", address="Hauptstr. 1")
+            for i in range(3)
+        ])
+        Part.objects.create(name="Ölfilter", part_number="OF-1", description="x" * 5000, price=Decimal("12.50"))
+
+    def test_only_selected_fields_are_fetched_and_returned(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/api/parts", {"fields": "name,price"})
+        self.assertEqual(response.json()["items"], [{"name": "Ölfilter", "price": 12.5}])
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn("description", queries[0]["sql"])
+
+    def test_values_match_the_full_response(self):
+        full = self.client.get("/api/customers", {"limit": 2}).json()
+        sparse = self.client.get("/api/customers", {"limit": 2, "fields": "id,date_joined"}).json()
+        self.assertEqual(sparse["items"], [{"id": item["id"], "date_joined": item["date_joined"]} for item in full["items"]])
+        self.assertEqual(sparse["next_cursor"], full["next_cursor"])
+
+        rest = self.client.get("/api/customers", {"fields": "first_name", "cursor": sparse["next_cursor"]}).json()
+        self.assertEqual(rest["items"], [{"first_name": "Kunde2"}])
+
+    def test_unknown_and_nested_fields_are_rejected(self):
+        self.assertEqual(self.client.get("/api/customers", {"fields": "id,password"}).status_code, 400)
+        self.assertEqual(self.client.get("/api/vehicles", {"fields": "id,customer"}).status_code, 400)
+
+    def test_flat_lists_are_built_from_values(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/api/parts")
+        self.assertEqual(response.json()["items"], [{
+            "id": Part.objects.get().id, "name": "Ölfilter", "part_number": "OF-1", "description": "x" * 5000,
+            "price": 12.5, "stock_quantity": 0,
+        }])
+        self.assertEqual(len(queries), 1)
+
+        # nested schemas still go through the model instances
+        customer = Customer.objects.first()
+        Vehicle.objects.create(brand="VW", model="Golf", year=2018, vin="WVW00000000000001", customer=customer)
+        self.assertEqual(self.client.get("/api/vehicles").json()["items"][0]["customer"]["id"], customer.id)
+
+class ExportTests(TestCase):
+    def test_ndjson_export_streams_one_row_per_line(self):
+        for i in range(3):
+            Customer.objects.create(first_name=f"Kunde{i}", last_name="Test", email=f"kunde{i}@example.com", address="Hauptstr. 1")
+
+        response = self.client.get("/api/export/customers")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual([json.loads(line)["first_name"] for line in lines], ["Kunde0", "Kunde1", "Kunde2"])
+
+    def test_json_export_is_a_valid_array(self):
+        response = self.client.get("/api/export/customers", {"format": "json"})
+        self.assertEqual(json.loads(b"".join(response.streaming_content)), [])
+
+    def test_unknown_resource(self):
+        self.assertEqual(self.client.get("/api/export/nope").status_code, 404)
+
+def create_order(customer=None, **kwargs):
+    """Creates an order with its customer and vehicle for tests."""
+    if customer is None:
+        count = Customer.objects.count()
+        customer = Customer.objects.create(first_name="Max", last_name="Mustermann", email=f"max{count}@example.com", address="Hauptstr. 1")
+    vehicle = Vehicle.objects.create(brand="VW", model="Golf", year=2018, vin=f"WVW{Vehicle.objects.count():014d}", customer=customer)
+    return Order.objects.create(customer=customer, vehicle=vehicle, **kwargs)
+
+class ListFilterTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.first = create_order()
+        cls.others = [create_order(customer=cls.first.customer) for _ in range(3)]
+        create_order(is_closed=True)
+        now = timezone.now()
+        for days, order in enumerate([cls.first, *cls.others]):
+            Order.objects.filter(id=order.id).update(order_date=now - timedelta(days=days))
+        invoice = Invoice.objects.create(order=cls.first, due_date=now, total_amount=Decimal("20.00"))
+        Invoice.objects.create(order=cls.others[0], due_date=now, total_amount=Decimal("10.00"), is_paid=True)
+        Payment.objects.create(invoice=invoice, amount=Decimal("5.00"), payment_method="cash")
+        Payment.objects.create(invoice=invoice, amount=Decimal("5.00"), payment_method="card")
+
+    def ids(self, response):
+        self.assertEqual(response.status_code, 200)
+        return [item["id"] for item in response.json()["items"]]
+
+    def test_filters_and_ordering_are_paged_by_the_database(self):
+        params = {"customer_id": self.first.customer_id, "is_closed": False, "ordering": "-order_date", "limit": 2}
+        with CaptureQueriesContext(connection) as queries:
+            page = self.client.get("/api/orders", params).json()
+        self.assertEqual(len(queries), 1)
+        self.assertEqual([item["id"] for item in page["items"]], [self.first.id, self.others[0].id])
+
+        rest = self.client.get("/api/orders", {**params, "cursor": page["next_cursor"]})
+        self.assertEqual(self.ids(rest), [order.id for order in self.others[1:]])
+        self.assertIsNone(rest.json()["next_cursor"])
+
+        since = (timezone.now() - timedelta(days=1, hours=1)).isoformat()
+        self.assertEqual(self.ids(self.client.get("/api/orders", {"order_date_from": since, "is_closed": False, "fields": "id"})), [self.first.id, self.others[0].id])
+
+    def test_invoices_and_payments(self):
+        self.assertEqual(self.ids(self.client.get("/api/invoices", {"is_paid": False})), [self.first.invoice.id])
+        payments = self.client.get("/api/payments", {"payment_method": "card"}).json()["items"]
+        self.assertEqual([payment["payment_method"] for payment in payments], ["card"])
+
+    def test_unknown_ordering_is_rejected(self):
+        self.assertEqual(self.client.get("/api/orders", {"ordering": "description"}).status_code, 400)
+        self.assertEqual(self.client.get("/api/invoices", {"ordering": "-due_date"}).status_code, 200)
+
+class OrderFullTests(TestCase):
+    def add_line_items(self, order, count):
+        for i in range(count):
+            service = Service.objects.create(name=f"Service {order.id}-{i}", price=Decimal("50.00"))
+            part = Part.objects.create(name=f"Teil {order.id}-{i}", part_number=f"P-{order.id}-{i}", price=Decimal("10.00"))
+            OrderService.objects.create(order=order, service=service, quantity=1)
+            OrderPart.objects.create(order=order, part=part, quantity=2)
+            OrderStatus.objects.create(order=order, status="in_progress")
+
+    def create_full_order(self, line_items):
+        mechanic = Mechanic.objects.create(first_name="Erika", last_name="Schrauber")
+        order = create_order(mechanic=mechanic)
+        self.add_line_items(order, line_items)
+        invoice = Invoice.objects.create(order=order, due_date=timezone.now() + timedelta(days=14), total_amount=Decimal("100.00"))
+        Payment.objects.create(invoice=invoice, amount=Decimal("40.00"), payment_method="cash")
+        return order
+
+    def test_order_full_contains_everything(self):
+        order = self.create_full_order(line_items=2)
+        data = self.client.get(f"/api/orders/{order.id}/full").json()
+        self.assertEqual(data["customer"]["id"], order.customer_id)
+        self.assertEqual(data["vehicle"]["id"], order.vehicle_id)
+        self.assertEqual(data["mechanic"]["last_name"], "Schrauber")
+        self.assertEqual(len(data["statuses"]), 2)
+        self.assertEqual(len(data["services"]), 2)
+        self.assertEqual(data["parts"][0]["part"]["price"], 10.0)
+        self.assertEqual(data["invoice"]["payments"][0]["amount"], 40.0)
+
+    def test_order_full_without_invoice(self):
+        order = create_order()
+        data = self.client.get(f"/api/orders/{order.id}/full").json()
+        self.assertIsNone(data["invoice"])
+        self.assertIsNone(data["mechanic"])
+
+    def test_query_count_does_not_grow_with_line_items(self):
+        small = self.create_full_order(line_items=1)
+        large = self.create_full_order(line_items=25)
+        for order in (small, large):
+            with self.assertNumQueries(5):
+                response = self.client.get(f"/api/orders/{order.id}/full")
+            self.assertEqual(response.status_code, 200)
+
+    def test_list_query_count_does_not_grow_with_orders(self):
+        for _ in range(5):
+            self.create_full_order(line_items=3)
+        with self.assertNumQueries(5):
+            response = self.client.get("/api/orders/full")
+        self.assertEqual(len(response.json()["items"]), 5)
+
+class OrderTotalTests(TestCase):
+    def setUp(self):
+        self.order = create_order()
+        self.service = Service.objects.create(name="Ölwechsel", price=Decimal("49.90"))
+        self.part = Part.objects.create(name="Ölfilter", part_number="OF-1", price=Decimal("12.50"), stock_quantity=10)
+
+    def total(self):
+        self.order.refresh_from_db()
+        return self.order.total_amount
+
+    def test_total_follows_line_item_changes(self):
+        self.client.post(f"/api/orders/{self.order.id}/add_service/{self.service.id}")
+        response = self.client.post(f"/api/orders/{self.order.id}/add_part/{self.part.id}?quantity=2")
+        self.assertEqual(self.total(), Decimal("74.90"))
+
+        orderpart_id = response.json()["id"]
+        self.client.put(f"/api/orderparts/{orderpart_id}", {"quantity": 4}, content_type="application/json")
+        self.assertEqual(self.total(), Decimal("99.90"))
+
+        self.client.delete(f"/api/orderparts/{orderpart_id}")
+        self.assertEqual(self.total(), Decimal("49.90"))
+
+    def test_price_change_updates_open_orders_only(self):
+        closed = create_order(is_closed=True)
+        OrderService.objects.create(order=self.order, service=self.service)
+        OrderService.objects.create(order=closed, service=self.service)
+
+        self.service.price = Decimal("59.90")
+        self.service.save()
+
+        closed.refresh_from_db()
+        self.assertEqual(self.total(), Decimal("59.90"))
+        self.assertEqual(closed.total_amount, Decimal("49.90"))
+
+    def test_invoice_defaults_to_order_total(self):
+        OrderPart.objects.create(order=self.order, part=self.part, quantity=3)
+        response = self.client.post("/api/invoices", {"order_id": self.order.id, "due_date": "2026-12-31T00:00:00Z", "is_paid": False}, content_type="application/json")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()["total_amount"], 37.5)
+
+    def test_compute_and_repair_totals(self):
+        OrderService.objects.create(order=self.order, service=self.service, quantity=2)
+        Order.objects.filter(id=self.order.id).update(total_amount=0)
+        self.assertEqual(compute_order_totals([self.order.id]), {self.order.id: Decimal("99.80")})
+
+        call_command("recalculate_order_totals", stdout=StringIO())
+        self.assertEqual(self.total(), Decimal("99.80"))
+
+class CurrentStatusTests(TestCase):
+    def setUp(self):
+        self.order = create_order()
+
+    def post_status(self, order, status):
+        response = self.client.post("/api/orderstatuses", {"order_id": order.id, "status": status, "note": ""}, content_type="application/json")
+        self.assertEqual(response.status_code, 201)
+        return response.json()["id"]
+
+    def current(self, order):
+        order.refresh_from_db()
+        return order.current_status
+
+    def test_projection_follows_status_writes(self):
+        self.assertIsNone(self.current(self.order))
+        self.post_status(self.order, "received")
+        latest = self.post_status(self.order, "waiting_for_parts")
+        self.assertEqual(self.current(self.order), "waiting_for_parts")
+        self.assertIsNotNone(self.order.status_changed_at)
+
+        self.client.put(f"/api/orderstatuses/{latest}", {"status": "in_progress"}, content_type="application/json")
+        self.assertEqual(self.current(self.order), "in_progress")
+
+        self.client.delete(f"/api/orderstatuses/{latest}")
+        self.assertEqual(self.current(self.order), "received")
+
+    def test_moving_a_status_refreshes_both_orders(self):
+        other = create_order()
+        status_id = self.post_status(self.order, "completed")
+        self.client.put(f"/api/orderstatuses/{status_id}", {"order_id": other.id}, content_type="application/json")
+        self.assertIsNone(self.current(self.order))
+        self.assertEqual(self.current(other), "completed")
+
+    def test_filter_by_status(self):
+        waiting = create_order()
+        self.post_status(self.order, "in_progress")
+        self.post_status(waiting, "waiting_for_parts")
+
+        response = self.client.get("/api/orders", {"status": "waiting_for_parts"})
+        self.assertEqual([order["id"] for order in response.json()["items"]], [waiting.id])
+        self.assertEqual(response.json()["items"][0]["current_status"], "waiting_for_parts")
+
+    def test_rebuild(self):
+        OrderStatus.objects.create(order=self.order, status="delivered")
+        Order.objects.update(current_status=None, status_changed_at=None)
+
+        call_command("rebuild_order_status", stdout=StringIO())
+        self.assertEqual(self.current(self.order), "delivered")
+
+class DashboardTests(TestCase):
+    def setUp(self):
+        now = timezone.now()
+        self.mechanic = Mechanic.objects.create(first_name="Karl", last_name="Schrauber")
+        part = Part.objects.create(name="Bremsbelag", part_number="BB-1", price=Decimal("30.00"))
+
+        delivered = create_order(mechanic=self.mechanic, is_closed=True)
+        create_order(mechanic=self.mechanic)
+        OrderPart.objects.create(order=delivered, part=part, quantity=4)
+        received = OrderStatus.objects.create(order=delivered, status="received")
+        done = OrderStatus.objects.create(order=delivered, status="delivered")
+        OrderStatus.objects.filter(id=received.id).update(timestamp=now - timedelta(days=3, hours=6))
+        OrderStatus.objects.filter(id=done.id).update(timestamp=now - timedelta(days=3))
+
+        invoice = Invoice.objects.create(order=delivered, due_date=now - timedelta(days=1), total_amount=Decimal("120.00"))
+        payment = Payment.objects.create(invoice=invoice, amount=Decimal("50.00"), payment_method="card")
+        Payment.objects.filter(id=payment.id).update(payment_date=now - timedelta(days=2))
+
+    def get(self):
+        response = self.client.get("/api/dashboard", {"days": 7})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_live_figures(self):
+        data = self.get()
+        self.assertEqual(data["open_orders_per_mechanic"], [{"mechanic_id": self.mechanic.id, "name": "Karl Schrauber", "open_orders": 1}])
+        self.assertEqual(data["unpaid_invoices"], {"count": 1, "total": 120.0, "overdue_count": 1, "overdue_total": 120.0})
+        self.assertEqual(data["revenue"], 50.0)
+        self.assertEqual(data["orders_delivered"], 1)
+        self.assertEqual(data["average_turnaround_hours"], 6.0)
+        self.assertEqual(data["parts_consumption"][0]["quantity"], 4)
+        self.assertEqual(len(data["days"]), 7)
+
+    def test_rollups_give_the_same_figures(self):
+        live = self.get()
+        out = StringIO()
+        call_command("refresh_dashboard_rollups", stdout=out)
+        self.assertTrue(DailyRollup.objects.exists())
+        self.assertFalse(DailyRollup.objects.filter(day=timezone.localdate()).exists())
+        self.assertEqual(self.get(), live)
+
+        # rolled up days are read from the table, not from the source rows
+        Payment.objects.update(amount=Decimal("0.01"))
+        self.assertEqual(self.get()["revenue"], 50.0)
+        call_command("refresh_dashboard_rollups", since=timezone.localdate() - timedelta(days=7), stdout=out)
+        self.assertEqual(self.get()["revenue"], 0.01)
+
+class ReceivablesTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        now = timezone.now()
+        cls.customer = create_order().customer
+        cls.invoices = {}
+        for days in (-5, 10, 45, 75, 200):
+            order = create_order(customer=cls.customer)
+            cls.invoices[days] = Invoice.objects.create(order=order, due_date=now - timedelta(days=days), total_amount=Decimal("100.00"))
+        Payment.objects.create(invoice=cls.invoices[10], amount=Decimal("30.00"), payment_method="card")
+        Payment.objects.create(invoice=cls.invoices[45], amount=Decimal("100.00"), payment_method="card")
+        Invoice.objects.filter(id=cls.invoices[200].id).update(is_paid=True)
+        # another customer's invoice
+        Invoice.objects.create(order=create_order(), due_date=now - timedelta(days=100), total_amount=Decimal("50.00"))
+
+    def test_open_invoices_oldest_first_with_balance_and_bucket(self):
+        first = self.client.get("/api/receivables", {"limit": 2}).json()
+        rest = self.client.get("/api/receivables", {"limit": 2, "cursor": first["next_cursor"]}).json()
+        rows = [(item["outstanding"], item["bucket"]) for item in first["items"] + rest["items"]]
+        self.assertEqual(rows, [(50.0, "over_90"), (100.0, "61_90"), (70.0, "0_30"), (100.0, "current")])
+
+        mine = self.client.get("/api/receivables", {"customer_id": self.customer.id, "bucket": "0_30"}).json()["items"]
+        self.assertEqual([(item["id"], item["amount_paid"]) for item in mine], [(self.invoices[10].id, 30.0)])
+
+    def test_summary_and_customer_totals(self):
+        summary = self.client.get("/api/receivables/summary").json()
+        self.assertEqual(summary["invoices"], 4)
+        self.assertEqual(summary["outstanding"], 320.0)
+        self.assertEqual(summary["buckets"], {"current": 100.0, "0_30": 70.0, "31_60": 0.0, "61_90": 100.0, "over_90": 50.0})
+
+        customers = self.client.get("/api/receivables/customers").json()
+        self.assertEqual([(row["customer_id"], row["outstanding"], row["invoices"]) for row in customers][0], (self.customer.id, 270.0, 3))
+        self.assertEqual(len(customers), 2)
+
+class TimelineTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        start = timezone.now() - timedelta(days=30)
+        part = Part.objects.create(name="Bremsbelag", part_number="BB-1", price=Decimal("30.00"))
+        service = Service.objects.create(name="Inspektion", price=Decimal("99.00"))
+        cls.first = create_order()
+        cls.customer, cls.vehicle = cls.first.customer, cls.first.vehicle
+        cls.second = Order.objects.create(customer=cls.customer, vehicle=cls.vehicle)
+        for days, order in ((0, cls.first), (10, cls.second)):
+            Order.objects.filter(id=order.id).update(order_date=start + timedelta(days=days))
+            OrderPart.objects.create(order=order, part=part, quantity=2)
+            OrderService.objects.create(order=order, service=service)
+            status = OrderStatus.objects.create(order=order, status="received", note="Kunde wartet")
+            OrderStatus.objects.filter(id=status.id).update(timestamp=start + timedelta(days=days, hours=1))
+        invoice = Invoice.objects.create(order=cls.first, due_date=start + timedelta(days=14), total_amount=Decimal("159.00"))
+        Invoice.objects.filter(id=invoice.id).update(issue_date=start + timedelta(days=1))
+        payment = Payment.objects.create(invoice=invoice, amount=Decimal("159.00"), payment_method="card")
+        Payment.objects.filter(id=payment.id).update(payment_date=start + timedelta(days=2))
+        # another vehicle of the same customer, and another customer
+        cls.other_vehicle_order = create_order(customer=cls.customer)
+        create_order()
+
+    def test_vehicle_history_newest_first(self):
+        items = self.client.get(f"/api/vehicles/{self.vehicle.id}/history").json()["items"]
+        self.assertEqual(
+            [(item["kind"], item["order_id"]) for item in items],
+            [("status", self.second.id), ("service", self.second.id), ("part", self.second.id), ("order", self.second.id),
+             ("payment", self.first.id), ("invoice", self.first.id),
+             ("status", self.first.id), ("service", self.first.id), ("part", self.first.id), ("order", self.first.id)],
+        )
+        self.assertEqual(items[2]["amount"], 60.0)
+        self.assertEqual(items[2]["label"], "Bremsbelag")
+        self.assertEqual(items[5]["label"], "paid")
+        self.assertEqual(items[6]["note"], "Kunde wartet")
+
+    def test_pages_cost_the_same_queries(self):
+        full = self.client.get(f"/api/customers/{self.customer.id}/timeline").json()["items"]
+        self.assertEqual({item["vehicle_id"] for item in full}, {self.vehicle.id, self.other_vehicle_order.vehicle_id})
+
+        paged, cursor = [], None
+        while True:
+            with self.assertNumQueries(2):
+                page = self.client.get(f"/api/customers/{self.customer.id}/timeline", {"limit": 3, **({"cursor": cursor} if cursor else {})}).json()
+            paged += page["items"]
+            cursor = page["next_cursor"]
+            if cursor is None:
+                break
+        self.assertEqual(paged, full)
+
+    def test_errors(self):
+        self.assertEqual(self.client.get("/api/vehicles/999999/history").status_code, 404)
+        self.assertEqual(self.client.get(f"/api/vehicles/{self.vehicle.id}/history", {"cursor": "bm9wZQ"}).status_code, 400)
+
+    def test_vehicles_for_customer(self):
+        with self.assertNumQueries(2):
+            vehicles = self.client.get(f"/api/vehicles/customer/{self.customer.id}").json()
+        self.assertEqual({vehicle["id"] for vehicle in vehicles}, {self.vehicle.id, self.other_vehicle_order.vehicle_id})
+
+class WorkloadTests(TestCase):
+    def setUp(self):
+        self.karl = Mechanic.objects.create(first_name="Karl", last_name="Schrauber")
+        self.erna = Mechanic.objects.create(first_name="Erna", last_name="Zange", capacity_hours=Decimal("3.00"))
+        self.inspection = Service.objects.create(name="Inspektion", price=Decimal("150.00"), estimated_hours=Decimal("2.50"))
+
+    def load(self, mechanic):
+        mechanic.refresh_from_db()
+        return mechanic.open_orders, mechanic.open_hours
+
+    def put(self, url, data):
+        return self.client.put(url, data, content_type="application/json")
+
+    def test_counters_follow_orders_and_services(self):
+        order = create_order(mechanic=self.karl)
+        self.assertEqual(self.load(self.karl), (1, Decimal("0.00")))
+        self.client.post(f"/api/orders/{order.id}/add_service/{self.inspection.id}?quantity=2")
+        self.assertEqual(self.load(self.karl), (1, Decimal("5.00")))
+
+        self.put(f"/api/services/{self.inspection.id}", {"estimated_hours": 1.5})
+        self.assertEqual(self.load(self.karl), (1, Decimal("3.00")))
+
+        self.put(f"/api/orders/{order.id}", {"mechanic_id": self.erna.id})
+        self.assertEqual(self.load(self.karl), (0, Decimal("0.00")))
+        self.assertEqual(self.load(self.erna), (1, Decimal("3.00")))
+
+        self.put(f"/api/orders/{order.id}", {"is_closed": True})
+        self.assertEqual(self.load(self.erna), (0, Decimal("0.00")))
+        self.put(f"/api/orders/{order.id}", {"is_closed": False})
+        self.assertEqual(self.load(self.erna), (1, Decimal("3.00")))
+
+        self.client.delete(f"/api/orders/{order.id}")
+        self.assertEqual(self.load(self.erna), (0, Decimal("0.00")))
+
+    def test_bulk_orders(self):
+        template = create_order()
+        row = {"customer_id": template.customer_id, "vehicle_id": template.vehicle_id, "mechanic_id": self.karl.id, "description": "", "is_closed": False}
+        response = self.client.post("/api/orders/bulk", [row] * 3, content_type="application/json")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.load(self.karl), (3, Decimal("0.00")))
+
+        ids = [order["id"] for order in response.json()]
+        self.client.patch("/api/orders/bulk", [{"id": pk, "is_closed": True} for pk in ids[:2]], content_type="application/json")
+        self.assertEqual(self.load(self.karl), (1, Decimal("0.00")))
+
+    def test_workload_endpoint(self):
+        OrderService.objects.create(order=create_order(mechanic=self.karl), service=self.inspection)
+        Mechanic.objects.create(first_name="Otto", last_name="Ruhestand", is_active=False)
+        response = self.client.get("/api/mechanics/workload")
+        self.assertEqual(response.json(), [
+            {"id": self.erna.id, "first_name": "Erna", "last_name": "Zange", "open_orders": 0, "open_hours": 0.0, "capacity_hours": 3.0, "free_hours": 3.0},
+            {"id": self.karl.id, "first_name": "Karl", "last_name": "Schrauber", "open_orders": 1, "open_hours": 2.5, "capacity_hours": 40.0, "free_hours": 37.5},
+        ])
+        self.assertEqual([mechanic["id"] for mechanic in self.client.get("/api/mechanics/available").json()], [self.erna.id])
+
+    def test_assign_picks_the_least_loaded_mechanic_with_room(self):
+        create_order(mechanic=self.karl)
+        first, second = create_order(), create_order()
+        OrderService.objects.create(order=second, service=self.inspection, quantity=2)
+
+        response = self.client.post(f"/api/orders/{first.id}/assign")
+        self.assertEqual(response.json()["mechanic_id"], self.erna.id)
+        self.assertEqual(self.load(self.erna), (1, Decimal("0.00")))
+        # 5 hours do not fit into Erna's capacity of 3
+        self.assertEqual(self.client.post(f"/api/orders/{second.id}/assign").json()["mechanic_id"], self.karl.id)
+        self.assertEqual(self.load(self.karl), (2, Decimal("5.00")))
+        self.assertEqual(self.client.post(f"/api/orders/{second.id}/assign").status_code, 409)
+
+        Mechanic.objects.update(is_active=False)
+        self.assertEqual(self.client.post(f"/api/orders/{create_order().id}/assign").status_code, 409)
+
+    def test_refresh_command_repairs_drift(self):
+        create_order(mechanic=self.karl)
+        Mechanic.objects.update(open_orders=7, open_hours=Decimal("9.00"))
+        out = StringIO()
+        call_command("refresh_workload", stdout=out)
+        self.assertIn("2 mechanics refreshed", out.getvalue())
+        self.assertEqual(self.load(self.karl), (1, Decimal("0.00")))
+        self.assertEqual(self.load(self.erna), (0, Decimal("0.00")))
+
+class WorkloadStressTests(TransactionTestCase):
+    # SQLite's shared in-memory test database fails concurrent writers instead of making them wait
+    @skipUnlessDBFeature("has_select_for_update")
+    def test_concurrent_intakes_spread_over_the_team(self):
+        desks = 4
+        mechanics = [Mechanic.objects.create(first_name=f"M{i}", last_name="Test") for i in range(desks)]
+        orders = [create_order() for _ in range(desks * 3)]
+        barrier = threading.Barrier(desks)
+        assigned = []
+
+        def desk(batch):
+            client = Client()
+            barrier.wait()
+            try:
+                for order in batch:
+                    assigned.append(client.post(f"/api/orders/{order.id}/assign").json()["mechanic_id"])
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=desk, args=(orders[i::desks],)) for i in range(desks)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(assigned), len(orders))
+        self.assertEqual(set(assigned), {mechanic.id for mechanic in mechanics})
+        for mechanic in mechanics:
+            mechanic.refresh_from_db()
+            self.assertEqual(mechanic.open_orders, assigned.count(mechanic.id))
+
+class SettlementTests(TestCase):
+    def setUp(self):
+        self.invoice = Invoice.objects.create(order=create_order(), due_date=timezone.now(), total_amount=Decimal("100.00"))
+
+    def pay(self, amount):
+        response = self.client.post("/api/payments", {"invoice_id": self.invoice.id, "amount": amount, "payment_method": "card", "note": ""}, content_type="application/json")
+        self.assertEqual(response.status_code, 201)
+        return response.json()["id"]
+
+    def settled(self):
+        self.invoice.refresh_from_db()
+        return self.invoice.amount_paid, self.invoice.is_paid
+
+    def test_payments_settle_the_invoice(self):
+        self.pay(60.1)
+        self.assertEqual(self.settled(), (Decimal("60.10"), False))
+        second = self.pay(39.9)
+        self.assertEqual(self.settled(), (Decimal("100.00"), True))
+
+        self.client.put(f"/api/payments/{second}", {"amount": 20}, content_type="application/json")
+        self.assertEqual(self.settled(), (Decimal("80.10"), False))
+        self.client.put(f"/api/invoices/{self.invoice.id}", {"total_amount": 80.1}, content_type="application/json")
+        self.assertEqual(self.settled(), (Decimal("80.10"), True))
+
+        self.client.delete(f"/api/payments/{second}")
+        self.assertEqual(self.settled(), (Decimal("60.10"), False))
+
+    def test_bulk_payments(self):
+        rows = [{"invoice_id": self.invoice.id, "amount": 25, "payment_method": "cash", "note": ""}] * 4
+        response = self.client.post("/api/payments/bulk", rows, content_type="application/json")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.settled(), (Decimal("100.00"), True))
+
+        ids = [payment["id"] for payment in response.json()[:2]]
+        self.client.generic("DELETE", "/api/payments/bulk", json.dumps({"ids": ids}), content_type="application/json")
+        self.assertEqual(self.settled(), (Decimal("50.00"), False))
+
+    def test_settle_command_repairs_drift(self):
+        self.pay(100)
+        Invoice.objects.filter(id=self.invoice.id).update(amount_paid=0, is_paid=False)
+        with self.assertRaises(CommandError):
+            call_command("settle_invoices", "--check", stdout=StringIO())
+
+        out = StringIO()
+        call_command("settle_invoices", stdout=out)
+        self.assertIn("1 invoices repaired", out.getvalue())
+        self.assertEqual(self.settled(), (Decimal("100.00"), True))
+        call_command("settle_invoices", "--check", stdout=StringIO())
+
+    def test_mark_paid_survives_payments_and_settling(self):
+        response = self.client.put(f"/api/invoices/{self.invoice.id}/mark_paid")
+        self.assertTrue(response.json()["paid_manually"])
+        self.pay(30)
+        self.assertEqual(self.settled(), (Decimal("30.00"), True))
+        self.client.put(f"/api/invoices/{self.invoice.id}", {"total_amount": 120}, content_type="application/json")
+        self.assertEqual(self.settled(), (Decimal("30.00"), True))
+
+        call_command("settle_invoices", "--check", stdout=StringIO())
+        out = StringIO()
+        call_command("settle_invoices", stdout=out)
+        self.assertIn("0 invoices repaired", out.getvalue())
+        self.assertEqual(self.settled(), (Decimal("30.00"), True))
+
+    def test_is_paid_in_writes_marks_paid_by_hand(self):
+        self.pay(30)
+        url = f"/api/invoices/{self.invoice.id}"
+        self.assertTrue(self.client.put(url, {"is_paid": True}, content_type="application/json").json()["paid_manually"])
+        call_command("settle_invoices", "--check", stdout=StringIO())
+
+        response = self.client.put(url, {"is_paid": False}, content_type="application/json").json()
+        self.assertEqual((response["is_paid"], response["paid_manually"]), (False, False))
+        self.pay(70)
+        self.assertEqual(self.settled(), (Decimal("100.00"), True))
+        # a covered invoice stays paid
+        self.assertTrue(self.client.put(url, {"is_paid": False}, content_type="application/json").json()["is_paid"])
+
+        rows = [{"id": self.invoice.id, "total_amount": 120, "is_paid": True}]
+        self.assertTrue(self.client.patch("/api/invoices/bulk", rows, content_type="application/json").json()[0]["paid_manually"])
+        response = self.client.post("/api/invoices", {"order_id": create_order().id, "due_date": "2026-11-01T00:00:00Z", "is_paid": True}, content_type="application/json")
+        self.assertTrue(response.json()["paid_manually"])
+        call_command("settle_invoices", "--check", stdout=StringIO())
+
+class SettlementStressTests(TransactionTestCase):
+    @skipUnlessDBFeature("has_select_for_update")
+    def test_concurrent_payments_add_up(self):
+        invoice = Invoice.objects.create(order=create_order(), due_date=timezone.now(), total_amount=Decimal("100.00"))
+        tellers = 8
+        barrier = threading.Barrier(tellers)
+
+        def teller():
+            client = Client()
+            barrier.wait()
+            try:
+                for _ in range(5):
+                    client.post("/api/payments", {"invoice_id": invoice.id, "amount": 2.5, "payment_method": "cash", "note": ""}, content_type="application/json")
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=teller) for _ in range(tellers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        invoice.refresh_from_db()
+        self.assertEqual(invoice.amount_paid, Decimal("100.00"))
+        self.assertTrue(invoice.is_paid)
+
+class InventoryTests(TestCase):
+    def setUp(self):
+        self.order = create_order()
+        self.part = Part.objects.create(name="Zündkerze", part_number="ZK-1", price=Decimal("8.00"), stock_quantity=5)
+
+    def stock(self):
+        self.part.refresh_from_db()
+        return self.part.stock_quantity
+
+    def test_reserve_adjust_and_release(self):
+        response = self.client.post(f"/api/orders/{self.order.id}/add_part/{self.part.id}?quantity=3")
+        self.assertEqual(response.json()["reserved_quantity"], 3)
+        self.assertEqual(self.stock(), 2)
+
+        orderpart_id = response.json()["id"]
+        self.client.put(f"/api/orderparts/{orderpart_id}", {"quantity": 4}, content_type="application/json")
+        self.assertEqual(self.stock(), 1)
+        self.client.put(f"/api/orderparts/{orderpart_id}", {"quantity": 1}, content_type="application/json")
+        self.assertEqual(self.stock(), 4)
+
+        self.client.delete(f"/api/orderparts/{orderpart_id}")
+        self.assertEqual(self.stock(), 5)
+
+    def test_oversell_is_rejected(self):
+        response = self.client.post("/api/orderparts", {"order_id": self.order.id, "part_id": self.part.id, "quantity": 6}, content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("5 in stock", response.json()["detail"])
+        self.assertEqual(self.stock(), 5)
+        self.assertFalse(OrderPart.objects.exists())
+
+    def test_bulk_is_all_or_nothing(self):
+        other = Part.objects.create(name="Glühbirne", part_number="GB-1", price=Decimal("3.00"), stock_quantity=1)
+        rows = [
+            {"order_id": self.order.id, "part_id": self.part.id, "quantity": 2},
+            {"order_id": self.order.id, "part_id": other.id, "quantity": 2},
+        ]
+        response = self.client.post("/api/orderparts/bulk", rows, content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.stock(), 5)
+
+        rows[1]["quantity"] = 1
+        self.assertEqual(self.client.post("/api/orderparts/bulk", rows, content_type="application/json").status_code, 201)
+        self.assertEqual(self.stock(), 3)
+        other.refresh_from_db()
+        self.assertEqual(other.stock_quantity, 0)
+
+    def test_cancel_and_order_delete_release_stock(self):
+        self.client.post(f"/api/orders/{self.order.id}/add_part/{self.part.id}?quantity=2")
+        self.client.post("/api/orderstatuses", {"order_id": self.order.id, "status": "cancelled", "note": ""}, content_type="application/json")
+        self.assertEqual(self.stock(), 5)
+        self.assertEqual(OrderPart.objects.get().reserved_quantity, 0)
+
+        other = create_order()
+        self.client.post(f"/api/orders/{other.id}/add_part/{self.part.id}?quantity=4")
+        self.assertEqual(self.stock(), 1)
+        self.client.delete(f"/api/orders/{other.id}")
+        self.assertEqual(self.stock(), 5)
+
+    def test_delivered_and_closed_orders_consume_stock(self):
+        self.client.post(f"/api/orders/{self.order.id}/add_part/{self.part.id}?quantity=2")
+        self.client.post("/api/orderstatuses", {"order_id": self.order.id, "status": "delivered", "note": ""}, content_type="application/json")
+        self.assertEqual(OrderPart.objects.get(order=self.order).reserved_quantity, 0)
+        self.client.put(f"/api/orders/{self.order.id}", {"is_closed": True}, content_type="application/json")
+        self.client.delete(f"/api/orders/{self.order.id}")
+        self.assertEqual(self.stock(), 3)
+
+        other = create_order()
+        orderpart_id = self.client.post(f"/api/orders/{other.id}/add_part/{self.part.id}?quantity=1").json()["id"]
+        self.client.put(f"/api/orders/{other.id}", {"is_closed": True}, content_type="application/json")
+        self.client.delete(f"/api/orderparts/{orderpart_id}")
+        self.assertEqual(self.stock(), 2)
+
+    def status(self, status):
+        return self.client.post("/api/orderstatuses", {"order_id": self.order.id, "status": status, "note": ""}, content_type="application/json")
+
+    def test_consumed_line_items_are_not_withdrawn_twice(self):
+        orderpart_id = self.client.post(f"/api/orders/{self.order.id}/add_part/{self.part.id}?quantity=2").json()["id"]
+        self.status("delivered")
+        self.client.put(f"/api/orderparts/{orderpart_id}", {}, content_type="application/json")
+        self.client.patch("/api/orderparts/bulk", [{"id": orderpart_id}], content_type="application/json")
+        self.assertEqual(self.stock(), 3)
+
+        # one more installed later is withdrawn once, one fewer goes back
+        self.client.put(f"/api/orderparts/{orderpart_id}", {"quantity": 3}, content_type="application/json")
+        self.assertEqual(self.stock(), 2)
+        self.client.put(f"/api/orderparts/{orderpart_id}", {"quantity": 1}, content_type="application/json")
+        self.assertEqual(self.stock(), 4)
+        self.assertEqual(OrderPart.objects.values_list("reserved_quantity", "consumed_quantity").get(), (0, 1))
+
+    def test_reopened_order_reserves_again(self):
+        self.client.post(f"/api/orders/{self.order.id}/add_part/{self.part.id}?quantity=2")
+        self.status("cancelled")
+        self.assertEqual(self.stock(), 5)
+        self.assertEqual(self.status("received").status_code, 201)
+        self.assertEqual(self.stock(), 3)
+        self.status("delivered")
+        self.assertEqual(self.stock(), 3)
+        self.assertEqual(OrderPart.objects.values_list("reserved_quantity", "consumed_quantity").get(), (0, 2))
+
+        self.status("cancelled")
+        Part.objects.filter(id=self.part.id).update(stock_quantity=0)
+        self.assertEqual(self.status("received").status_code, 201)  # installed parts stay installed
+
+        other = create_order()
+        Part.objects.filter(id=self.part.id).update(stock_quantity=1)
+        self.client.post(f"/api/orders/{other.id}/add_part/{self.part.id}?quantity=1")
+        self.client.post("/api/orderstatuses", {"order_id": other.id, "status": "cancelled", "note": ""}, content_type="application/json")
+        Part.objects.filter(id=self.part.id).update(stock_quantity=0)
+        response = self.client.post("/api/orderstatuses", {"order_id": other.id, "status": "received", "note": ""}, content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(OrderStatus.objects.filter(order=other).count(), 1)
+
+class ReorderReportTests(TestCase):
+    def sell(self, part, quantity, days_ago=1, status=None):
+        order = create_order()
+        Order.objects.filter(id=order.id).update(order_date=timezone.now() - timedelta(days=days_ago), current_status=status)
+        OrderPart.objects.create(order=order, part=part, quantity=quantity)
+
+    def test_report(self):
+        low = Part.objects.create(name="Bremsbelag", part_number="BB-1", price=Decimal("30.00"), stock_quantity=2)
+        plenty = Part.objects.create(name="Ölfilter", part_number="OF-1", price=Decimal("9.00"), stock_quantity=100)
+        stale = Part.objects.create(name="Wischer", part_number="WI-1", price=Decimal("15.00"), stock_quantity=0)
+        cancelled = Part.objects.create(name="Batterie", part_number="BA-1", price=Decimal("99.00"), stock_quantity=0)
+        self.sell(low, 6)
+        self.sell(low, 4, days_ago=20)
+        self.sell(plenty, 10)
+        self.sell(stale, 5, days_ago=40)
+        self.sell(cancelled, 1, status="cancelled")
+
+        with self.assertNumQueries(1):
+            response = self.client.get("/api/parts/reorder", {"window_days": 30, "threshold_days": 14})
+        self.assertEqual(response.json(), [{
+            "part_id": low.id, "name": "Bremsbelag", "part_number": "BB-1", "stock_quantity": 2, "consumed": 10,
+            "daily_consumption": 0.333, "days_left": 6.0, "reorder_quantity": 8,
+        }])
+
+class InventoryStressTests(TransactionTestCase):
+    # the counters sell through their own connections, concurrently
+
+    # SQLite's shared in-memory test database fails concurrent writers instead of making them wait
+    @skipUnlessDBFeature("has_select_for_update")
+    def test_concurrent_sales_do_not_oversell(self):
+        stock, counters, sales_per_counter = 25, 8, 5
+        order = create_order()
+        part = Part.objects.create(name="Ölfilter", part_number="OF-9", price=Decimal("9.00"), stock_quantity=stock)
+        barrier = threading.Barrier(counters)
+        results = []
+
+        def counter():
+            client = Client()
+            barrier.wait()
+            try:
+                for _ in range(sales_per_counter):
+                    results.append(client.post(f"/api/orders/{order.id}/add_part/{part.id}").status_code)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=counter) for _ in range(counters)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        part.refresh_from_db()
+        self.assertEqual(results.count(201), stock)
+        self.assertEqual(results.count(400), counters * sales_per_counter - stock)
+        self.assertEqual(part.stock_quantity, 0)
+        self.assertEqual(OrderPart.objects.filter(part=part).count(), stock)
+
+class BulkTests(TestCase):
+    def post_json(self, method, url, data):
+        return getattr(self.client, method)(url, data, content_type="application/json")
+
+    def test_bulk_create_customers(self):
+        rows = [{"first_name": f"Kunde{i}", "last_name": "Test", "email": f"k{i}@example.com", "phone": None, "address": "Weg 1"} for i in range(5)]
+        with self.assertNumQueries(4):  # unique check, savepoint, insert, release
+            response = self.post_json("post", "/api/customers/bulk", rows)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.json()), 5)
+        self.assertEqual(Customer.objects.count(), 5)
+
+    def test_bulk_create_reports_errors_per_row_and_writes_nothing(self):
+        Customer.objects.create(first_name="A", last_name="B", email="taken@example.com", address="Weg 1")
+        rows = [
+            {"first_name": "Ok", "last_name": "Test", "email": "ok@example.com", "phone": "", "address": "Weg 1"},
+            {"first_name": "Dup", "last_name": "Test", "email": "taken@example.com", "phone": "", "address": "Weg 1"},
+            {"first_name": "Bad", "last_name": "Test", "email": "keine-mail", "phone": "", "address": "Weg 1"},
+        ]
+        response = self.post_json("post", "/api/customers/bulk", rows)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([error["index"] for error in response.json()["errors"]], [1, 2])
+        self.assertEqual(Customer.objects.count(), 1)
+
+    def test_bulk_create_resolves_foreign_keys_in_one_query_per_model(self):
+        order = create_order()
+        parts = [Part.objects.create(name=f"Teil{i}", part_number=f"T-{i}", price=Decimal("2.00"), stock_quantity=5) for i in range(3)]
+        rows = [{"order_id": order.id, "part_id": part.id, "quantity": 2} for part in parts]
+        rows.append({"order_id": order.id, "part_id": 999999, "quantity": 1})
+
+        response = self.post_json("post", "/api/orderparts/bulk", rows)
+        self.assertEqual(response.json()["errors"], [{"index": 3, "detail": "part_id: Part with id 999999 not found"}])
+
+        response = self.post_json("post", "/api/orderparts/bulk", rows[:3])
+        self.assertEqual(response.status_code, 201)
+        order.refresh_from_db()
+        self.assertEqual(order.total_amount, Decimal("12.00"))
+
+    def test_bulk_update_and_delete(self):
+        parts = [Part.objects.create(name=f"Teil{i}", part_number=f"T-{i}", price=Decimal("2.00")) for i in range(3)]
+        response = self.post_json("patch", "/api/parts/bulk", [{"id": part.id, "price": 5} for part in parts])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(Part.objects.values_list("price", flat=True)), {Decimal("5.00")})
+
+        response = self.post_json("delete", "/api/parts/bulk", {"ids": [parts[0].id, parts[1].id]})
+        self.assertEqual(response.json(), {"deleted": 2})
+        self.assertEqual(list(Part.objects.values_list("id", flat=True)), [parts[2].id])
+
+class CatalogCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.part = Part.objects.create(name="Bremsscheibe", part_number="BS-1", price=Decimal("80.00"))
+
+    def test_second_read_is_served_from_cache(self):
+        self.client.get("/api/parts")
+        with self.assertNumQueries(0):
+            response = self.client.get("/api/parts")
+        self.assertEqual(response.json()["items"][0]["name"], "Bremsscheibe")
+
+    def test_save_invalidates(self):
+        self.client.get(f"/api/parts/{self.part.id}")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.part.name = "Bremsscheibe vorne"
+            self.part.save()
+            # not before the commit, or a reader could cache the old row under the new version
+            self.assertEqual(self.client.get(f"/api/parts/{self.part.id}").json()["name"], "Bremsscheibe")
+        self.assertEqual(self.client.get(f"/api/parts/{self.part.id}").json()["name"], "Bremsscheibe vorne")
+
+    def test_unchanged_catalog_returns_304(self):
+        etag = self.client.get("/api/services")["ETag"]
+        with self.assertNumQueries(0):
+            response = self.client.get("/api/services", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Service.objects.create(name="Inspektion", price=Decimal("199.00"))
+        response = self.client.get("/api/services", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+class PartSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Part.objects.create(name="Bremsscheibe vorne", part_number="BS-100", price=Decimal("80.00"))
+        Part.objects.create(name="Bremsbelag", part_number="BB-200", description="passend zur Bremsscheibe", price=Decimal("40.00"))
+        Part.objects.create(name="Ölfilter", part_number="OF-1234", price=Decimal("12.50"))
+
+    def search(self, query, **params):
+        response = self.client.get("/api/parts/search", {"query": query, **params})
+        self.assertEqual(response.status_code, 200)
+        return [part["name"] for part in response.json()]
+
+    def test_prefix_words_ranked_by_field(self):
+        self.assertEqual(self.search("bremsscheibe"), ["Bremsscheibe vorne", "Bremsbelag"])
+        self.assertEqual(self.search("brems vor"), ["Bremsscheibe vorne"])
+
+    def test_part_number_prefix(self):
+        self.assertEqual(self.search("OF-12"), ["Ölfilter"])
+        self.assertEqual(self.search("bb"), ["Bremsbelag"])
+
+    def test_limit_and_updates(self):
+        self.assertEqual(len(self.search("brems", limit=1)), 1)
+        Part.objects.filter(part_number="OF-1234").update(name="Luftfilter")
+        self.assertEqual(self.search("luft"), ["Luftfilter"])
+        self.assertEqual(self.search("%"), [])
+
+class LookupTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.max = Customer.objects.create(first_name="Max", last_name="Mustermann", email="Max.Mustermann@Example.com", phone="+49 (171) 123-4567", address="Weg 1")
+        cls.erika = Customer.objects.create(first_name="Erika", last_name="Musterfrau", email="erika@example.com", phone="0171/999", address="Weg 2")
+        cls.golf = Vehicle.objects.create(brand="VW", model="Golf", year=2018, vin="WVWZZZ1KZAW000001", customer=cls.max)
+
+    def lookup(self, query):
+        response = self.client.get("/api/search", {"query": query})
+        self.assertEqual(response.status_code, 200)
+        return [(hit["type"], hit["id"]) for hit in response.json()]
+
+    def test_email_is_case_insensitive(self):
+        self.assertEqual(self.lookup("max.mustermann@example.COM"), [("customer", self.max.id)])
+
+    def test_phone_ignores_formatting(self):
+        self.assertEqual(self.lookup("49 171 1234567"), [("customer", self.max.id)])
+
+    def test_vin_prefix(self):
+        self.assertEqual(self.lookup("wvwzzz1kz"), [("vehicle", self.golf.id)])
+
+    def test_name_ranking(self):
+        self.assertEqual(self.lookup("muster"), [("customer", self.max.id), ("customer", self.erika.id)])
+        self.assertEqual(self.lookup("erika muster"), [("customer", self.erika.id)])
+        self.assertEqual(self.lookup("vw golf"), [("vehicle", self.golf.id)])
+
+    def test_queries_are_bounded(self):
+        with self.assertNumQueries(2):
+            self.client.get("/api/search", {"query": "mu"})
+
+class HotQueryIndexTests(TestCase):
+    def test_explain_rolls_back_seed_and_dropped_indexes(self):
+        out = StringIO()
+        call_command("explain_hot_queries", seed=50, repeat=1, stdout=out)
+        self.assertIn("with indexes", out.getvalue())
+        self.assertEqual(Order.objects.count(), 0)
+
+        with connection.cursor() as cursor:
+            indexes = connection.introspection.get_constraints(cursor, Notification._meta.db_table)
+        self.assertIn("notification_timestamp_idx", indexes)
+
+class AsyncReadTests(TransactionTestCase):
+    # the concurrent queries use their own connections and cannot see the data of a TestCase transaction
+
+    def test_async_detail_and_list(self):
+        customer = Customer.objects.create(first_name="Max", last_name="Mustermann", email="max@example.com", address="Weg 1")
+        self.assertEqual(self.client.get(f"/api/async/customers/{customer.id}").json()["email"], "max@example.com")
+        self.assertEqual(self.client.get("/api/async/customers/999999").status_code, 404)
+        self.assertEqual(len(self.client.get("/api/async/customers").json()["items"]), 1)
+
+    def test_async_order_full_matches_sync_variant(self):
+        order = create_order()
+        service = Service.objects.create(name="Inspektion", price=Decimal("99.00"))
+        OrderService.objects.create(order=order, service=service)
+        OrderStatus.objects.create(order=order, status="received")
+        invoice = Invoice.objects.create(order=order, due_date=timezone.now(), total_amount=Decimal("99.00"))
+        Payment.objects.create(invoice=invoice, amount=Decimal("99.00"), payment_method="card")
+        create_order()
+
+        sync = self.client.get(f"/api/orders/{order.id}/full").json()
+        self.assertEqual(self.client.get(f"/api/async/orders/{order.id}/full").json(), sync)
+        self.assertEqual(self.client.get("/api/async/orders/full").json()["items"][0], sync)
+        self.assertEqual(self.client.get("/api/async/orders/999999/full").status_code, 404)
+
+    def test_concurrent_queries_with_pool(self):
+        order = create_order()
+        OrderStatus.objects.create(order=order, status="received")
+        sync = self.client.get(f"/api/orders/{order.id}/full").json()
+        with override_settings(DB_POOL=True):
+            self.assertEqual(self.client.get(f"/api/async/orders/{order.id}/full").json(), sync)
+
+    async def test_async_requests_are_measured(self):
+        response = await self.async_client.get("/api/async/customers/999999")
+        self.assertEqual(response.status_code, 404)
+        self.assertIn('desc="1 queries"', response["Server-Timing"])
+
+
+class MetricsTests(TestCase):
+    def setUp(self):
+        registry.reset()
+
+    def test_server_timing_header(self):
+        customer = Customer.objects.create(first_name="Max", last_name="Mustermann", email="max@example.com", address="Weg 1")
+        response = self.client.get(f"/api/customers/{customer.id}")
+        timing = response["Server-Timing"]
+        self.assertIn('db;dur=', timing)
+        self.assertIn('desc="1 queries"', timing)
+        self.assertIn("serialize;dur=", timing)
+        self.assertIn("total;dur=", timing)
+
+    def test_prometheus_page(self):
+        self.client.get("/api/customers")
+        self.client.get("/api/customers/999999")
+        self.client.get("/nowhere")
+        body = self.client.get("/internal/metrics").content.decode()
+
+        labels = 'method="GET",route="api/customers/<int:customer_id>"'
+        self.assertIn(f'pitlane_http_request_duration_seconds_count{{{labels}}} 1', body)
+        self.assertIn(f'pitlane_http_request_queries_bucket{{{labels},le="1"}} 1', body)
+        self.assertIn(f'pitlane_http_responses_total{{{labels},status="404"}} 1', body)
+        self.assertIn(f'pitlane_http_request_duration_quantile_seconds{{{labels},quantile="0.95"}}', body)
+        self.assertIn('route="api/customers"', body)
+        self.assertIn('route="unmatched"', body)
+
+    def test_metrics_page_is_restricted(self):
+        self.assertEqual(self.client.get("/internal/metrics", REMOTE_ADDR="10.0.0.1").status_code, 403)
+        # a reverse proxy on the same host
+        self.assertEqual(self.client.get("/internal/metrics", headers={"X-Forwarded-For": "203.0.113.9"}).status_code, 403)
+
+    @override_settings(METRICS_TOKEN="s3cret")
+    def test_metrics_token(self):
+        self.assertEqual(self.client.get("/internal/metrics").status_code, 403)
+        self.assertEqual(self.client.get("/internal/metrics", headers={"Authorization": "Bearer wrong"}).status_code, 403)
+        response = self.client.get("/internal/metrics", REMOTE_ADDR="10.0.0.1", headers={"Authorization": "Bearer s3cret"})
+        self.assertEqual(response.status_code, 200)
+
+    def test_middleware_supports_async_chains(self):
+        async def get_response(request):
+            return HttpResponse()
+
+        self.assertTrue(iscoroutinefunction(MetricsMiddleware(get_response)))
+        self.assertFalse(iscoroutinefunction(MetricsMiddleware(lambda request: HttpResponse())))
+
+
+class LoadTestCommandTests(TransactionTestCase):
+    # the worker threads use their own connections and cannot see the data of a TestCase transaction
+
+    def test_compares_connection_settings(self):
+        out = StringIO()
+        with self.assertRaises(CommandError):
+            call_command("loadtest", seconds=0.1, stdout=out)
+
+        Customer.objects.create(first_name="Max", last_name="Mustermann", email="max@example.com", address="Weg 1")
+        configured = connection.settings_dict["CONN_MAX_AGE"]
+        call_command("loadtest", "--conn-max-age", "0", "--conn-max-age", "60", host="testserver", threads=2, seconds=0.2, stdout=out)
+        lines = out.getvalue().splitlines()
+        self.assertTrue(lines[1].startswith("CONN_MAX_AGE=0: "))
+        self.assertTrue(lines[2].startswith("CONN_MAX_AGE=60: "))
+        self.assertTrue(all(line.endswith(" 0 failed") for line in lines[1:]))
+        self.assertEqual(connection.settings_dict["CONN_MAX_AGE"], configured)
+
+@override_settings(READ_REPLICA="replica")
+class ReplicaRoutingTests(TransactionTestCase):
+    # a TestCase would run every request inside a transaction, which always reads from default
+
+    def setUp(self):
+        self.router = ReplicaRouter()
+        self.middleware = ReplicaMiddleware(lambda request: HttpResponse(str(self.router.db_for_read(Customer))))
+
+    def request(self, method, cookies=None):
+        request = getattr(RequestFactory(), method)("/api/customers")
+        request.COOKIES.update(cookies or {})
+        return request
+
+    def read_alias(self, method, cookies=None):
+        return self.middleware(self.request(method, cookies)).content.decode()
+
+    def test_safe_requests_read_from_the_replica(self):
+        self.assertEqual(self.read_alias("get"), "replica")
+        self.assertEqual(self.read_alias("options"), "replica")
+        self.assertIsNone(self.router.db_for_read(Customer))
+        self.assertEqual(self.router.db_for_write(Customer), "default")
+
+    def test_writes_pin_the_client_to_default(self):
+        response = self.middleware(self.request("post"))
+        self.assertEqual(response.content.decode(), "None")
+        pin = response.cookies[PIN_COOKIE]
+        self.assertEqual(pin["max-age"], 5)
+        self.assertEqual(self.read_alias("get", {PIN_COOKIE: pin.value}), "None")
+        # other clients, also behind the same address, and the client after the sticky window
+        self.assertEqual(self.read_alias("get"), "replica")
+
+    def test_transactions_read_from_default(self):
+        with transaction.atomic():
+            self.assertEqual(self.read_alias("get"), "None")
+
+    async def test_async_chains(self):
+        async def get_response(request):
+            return HttpResponse(str(self.router.db_for_read(Customer)))
+
+        middleware = ReplicaMiddleware(get_response)
+        self.assertTrue(iscoroutinefunction(middleware))
+        self.assertEqual((await middleware(self.request("get"))).content.decode(), "replica")
+        pin = (await middleware(self.request("post"))).cookies[PIN_COOKIE]
+        self.assertEqual((await middleware(self.request("get", {PIN_COOKIE: pin.value}))).content.decode(), "None")
+
+
+class AdminChangelistTests(TestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create_superuser("admin", "admin@example.com", "secret"))
+        self.add_rows()
+
+    def add_rows(self):
+        """One more row in every admin changelist."""
+        mechanic = Mechanic.objects.create(first_name="Karl", last_name="Schrauber")
+        order = create_order(mechanic=mechanic)
+        OrderStatus.objects.create(order=order, status="received")
+        invoice = Invoice.objects.create(order=order, due_date=timezone.now(), total_amount=Decimal("50.00"))
+        Payment.objects.create(invoice=invoice, amount=Decimal("10.00"), payment_method="card")
+        Notification.objects.create(message=f"Auftrag {order.id} angelegt")
+        Part.objects.create(name="Ölfilter", part_number=f"OF-{order.id}", price=Decimal("9.90"))
+        Service.objects.create(name="Ölwechsel", price=Decimal("49.00"))
+
+    def changelist_queries(self):
+        counts = {}
+        for model in admin.site._registry:
+            if model._meta.app_label == "pitlane":
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.client.get(reverse(f"admin:pitlane_{model._meta.model_name}_changelist"))
+                self.assertEqual(response.status_code, 200, model.__name__)
+                counts[model.__name__] = len(queries)
+        return counts
+
+    def test_query_count_does_not_grow_with_rows(self):
+        before = self.changelist_queries()
+        for _ in range(3):
+            self.add_rows()
+        self.assertEqual(self.changelist_queries(), before)
+
+    def search(self, model, term):
+        response = self.client.get(reverse(f"admin:pitlane_{model._meta.model_name}_changelist"), {"q": term})
+        self.assertEqual(response.status_code, 200)
+        return list(response.context["cl"].result_list)
+
+    def test_indexed_search(self):
+        order = Order.objects.get()
+        self.assertEqual(self.search(Customer, "muster MAX"), [order.customer])
+        self.assertEqual(self.search(Customer, "meier"), [])
+        self.assertEqual(self.search(Vehicle, "wvw0"), [order.vehicle])
+        self.assertEqual(self.search(Vehicle, "mustermann"), [order.vehicle])
+        self.assertEqual(self.search(Order, "Mustermann"), [order])
+        self.assertEqual(self.search(Order, str(order.id)), [order])
+        self.assertEqual(self.search(OrderStatus, str(order.id)), list(order.statuses.all()))
+        self.assertEqual(self.search(Invoice, "abc"), [])
+        self.assertEqual(len(self.search(Payment, "card")), 1)
+
+    @skipUnless(connection.vendor == "postgresql", "reltuples is PostgreSQL specific")
+    def test_estimated_count(self):
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE pitlane_notification")
+        Notification.objects.create(message="nach ANALYZE")
+
+        paginator = EstimatedCountPaginator(Notification.objects.order_by("id"), 100)
+        paginator.estimate_above = 0
+        self.assertEqual(paginator.count, 1)
+        filtered = EstimatedCountPaginator(Notification.objects.filter(message__startswith="nach"), 100)
+        filtered.estimate_above = 0
+        self.assertEqual(filtered.count, 1)
+        self.assertEqual(EstimatedCountPaginator(Notification.objects.order_by("id"), 100).count, 2)
@@ -0,0 +1,111 @@
+"""
+Service history of a vehicle and timeline of a customer.
+
+The events of every order (the order itself, its status changes, parts and
+services, invoice and payments) are read as one ``UNION ALL`` over the six
+tables, sorted newest first by the database:
+
+    SELECT order_date, 'order', id, ... FROM pitlane_order WHERE vehicle_id = ...
+    UNION ALL
+    SELECT timestamp, 'status', id, ... FROM pitlane_orderstatus JOIN pitlane_order ...
+    ...
+    ORDER BY 1 DESC, 2 DESC, 3 DESC LIMIT ...
+
+so a page costs one query however many visits the vehicle or customer has.
+Pages continue after the (timestamp, kind, id) of the last event of the
+previous page; each part of the union filters on its own timestamp for that,
+which keeps the filter usable for its indexes. Parts and services carry no
+timestamp of their own and are dated with their order.
+"""
+from django.db.models import Case, CharField, DecimalField, F, IntegerField, Q, TextField, Value, When
+from django.db.models.functions import Cast
+
+from .models import Invoice, Order, OrderPart, OrderService, OrderStatus, Payment
+
+KINDS = ("invoice", "order", "part", "payment", "service", "status")
+
+MONEY = DecimalField(max_digits=12, decimal_places=2)
+
+# output name -> column of the union; prefixed, because annotations must not shadow model fields
+COLUMNS = {
+    "timestamp": "event_at",
+    "kind": "event_kind",
+    "id": "event_id",
+    "order_id": "event_order",
+    "vehicle_id": "event_vehicle",
+    "label": "event_label",
+    "quantity": "event_quantity",
+    "amount": "event_amount",
+    "note": "event_note",
+}
+
+# typed NULLs: PostgreSQL takes an untyped NULL in the first SELECT of a union for text
+NO_QUANTITY = Cast(Value(None), IntegerField())
+NO_AMOUNT = Cast(Value(None), MONEY)
+NO_NOTE = Cast(Value(None), TextField())
+
+
+def _streams():
+    """(kind, queryset, path from its model to the order, column expressions)"""
+    return (
+        ("order", Order.objects.all(), "", {
+            "event_at": F("order_date"), "event_label": F("description"), "event_quantity": NO_QUANTITY,
+            "event_amount": F("total_amount"), "event_note": NO_NOTE,
+        }),
+        ("status", OrderStatus.objects.all(), "order__", {
+            "event_at": F("timestamp"), "event_label": F("status"), "event_quantity": NO_QUANTITY,
+            "event_amount": NO_AMOUNT, "event_note": F("note"),
+        }),
+        ("part", OrderPart.objects.all(), "order__", {
+            "event_at": F("order__order_date"), "event_label": F("part__name"), "event_quantity": F("quantity"),
+            "event_amount": F("quantity") * F("part__price"), "event_note": NO_NOTE,
+        }),
+        ("service", OrderService.objects.all(), "order__", {
+            "event_at": F("order__order_date"), "event_label": F("service__name"), "event_quantity": F("quantity"),
+            "event_amount": F("quantity") * F("service__price"), "event_note": NO_NOTE,
+        }),
+        ("invoice", Invoice.objects.all(), "order__", {
+            "event_at": F("issue_date"),
+            "event_label": Case(When(is_paid=True, then=Value("paid")), default=Value("open"), output_field=CharField()),
+            "event_quantity": NO_QUANTITY, "event_amount": F("total_amount"), "event_note": NO_NOTE,
+        }),
+        ("payment", Payment.objects.all(), "invoice__order__", {
+            "event_at": F("payment_date"), "event_label": F("payment_method"), "event_quantity": NO_QUANTITY,
+            "event_amount": F("amount"), "event_note": F("note"),
+        }),
+    )
+
+
+def _after(kind, cursor):
+    """The events of one stream that follow ``cursor`` in newest-first order."""
+    timestamp, cursor_kind, cursor_id = cursor
+    if kind < cursor_kind:
+        return Q(event_at__lte=timestamp)
+    if kind > cursor_kind:
+        return Q(event_at__lt=timestamp)
+    return Q(event_at__lt=timestamp) | Q(event_at=timestamp, event_id__lt=cursor_id)
+
+
+def events(scope, limit, cursor=None):
+    """
+    Up to ``limit`` events, newest first, of the orders matching ``scope``
+    (``{"vehicle_id": ...}`` or ``{"customer_id": ...}``), as dicts with the
+    keys of ``COLUMNS``. ``cursor`` is the (timestamp, kind, id) of the event
+    to continue after.
+    """
+    (field, value), = scope.items()
+    parts = []
+    for kind, queryset, order_path, columns in _streams():
+        queryset = queryset.filter(**{f"{order_path}{field}": value}).annotate(
+            event_kind=Value(kind, output_field=CharField()),
+            event_id=F("id"),
+            event_order=F(f"{order_path}id"),
+            event_vehicle=F(f"{order_path}vehicle_id"),
+            **columns,
+        )
+        if cursor is not None:
+            queryset = queryset.filter(_after(kind, cursor))
+        parts.append(queryset.order_by().values(*COLUMNS.values()))
+
+    union = parts[0].union(*parts[1:], all=True).order_by("-event_at", "-event_kind", "-event_id")
+    return [{name: row[column] for name, column in COLUMNS.items()} for row in union[:limit]]
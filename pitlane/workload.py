@@ -0,0 +1,99 @@
+"""
+Workload of the mechanics and assignment of new orders.
+
+``Mechanic.open_orders`` is the number of open orders assigned to a mechanic,
+``Mechanic.open_hours`` the hours estimated for their services (quantity times
+``Service.estimated_hours``). signals.py recomputes both in the transaction
+that creates, reassigns, closes, reopens or deletes an order or changes its
+services, with one UPDATE for all affected mechanics:
+
+    UPDATE pitlane_mechanic SET open_orders = (SELECT COUNT(*) ...),
+                                open_hours = (SELECT SUM(quantity * estimated_hours) ...)
+    WHERE id IN (...)
+
+The counts are read through the partial index on open orders per mechanic.
+The mechanic rows are locked before the UPDATE: under READ COMMITTED the
+UPDATE then starts after every concurrent refresh of the same mechanic has
+committed and counts its orders too, where an UPDATE that merely waited for
+the row would write the counts of its older snapshot over the newer ones.
+
+``pick_mechanic`` chooses the active mechanic with the fewest open hours who
+still has room for an order and locks the row. Concurrent assignments skip the
+mechanics locked by each other, so simultaneous intakes spread over the team
+instead of all landing on the same person. ``rebuild_workload`` (the
+``refresh_workload`` command) recomputes every mechanic.
+"""
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, DecimalField, F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+from .models import Mechanic, Order, OrderService
+
+ZERO = Decimal("0.00")
+
+HOURS = DecimalField(max_digits=8, decimal_places=2)
+
+# least loaded first
+ASSIGNMENT_ORDER = ("open_hours", "open_orders", "id")
+
+
+def _service_hours():
+    return Sum(F("quantity") * F("service__estimated_hours"), output_field=HOURS)
+
+
+def _open_orders():
+    orders = Order.objects.filter(mechanic=OuterRef("pk"), is_closed=False).order_by().values("mechanic")
+    return Coalesce(Subquery(orders.annotate(n=Count("id")).values("n")), 0)
+
+
+def _open_hours():
+    services = OrderService.objects.filter(order__mechanic=OuterRef("pk"), order__is_closed=False).order_by().values("order__mechanic")
+    return Coalesce(Subquery(services.annotate(hours=_service_hours()).values("hours")), ZERO, output_field=HOURS)
+
+
+def refresh_workload(mechanic_ids):
+    """
+    Recomputes ``open_orders`` and ``open_hours`` of the given mechanics in one
+    UPDATE statement. Returns the number of mechanics updated.
+    """
+    mechanic_ids = sorted(mechanic_ids)
+    if not mechanic_ids:
+        return 0
+    mechanics = Mechanic.objects.filter(id__in=mechanic_ids)
+    with transaction.atomic():
+        list(mechanics.select_for_update().order_by("id").values_list("id"))
+        return mechanics.update(open_orders=_open_orders(), open_hours=_open_hours())
+
+
+def rebuild_workload():
+    """Recomputes the workload of every mechanic. Returns the number of mechanics updated."""
+    return refresh_workload(Mechanic.objects.values_list("id", flat=True))
+
+
+def order_hours(order_id):
+    """The estimated hours of the services of an order."""
+    return OrderService.objects.filter(order_id=order_id).aggregate(hours=Coalesce(_service_hours(), ZERO, output_field=HOURS))["hours"]
+
+
+def workload():
+    """The active mechanics, least loaded first, with the hours they have left."""
+    return (
+        Mechanic.objects.filter(is_active=True)
+        .annotate(free_hours=F("capacity_hours") - F("open_hours"))
+        .order_by(*ASSIGNMENT_ORDER)
+    )
+
+
+def pick_mechanic(hours=ZERO):
+    """
+    The active mechanic with the least open work who has room for ``hours``
+    more, locked until the end of the transaction; None if nobody has.
+    """
+    candidates = Mechanic.objects.filter(is_active=True, open_hours__lte=F("capacity_hours") - hours).order_by(*ASSIGNMENT_ORDER)
+    mechanic = candidates.select_for_update(skip_locked=True).first()
+    if mechanic is None:
+        # every candidate is being assigned an order right now; wait for one of them
+        mechanic = candidates.select_for_update().first()
+    return mechanic
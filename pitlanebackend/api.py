@@ -1,15 +1,34 @@
-from typing import Optional, List
+from typing import Dict, Literal, Optional, List
 from pydantic import field_serializer
+from django.http import Http404, StreamingHttpResponse
+from django.db import transaction
+from django.db.models import Prefetch, QuerySet
 from django.shortcuts import get_object_or_404
+from django.utils.dateparse import parse_datetime
 from ninja import NinjaAPI
-from ninja import Schema
+from ninja import Query, Schema
+from ninja.decorators import decorate_view
+from ninja.errors import HttpError
+from ninja.pagination import paginate
 from ninja.responses import Response
 from django.contrib.auth.models import User
-from datetime import datetime
+from datetime import date, datetime
 
+from pitlane import dashboard, inventory, receivables, search, settlement, timeline, workload
+from pitlane.cache import cache_catalog
 from pitlane.models import *
-
-api = NinjaAPI()
+from .async_reads import add_async_read_endpoints, run_concurrently
+from .bulk import add_bulk_endpoints
+from .fields import is_flat, sparse_fields
+from .filters import (
+    CustomerFilter, VehicleFilter, MechanicFilter, OrderFilter, OrderStatusFilter,
+    OrderItemFilter, OrderPartFilter, InvoiceFilter, PaymentFilter, NotificationFilter,
+    ReceivableFilter,
+)
+from .pagination import CursorPagination, akeyset_paginate, decode_cursor, encode_cursor
+from .renderers import renderer
+
+api = NinjaAPI(renderer=renderer)
 
 class UserOut(Schema):
     id:int
@@ -29,11 +48,11 @@ class UserCreate(Schema):
 ### ENDPOINTS ###
 
 @api.get("/user", response=List[UserOut])
+@paginate(CursorPagination)
 def get_all_users(request):
-    users = User.objects.all()
-    return users
+    return User.objects.all()
 
-@api.get("/user/{user_id}", response=UserOut)
+@api.get("/user/{int:user_id}", response=UserOut)
 def get_single_user(request, user_id: int):
     try:
         user = User.objects.get(id=user_id)
@@ -116,8 +135,9 @@ class MechanicOut(Schema):
     last_name: str
     email: Optional[str]
     phone: Optional[str]
-    hire_date: Optional[str]
+    hire_date: Optional[date]
     is_active: bool
+    capacity_hours: float
 
 class MechanicCreate(Schema):
     first_name: str
@@ -126,6 +146,7 @@ class MechanicCreate(Schema):
     phone: Optional[str]
     hire_date: Optional[str]
     is_active: bool
+    capacity_hours: float = 40
 
 class MechanicUpdate(Schema):
     first_name: Optional[str] = None
@@ -134,6 +155,7 @@ class MechanicUpdate(Schema):
     phone: Optional[str] = None
     hire_date: Optional[str] = None
     is_active: Optional[bool] = None
+    capacity_hours: Optional[float] = None
 
 # Part
 class PartOut(Schema):
@@ -164,16 +186,19 @@ class ServiceOut(Schema):
     name: str
     description: Optional[str]
     price: float
+    estimated_hours: float
 
 class ServiceCreate(Schema):
     name: str
     description: Optional[str]
     price: float
+    estimated_hours: float = 1
 
 class ServiceUpdate(Schema):
     name: Optional[str] = None
     description: Optional[str] = None
     price: Optional[float] = None
+    estimated_hours: Optional[float] = None
 
 # Order
 class OrderOut(Schema):
@@ -181,9 +206,12 @@ class OrderOut(Schema):
     customer_id: int
     vehicle_id: int
     mechanic_id: Optional[int]
-    order_date: str
+    order_date: datetime
     description: Optional[str]
     is_closed: bool
+    total_amount: float
+    current_status: Optional[str]
+    status_changed_at: Optional[datetime]
 
 class OrderCreate(Schema):
     customer_id: int
@@ -204,7 +232,7 @@ class OrderStatusOut(Schema):
     id: int
     order_id: int
     status: str
-    timestamp: str
+    timestamp: datetime
     note: Optional[str]
 
 class OrderStatusCreate(Schema):
@@ -238,6 +266,7 @@ class OrderPartOut(Schema):
     order_id: int
     part_id: int
     quantity: int
+    reserved_quantity: int
 
 class OrderPartCreate(Schema):
     order_id: int
@@ -251,15 +280,17 @@ class OrderPartUpdate(Schema):
 class InvoiceOut(Schema):
     id: int
     order_id: int
-    issue_date: str
-    due_date: str
+    issue_date: datetime
+    due_date: datetime
     total_amount: float
+    amount_paid: float
     is_paid: bool
+    paid_manually: bool
 
 class InvoiceCreate(Schema):
     order_id: int
     due_date: str
-    total_amount: float
+    total_amount: Optional[float] = None  # default: computed total of the order
     is_paid: bool
 
 class InvoiceUpdate(Schema):
@@ -271,7 +302,7 @@ class InvoiceUpdate(Schema):
 class PaymentOut(Schema):
     id: int
     invoice_id: int
-    payment_date: str
+    payment_date: datetime
     amount: float
     payment_method: str
     note: Optional[str]
@@ -291,7 +322,7 @@ class PaymentUpdate(Schema):
 class NotificationOut(Schema):
     id: int
     message: str
-    timestamp: str
+    timestamp: datetime
 
 class NotificationCreate(Schema):
     message: str
@@ -299,22 +330,163 @@ class NotificationCreate(Schema):
 class NotificationUpdate(Schema):
     message: Optional[str] = None
 
+# Aggregated order ("job card")
+class OrderServiceDetailOut(Schema):
+    id: int
+    quantity: int
+    service: ServiceOut
+
+class OrderPartDetailOut(Schema):
+    id: int
+    quantity: int
+    part: PartOut
+
+class InvoiceDetailOut(InvoiceOut):
+    payments: List[PaymentOut]
+
+class OrderFullOut(Schema):
+    id: int
+    order_date: datetime
+    description: Optional[str]
+    is_closed: bool
+    total_amount: float
+    current_status: Optional[str]
+    status_changed_at: Optional[datetime]
+    customer: CustomerOut
+    vehicle: VehicleOut
+    mechanic: Optional[MechanicOut]
+    statuses: List[OrderStatusOut]
+    services: List[OrderServiceDetailOut]
+    parts: List[OrderPartDetailOut]
+    invoice: Optional[InvoiceDetailOut] = None
+
+# Front desk search
+class SearchHitOut(Schema):
+    type: Literal["customer", "vehicle"]
+    id: int
+    label: str
+    detail: str
+    score: int
+    customer_id: Optional[int] = None  # owner of a vehicle hit
+
+# Reorder report
+class ReorderOut(Schema):
+    part_id: int
+    name: str
+    part_number: str
+    stock_quantity: int
+    consumed: int  # within the window
+    daily_consumption: float
+    days_left: float
+    reorder_quantity: int
+
+# Dashboard
+class MechanicWorkloadOut(Schema):
+    mechanic_id: int
+    name: str
+    open_orders: int
+
+class UnpaidInvoicesOut(Schema):
+    count: int
+    total: float
+    overdue_count: int
+    overdue_total: float
+
+class PartConsumptionOut(Schema):
+    part_id: int
+    name: str
+    quantity: int
+
+class DashboardDayOut(Schema):
+    day: date
+    revenue: float
+    payments: int
+    orders_received: int
+    orders_delivered: int
+    parts_used: int
+
+class DashboardOut(Schema):
+    start: date
+    end: date
+    open_orders_per_mechanic: List[MechanicWorkloadOut]
+    open_orders_per_status: Dict[str, int]
+    unpaid_invoices: UnpaidInvoicesOut
+    revenue: float
+    orders_delivered: int
+    average_turnaround_hours: Optional[float]
+    parts_consumption: List[PartConsumptionOut]
+    days: List[DashboardDayOut]
+
+# Workload
+class WorkloadOut(Schema):
+    id: int
+    first_name: str
+    last_name: str
+    open_orders: int
+    open_hours: float
+    capacity_hours: float
+    free_hours: float
+
+# Receivables
+class ReceivableOut(Schema):
+    id: int
+    order_id: int
+    customer_id: int
+    issue_date: datetime
+    due_date: datetime
+    total_amount: float
+    amount_paid: float
+    outstanding: float
+    bucket: str
+
+class ReceivablesSummaryOut(Schema):
+    invoices: int
+    outstanding: float
+    buckets: Dict[str, float]  # outstanding per aging bucket
+
+class CustomerReceivablesOut(Schema):
+    customer_id: int
+    name: str
+    invoices: int
+    outstanding: float
+    buckets: Dict[str, float]
+
+class TimelineEventOut(Schema):
+    timestamp: datetime
+    kind: Literal["order", "status", "part", "service", "invoice", "payment"]
+    id: int  # of the order, status, order part, order service, invoice or payment
+    order_id: int
+    vehicle_id: int
+    label: Optional[str]  # description, status, part or service name, open/paid, payment method
+    quantity: Optional[int]
+    amount: Optional[float]
+    note: Optional[str]
+
+class TimelinePageOut(Schema):
+    items: List[TimelineEventOut]
+    limit: int
+    next_cursor: Optional[str] = None
+
 ### API Endpoints ###
 
 # Helper function to convert queryset to list of schemas
 def queryset_to_schemas(queryset, SchemaClass):
-    return [SchemaClass.from_orm(item) for item in queryset]
+    # ninja validates the response once anyway; flat schemas skip the model instances
+    if isinstance(queryset, QuerySet) and is_flat(SchemaClass):
+        return list(queryset.values(*SchemaClass.model_fields))
+    return list(queryset)
 
 ### Customers ###
 @api.get("/customers", response=List[CustomerOut])
-def get_customers(request):
+@sparse_fields(CustomerOut)
+@paginate(CursorPagination)
+def get_customers(request, filters: CustomerFilter = Query(...)):
     """
-    Ruft eine Liste aller Kunden ab.
+    Ruft eine Liste aller Kunden ab, optional gefiltert nach E-Mail-Adresse.
     """
-    customers = Customer.objects.all()
-    return queryset_to_schemas(customers, CustomerOut)
+    return filters.apply(Customer.objects.all())
 
-@api.get("/customers/{customer_id}", response=CustomerOut)
+@api.get("/customers/{int:customer_id}", response=CustomerOut)
 def get_customer(request, customer_id: int):
     """
     Ruft einen bestimmten Kunden anhand seiner ID ab.
@@ -330,7 +502,7 @@ def create_customer(request, payload: CustomerCreate):
     customer = Customer.objects.create(**payload.dict())
     return Response(CustomerOut.from_orm(customer), status=201)
 
-@api.put("/customers/{customer_id}", response={200: CustomerOut, 404: dict})
+@api.put("/customers/{int:customer_id}", response={200: CustomerOut, 404: dict})
 def update_customer(request, customer_id: int, payload: CustomerUpdate):
     """
     Aktualisiert einen bestehenden Kunden.
@@ -341,7 +513,7 @@ def update_customer(request, customer_id: int, payload: CustomerUpdate):
     customer.save()
     return CustomerOut.from_orm(customer)
 
-@api.delete("/customers/{customer_id}", response={204: None, 404: dict})
+@api.delete("/customers/{int:customer_id}", response={204: None, 404: dict})
 def delete_customer(request, customer_id: int):
     """
     Löscht einen bestehenden Kunden.
@@ -352,14 +524,15 @@ def delete_customer(request, customer_id: int):
 
 ### Vehicles ###
 @api.get("/vehicles", response=List[VehicleOut])
-def get_vehicles(request):
+@sparse_fields(VehicleOut)
+@paginate(CursorPagination)
+def get_vehicles(request, filters: VehicleFilter = Query(...)):
     """
-    Ruft eine Liste aller Fahrzeuge ab.
+    Ruft eine Liste aller Fahrzeuge ab, optional gefiltert nach Kunde.
     """
-    vehicles = Vehicle.objects.all()
-    return queryset_to_schemas(vehicles, VehicleOut)
+    return filters.apply(Vehicle.objects.select_related("customer"))
 
-@api.get("/vehicles/{vehicle_id}", response=VehicleOut)
+@api.get("/vehicles/{int:vehicle_id}", response=VehicleOut)
 def get_vehicle(request, vehicle_id: int):
     """
     Ruft ein bestimmtes Fahrzeug anhand seiner ID ab.
@@ -376,7 +549,7 @@ def create_vehicle(request, payload: VehicleCreate):
     vehicle = Vehicle.objects.create(customer=customer, **payload.dict(exclude={"customer"}))
     return Response(VehicleOut.from_orm(vehicle), status=201)
 
-@api.put("/vehicles/{vehicle_id}", response={200: VehicleOut, 404: dict})
+@api.put("/vehicles/{int:vehicle_id}", response={200: VehicleOut, 404: dict})
 def update_vehicle(request, vehicle_id: int, payload: VehicleUpdate):
     """
     Aktualisiert ein bestehendes Fahrzeug.
@@ -393,7 +566,7 @@ def update_vehicle(request, vehicle_id: int, payload: VehicleUpdate):
     vehicle.save()
     return VehicleOut.from_orm(vehicle)
 
-@api.delete("/vehicles/{vehicle_id}", response={204: None, 404: dict})
+@api.delete("/vehicles/{int:vehicle_id}", response={204: None, 404: dict})
 def delete_vehicle(request, vehicle_id: int):
     """
     Löscht ein bestehendes Fahrzeug.
@@ -404,14 +577,16 @@ def delete_vehicle(request, vehicle_id: int):
 
 ### Mechanics ###
 @api.get("/mechanics", response=List[MechanicOut])
-def get_mechanics(request):
+@decorate_view(cache_catalog("mechanics"))
+@sparse_fields(MechanicOut)
+@paginate(CursorPagination)
+def get_mechanics(request, filters: MechanicFilter = Query(...)):
     """
-    Ruft eine Liste aller Mechaniker ab.
+    Ruft eine Liste aller Mechaniker ab, optional nur aktive oder inaktive.
     """
-    mechanics = Mechanic.objects.all()
-    return queryset_to_schemas(mechanics, MechanicOut)
+    return filters.apply(Mechanic.objects.all())
 
-@api.get("/mechanics/{mechanic_id}", response=MechanicOut)
+@api.get("/mechanics/{int:mechanic_id}", response=MechanicOut)
 def get_mechanic(request, mechanic_id: int):
     """
     Ruft einen bestimmten Mechaniker anhand seiner ID ab.
@@ -427,7 +602,7 @@ def create_mechanic(request, payload: MechanicCreate):
     mechanic = Mechanic.objects.create(**payload.dict())
     return Response(MechanicOut.from_orm(mechanic), status=201)
 
-@api.put("/mechanics/{mechanic_id}", response={200: MechanicOut, 404: dict})
+@api.put("/mechanics/{int:mechanic_id}", response={200: MechanicOut, 404: dict})
 def update_mechanic(request, mechanic_id: int, payload: MechanicUpdate):
     """
     Aktualisiert einen bestehenden Mechaniker.
@@ -438,7 +613,7 @@ def update_mechanic(request, mechanic_id: int, payload: MechanicUpdate):
     mechanic.save()
     return MechanicOut.from_orm(mechanic)
 
-@api.delete("/mechanics/{mechanic_id}", response={204: None, 404: dict})
+@api.delete("/mechanics/{int:mechanic_id}", response={204: None, 404: dict})
 def delete_mechanic(request, mechanic_id: int):
     """
     Löscht einen bestehenden Mechaniker.
@@ -449,14 +624,17 @@ def delete_mechanic(request, mechanic_id: int):
 
 ### Parts ###
 @api.get("/parts", response=List[PartOut])
+@decorate_view(cache_catalog("parts"))
+@sparse_fields(PartOut)
+@paginate(CursorPagination)
 def get_parts(request):
     """
     Ruft eine Liste aller Teile ab.
     """
-    parts = Part.objects.all()
-    return queryset_to_schemas(parts, PartOut)
+    return Part.objects.all()
 
-@api.get("/parts/{part_id}", response=PartOut)
+@api.get("/parts/{int:part_id}", response=PartOut)
+@decorate_view(cache_catalog("parts"))
 def get_part(request, part_id: int):
     """
     Ruft ein bestimmtes Teil anhand seiner ID ab.
@@ -472,7 +650,7 @@ def create_part(request, payload: PartCreate):
     part = Part.objects.create(**payload.dict())
     return Response(PartOut.from_orm(part), status=201)
 
-@api.put("/parts/{part_id}", response={200: PartOut, 404: dict})
+@api.put("/parts/{int:part_id}", response={200: PartOut, 404: dict})
 def update_part(request, part_id: int, payload: PartUpdate):
     """
     Aktualisiert ein bestehendes Teil.
@@ -483,7 +661,7 @@ def update_part(request, part_id: int, payload: PartUpdate):
     part.save()
     return PartOut.from_orm(part)
 
-@api.delete("/parts/{part_id}", response={204: None, 404: dict})
+@api.delete("/parts/{int:part_id}", response={204: None, 404: dict})
 def delete_part(request, part_id: int):
     """
     Löscht ein bestehendes Teil.
@@ -494,14 +672,17 @@ def delete_part(request, part_id: int):
 
 ### Services ###
 @api.get("/services", response=List[ServiceOut])
+@decorate_view(cache_catalog("services"))
+@sparse_fields(ServiceOut)
+@paginate(CursorPagination)
 def get_services(request):
     """
     Ruft eine Liste aller Dienstleistungen ab.
     """
-    services = Service.objects.all()
-    return queryset_to_schemas(services, ServiceOut)
+    return Service.objects.all()
 
-@api.get("/services/{service_id}", response=ServiceOut)
+@api.get("/services/{int:service_id}", response=ServiceOut)
+@decorate_view(cache_catalog("services"))
 def get_service(request, service_id: int):
     """
     Ruft eine bestimmte Dienstleistung anhand ihrer ID ab.
@@ -517,7 +698,7 @@ def create_service(request, payload: ServiceCreate):
     service = Service.objects.create(**payload.dict())
     return Response(ServiceOut.from_orm(service), status=201)
 
-@api.put("/services/{service_id}", response={200: ServiceOut, 404: dict})
+@api.put("/services/{int:service_id}", response={200: ServiceOut, 404: dict})
 def update_service(request, service_id: int, payload: ServiceUpdate):
     """
     Aktualisiert eine bestehende Dienstleistung.
@@ -528,7 +709,7 @@ def update_service(request, service_id: int, payload: ServiceUpdate):
     service.save()
     return ServiceOut.from_orm(service)
 
-@api.delete("/services/{service_id}", response={204: None, 404: dict})
+@api.delete("/services/{int:service_id}", response={204: None, 404: dict})
 def delete_service(request, service_id: int):
     """
     Löscht eine bestehende Dienstleistung.
@@ -539,14 +720,46 @@ def delete_service(request, service_id: int):
 
 ### Orders ###
 @api.get("/orders", response=List[OrderOut])
-def get_orders(request):
+@sparse_fields(OrderOut)
+@paginate(CursorPagination)
+def get_orders(request, filters: OrderFilter = Query(...)):
+    """
+    Ruft eine Liste aller Aufträge ab, optional gefiltert nach Kunde, Fahrzeug, Mechaniker, Abschluss,
+    aktuellem Status und Auftragsdatum und sortiert nach `ordering` (`id`, `order_date`).
     """
-    Ruft eine Liste aller Aufträge ab.
+    return filters.apply(Order.objects.all())
+
+def orders_with_details():
+    """
+    Loads orders together with everything shown on a job card in a fixed number
+    of queries (one join for the to-one relations, one per prefetched list),
+    independent of the number of line items.
     """
-    orders = Order.objects.all()
-    return queryset_to_schemas(orders, OrderOut)
+    return Order.objects.select_related(
+        "customer", "vehicle__customer", "mechanic", "invoice"
+    ).prefetch_related(
+        Prefetch("statuses", queryset=OrderStatus.objects.order_by("timestamp", "id")),
+        Prefetch("services", queryset=OrderService.objects.select_related("service")),
+        Prefetch("parts", queryset=OrderPart.objects.select_related("part")),
+        "invoice__payments",
+    )
 
-@api.get("/orders/{order_id}", response=OrderOut)
+@api.get("/orders/full", response=List[OrderFullOut])
+@paginate(CursorPagination)
+def get_orders_full(request):
+    """
+    Ruft alle Aufträge inklusive Kunde, Fahrzeug, Mechaniker, Statusverlauf, Positionen, Rechnung und Zahlungen ab.
+    """
+    return orders_with_details()
+
+@api.get("/orders/{int:order_id}/full", response=OrderFullOut)
+def get_order_full(request, order_id: int):
+    """
+    Ruft einen Auftrag inklusive Kunde, Fahrzeug, Mechaniker, Statusverlauf, Positionen, Rechnung und Zahlungen ab.
+    """
+    return get_object_or_404(orders_with_details(), id=order_id)
+
+@api.get("/orders/{int:order_id}", response=OrderOut)
 def get_order(request, order_id: int):
     """
     Ruft einen bestimmten Auftrag anhand seiner ID ab.
@@ -565,7 +778,7 @@ def create_order(request, payload: OrderCreate):
     order = Order.objects.create(customer=customer, vehicle=vehicle, mechanic=mechanic, **payload.dict(exclude={"customer_id", "vehicle_id", "mechanic_id"}))
     return Response(OrderOut.from_orm(order), status=201)
 
-@api.put("/orders/{order_id}", response={200: OrderOut, 404: dict})
+@api.put("/orders/{int:order_id}", response={200: OrderOut, 404: dict})
 def update_order(request, order_id: int, payload: OrderUpdate):
     """
     Aktualisiert einen bestehenden Auftrag.
@@ -590,7 +803,7 @@ def update_order(request, order_id: int, payload: OrderUpdate):
     order.save()
     return OrderOut.from_orm(order)
 
-@api.delete("/orders/{order_id}", response={204: None, 404: dict})
+@api.delete("/orders/{int:order_id}", response={204: None, 404: dict})
 def delete_order(request, order_id: int):
     """
     Löscht einen bestehenden Auftrag.
@@ -600,15 +813,33 @@ def delete_order(request, order_id: int):
     return Response(None, status=204)
 
 ### OrderStatuses ###
+def lock_orders(*order_ids):
+    """
+    Locks the orders whose status history is about to change, so concurrent
+    writes to the same order refresh its current status one after another.
+    """
+    list(Order.objects.select_for_update().filter(id__in=order_ids).order_by("id").values_list("id"))
+
+def save_status(orderstatus):
+    """
+    Saves a status; one that continues a cancelled order reserves its parts
+    again, which answers with a 400 if the stock no longer suffices.
+    """
+    try:
+        orderstatus.save()
+    except inventory.InsufficientStock as exc:
+        raise HttpError(400, "Insufficient stock: " + "; ".join(exc.messages))
+
 @api.get("/orderstatuses", response=List[OrderStatusOut])
-def get_orderstatuses(request):
+@sparse_fields(OrderStatusOut)
+@paginate(CursorPagination)
+def get_orderstatuses(request, filters: OrderStatusFilter = Query(...)):
     """
-    Ruft eine Liste aller Auftragsstatus ab.
+    Ruft eine Liste aller Auftragsstatus ab, optional gefiltert nach Auftrag und Status, sortierbar nach `timestamp`.
     """
-    orderstatuses = OrderStatus.objects.all()
-    return queryset_to_schemas(orderstatuses, OrderStatusOut)
+    return filters.apply(OrderStatus.objects.all())
 
-@api.get("/orderstatuses/{orderstatus_id}", response=OrderStatusOut)
+@api.get("/orderstatuses/{int:orderstatus_id}", response=OrderStatusOut)
 def get_orderstatus(request, orderstatus_id: int):
     """
     Ruft einen bestimmten Auftragsstatus anhand seiner ID ab.
@@ -617,20 +848,24 @@ def get_orderstatus(request, orderstatus_id: int):
     return OrderStatusOut.from_orm(orderstatus)
 
 @api.post("/orderstatuses", response={201: OrderStatusOut, 400: dict})
+@transaction.atomic
 def create_orderstatus(request, payload: OrderStatusCreate):
     """
     Erstellt einen neuen Auftragsstatus.
     """
-    order = get_object_or_404(Order, id=payload.order_id)
-    orderstatus = OrderStatus.objects.create(order=order, **payload.dict(exclude={"order_id"}))
+    order = get_object_or_404(Order.objects.select_for_update(), id=payload.order_id)
+    orderstatus = OrderStatus(order=order, **payload.dict(exclude={"order_id"}))
+    save_status(orderstatus)
     return Response(OrderStatusOut.from_orm(orderstatus), status=201)
 
-@api.put("/orderstatuses/{orderstatus_id}", response={200: OrderStatusOut, 404: dict})
+@api.put("/orderstatuses/{int:orderstatus_id}", response={200: OrderStatusOut, 400: dict, 404: dict})
+@transaction.atomic
 def update_orderstatus(request, orderstatus_id: int, payload: OrderStatusUpdate):
     """
     Aktualisiert einen bestehenden Auftragsstatus.
     """
     orderstatus = get_object_or_404(OrderStatus, id=orderstatus_id)
+    lock_orders(orderstatus.order_id, payload.order_id)
      # Ensure the order exists
     if payload.order_id is not None:
         order = get_object_or_404(Order, id=payload.order_id)
@@ -639,28 +874,31 @@ def update_orderstatus(request, orderstatus_id: int, payload: OrderStatusUpdate)
     for attr, value in payload.dict(exclude_unset=True, exclude={"order_id"}).items():
         setattr(orderstatus, attr, value)
 
-    orderstatus.save()
+    save_status(orderstatus)
     return OrderStatusOut.from_orm(orderstatus)
 
-@api.delete("/orderstatuses/{orderstatus_id}", response={204: None, 404: dict})
+@api.delete("/orderstatuses/{int:orderstatus_id}", response={204: None, 404: dict})
+@transaction.atomic
 def delete_orderstatus(request, orderstatus_id: int):
     """
     Löscht einen bestehenden Auftragsstatus.
     """
     orderstatus = get_object_or_404(OrderStatus, id=orderstatus_id)
+    lock_orders(orderstatus.order_id)
     orderstatus.delete()
     return Response(None, status=204)
 
 ### OrderServices ###
 @api.get("/orderservices", response=List[OrderServiceOut])
-def get_orderservices(request):
+@sparse_fields(OrderServiceOut)
+@paginate(CursorPagination)
+def get_orderservices(request, filters: OrderItemFilter = Query(...)):
     """
-    Ruft eine Liste aller Auftragsdienstleistungen ab.
+    Ruft eine Liste aller Auftragsdienstleistungen ab, optional gefiltert nach Auftrag.
     """
-    orderservices = OrderService.objects.all()
-    return queryset_to_schemas(orderservices, OrderServiceOut)
+    return filters.apply(OrderService.objects.all())
 
-@api.get("/orderservices/{orderservice_id}", response=OrderServiceOut)
+@api.get("/orderservices/{int:orderservice_id}", response=OrderServiceOut)
 def get_orderservice(request, orderservice_id: int):
     """
     Ruft eine bestimmte Auftragsdienstleistung anhand ihrer ID ab.
@@ -678,7 +916,7 @@ def create_orderservice(request, payload: OrderServiceCreate):
     orderservice = OrderService.objects.create(order=order, service=service, **payload.dict(exclude={"order_id", "service_id"}))
     return Response(OrderServiceOut.from_orm(orderservice), status=201)
 
-@api.put("/orderservices/{orderservice_id}", response={200: OrderServiceOut, 404: dict})
+@api.put("/orderservices/{int:orderservice_id}", response={200: OrderServiceOut, 404: dict})
 def update_orderservice(request, orderservice_id: int, payload: OrderServiceUpdate):
     """
     Aktualisiert eine bestehende Auftragsdienstleistung.
@@ -690,7 +928,7 @@ def update_orderservice(request, orderservice_id: int, payload: OrderServiceUpda
     orderservice.save()
     return OrderServiceOut.from_orm(orderservice)
 
-@api.delete("/orderservices/{orderservice_id}", response={204: None, 404: dict})
+@api.delete("/orderservices/{int:orderservice_id}", response={204: None, 404: dict})
 def delete_orderservice(request, orderservice_id: int):
     """
     Löscht eine bestehende Auftragsdienstleistung.
@@ -700,15 +938,28 @@ def delete_orderservice(request, orderservice_id: int):
     return Response(None, status=204)
 
 ### OrderParts ###
+def save_with_reservation(order_part):
+    """
+    Saves a line item together with the matching stock reservation, or answers
+    with a 400 if the part does not have enough free stock.
+    """
+    try:
+        with transaction.atomic():
+            inventory.reserve_line_items([order_part])
+            order_part.save()
+    except inventory.InsufficientStock as exc:
+        raise HttpError(400, "Insufficient stock: " + "; ".join(exc.messages))
+
 @api.get("/orderparts", response=List[OrderPartOut])
-def get_orderparts(request):
+@sparse_fields(OrderPartOut)
+@paginate(CursorPagination)
+def get_orderparts(request, filters: OrderPartFilter = Query(...)):
     """
-    Ruft eine Liste aller Auftragsbestandteile ab.
+    Ruft eine Liste aller Auftragsbestandteile ab, optional gefiltert nach Auftrag und Teil.
     """
-    orderparts = OrderPart.objects.all()
-    return queryset_to_schemas(orderparts, OrderPartOut)
+    return filters.apply(OrderPart.objects.all())
 
-@api.get("/orderparts/{orderpart_id}", response=OrderPartOut)
+@api.get("/orderparts/{int:orderpart_id}", response=OrderPartOut)
 def get_orderpart(request, orderpart_id: int):
     """
     Ruft einen bestimmten Auftragsbestandteil anhand seiner ID ab.
@@ -723,22 +974,24 @@ def create_orderpart(request, payload: OrderPartCreate):
     """
     order = get_object_or_404(Order, id=payload.order_id)
     part = get_object_or_404(Part, id=payload.part_id)
-    orderpart = OrderPart.objects.create(order=order, part=part, **payload.dict(exclude={"order_id", "part_id"}))
+    orderpart = OrderPart(order=order, part=part, **payload.dict(exclude={"order_id", "part_id"}))
+    save_with_reservation(orderpart)
     return Response(OrderPartOut.from_orm(orderpart), status=201)
 
-@api.put("/orderparts/{orderpart_id}", response={200: OrderPartOut, 404: dict})
+@api.put("/orderparts/{int:orderpart_id}", response={200: OrderPartOut, 400: dict, 404: dict})
+@transaction.atomic
 def update_orderpart(request, orderpart_id: int, payload: OrderPartUpdate):
     """
     Aktualisiert einen bestehenden Auftragsbestandteil.
     """
-    orderpart = get_object_or_404(OrderPart, id=orderpart_id)
+    orderpart = get_object_or_404(OrderPart.objects.select_for_update(), id=orderpart_id)
     for attr, value in payload.dict(exclude_unset=True).items():
         setattr(orderpart, attr, value)
 
-    orderpart.save()
+    save_with_reservation(orderpart)
     return OrderPartOut.from_orm(orderpart)
 
-@api.delete("/orderparts/{orderpart_id}", response={204: None, 404: dict})
+@api.delete("/orderparts/{int:orderpart_id}", response={204: None, 404: dict})
 def delete_orderpart(request, orderpart_id: int):
     """
     Löscht einen bestehenden Auftragsbestandteil.
@@ -749,14 +1002,15 @@ def delete_orderpart(request, orderpart_id: int):
 
 ### Invoices ###
 @api.get("/invoices", response=List[InvoiceOut])
-def get_invoices(request):
+@sparse_fields(InvoiceOut)
+@paginate(CursorPagination)
+def get_invoices(request, filters: InvoiceFilter = Query(...)):
     """
-    Ruft eine Liste aller Rechnungen ab.
+    Ruft eine Liste aller Rechnungen ab, optional gefiltert nach Zahlungsstatus und Fälligkeit, sortierbar nach `due_date`.
     """
-    invoices = Invoice.objects.all()
-    return queryset_to_schemas(invoices, InvoiceOut)
+    return filters.apply(Invoice.objects.all())
 
-@api.get("/invoices/{invoice_id}", response=InvoiceOut)
+@api.get("/invoices/{int:invoice_id}", response=InvoiceOut)
 def get_invoice(request, invoice_id: int):
     """
     Ruft eine bestimmte Rechnung anhand ihrer ID ab.
@@ -767,25 +1021,31 @@ def get_invoice(request, invoice_id: int):
 @api.post("/invoices", response={201: InvoiceOut, 400: dict})
 def create_invoice(request, payload: InvoiceCreate):
     """
-    Erstellt eine neue Rechnung.
+    Erstellt eine neue Rechnung. `is_paid: true` markiert sie als manuell bezahlt (wie mark_paid).
     """
     order = get_object_or_404(Order, id=payload.order_id)
-    invoice = Invoice.objects.create(order=order, **payload.dict(exclude={"order_id"}))
+    data = payload.dict(exclude={"order_id"})
+    invoice = Invoice(order=order, **data)
+    _prepare_invoice(invoice, data)
+    invoice.save()
     return Response(InvoiceOut.from_orm(invoice), status=201)
 
-@api.put("/invoices/{invoice_id}", response={200: InvoiceOut, 404: dict})
+@api.put("/invoices/{int:invoice_id}", response={200: InvoiceOut, 404: dict})
 def update_invoice(request, invoice_id: int, payload: InvoiceUpdate):
     """
-    Aktualisiert eine bestehende Rechnung.
+    Aktualisiert eine bestehende Rechnung. `is_paid: true` markiert sie als manuell bezahlt (wie mark_paid),
+    `is_paid: false` nimmt das zurück; danach richtet sich `is_paid` wieder nach den Zahlungen.
     """
     invoice = get_object_or_404(Invoice, id=invoice_id)
-    for attr, value in payload.dict(exclude_unset=True).items():
+    data = payload.dict(exclude_unset=True)
+    for attr, value in data.items():
         setattr(invoice, attr, value)
+    _prepare_invoice(invoice, data)
 
     invoice.save()
     return InvoiceOut.from_orm(invoice)
 
-@api.delete("/invoices/{invoice_id}", response={204: None, 404: dict})
+@api.delete("/invoices/{int:invoice_id}", response={204: None, 404: dict})
 def delete_invoice(request, invoice_id: int):
     """
     Löscht eine bestehende Rechnung.
@@ -796,14 +1056,15 @@ def delete_invoice(request, invoice_id: int):
 
 ### Payments ###
 @api.get("/payments", response=List[PaymentOut])
-def get_payments(request):
+@sparse_fields(PaymentOut)
+@paginate(CursorPagination)
+def get_payments(request, filters: PaymentFilter = Query(...)):
     """
-    Ruft eine Liste aller Zahlungen ab.
+    Ruft eine Liste aller Zahlungen ab, optional gefiltert nach Rechnung, Zahlungsart und Zeitraum, sortierbar nach `payment_date`.
     """
-    payments = Payment.objects.all()
-    return queryset_to_schemas(payments, PaymentOut)
+    return filters.apply(Payment.objects.all())
 
-@api.get("/payments/{payment_id}", response=PaymentOut)
+@api.get("/payments/{int:payment_id}", response=PaymentOut)
 def get_payment(request, payment_id: int):
     """
     Ruft eine bestimmte Zahlung anhand ihrer ID ab.
@@ -812,6 +1073,7 @@ def get_payment(request, payment_id: int):
     return PaymentOut.from_orm(payment)
 
 @api.post("/payments", response={201: PaymentOut, 400: dict})
+@transaction.atomic
 def create_payment(request, payload: PaymentCreate):
     """
     Erstellt eine neue Zahlung.
@@ -820,37 +1082,41 @@ def create_payment(request, payload: PaymentCreate):
     payment = Payment.objects.create(invoice=invoice, **payload.dict(exclude={"invoice_id"}))
     return Response(PaymentOut.from_orm(payment), status=201)
 
-@api.put("/payments/{payment_id}", response={200: PaymentOut, 404: dict})
+@api.put("/payments/{int:payment_id}", response={200: PaymentOut, 404: dict})
+@transaction.atomic
 def update_payment(request, payment_id: int, payload: PaymentUpdate):
     """
     Aktualisiert eine bestehende Zahlung.
     """
-    payment = get_object_or_404(Payment, id=payment_id)
+    # locked, so concurrent changes of the same payment are booked one after the other
+    payment = get_object_or_404(Payment.objects.select_for_update(), id=payment_id)
     for attr, value in payload.dict(exclude_unset=True).items():
         setattr(payment, attr, value)
 
     payment.save()
     return PaymentOut.from_orm(payment)
 
-@api.delete("/payments/{payment_id}", response={204: None, 404: dict})
+@api.delete("/payments/{int:payment_id}", response={204: None, 404: dict})
+@transaction.atomic
 def delete_payment(request, payment_id: int):
     """
     Löscht eine bestehende Zahlung.
     """
-    payment = get_object_or_404(Payment, id=payment_id)
+    payment = get_object_or_404(Payment.objects.select_for_update(), id=payment_id)
     payment.delete()
     return Response(None, status=204)
 
 ### Notifications ###
 @api.get("/notifications", response=List[NotificationOut])
-def get_notifications(request):
+@sparse_fields(NotificationOut)
+@paginate(CursorPagination)
+def get_notifications(request, filters: NotificationFilter = Query(...)):
     """
-    Ruft eine Liste aller Benachrichtigungen ab.
+    Ruft eine Liste aller Benachrichtigungen ab, optional nur die seit einem Zeitpunkt, sortierbar nach `timestamp`.
     """
-    notifications = Notification.objects.all()
-    return queryset_to_schemas(notifications, NotificationOut)
+    return filters.apply(Notification.objects.all())
 
-@api.get("/notifications/{notification_id}", response=NotificationOut)
+@api.get("/notifications/{int:notification_id}", response=NotificationOut)
 def get_notification(request, notification_id: int):
     """
     Ruft eine bestimmte Benachrichtigung anhand ihrer ID ab.
@@ -866,7 +1132,7 @@ def create_notification(request, payload: NotificationCreate):
     notification = Notification.objects.create(**payload.dict())
     return Response(NotificationOut.from_orm(notification), status=201)
 
-@api.put("/notifications/{notification_id}", response={200: NotificationOut, 404: dict})
+@api.put("/notifications/{int:notification_id}", response={200: NotificationOut, 404: dict})
 def update_notification(request, notification_id: int, payload: NotificationUpdate):
     """
     Aktualisiert eine bestehende Benachrichtigung.
@@ -878,7 +1144,7 @@ def update_notification(request, notification_id: int, payload: NotificationUpda
     notification.save()
     return NotificationOut.from_orm(notification)
 
-@api.delete("/notifications/{notification_id}", response={204: None, 404: dict})
+@api.delete("/notifications/{int:notification_id}", response={204: None, 404: dict})
 def delete_notification(request, notification_id: int):
     """
     Löscht eine bestehende Benachrichtigung.
@@ -889,7 +1155,7 @@ def delete_notification(request, notification_id: int):
 
 ### Spezielle Endpoints ###
 
-@api.get("/orders/{order_id}/statuses", response=List[OrderStatusOut])
+@api.get("/orders/{int:order_id}/statuses", response=List[OrderStatusOut])
 def get_order_statuses(request, order_id: int):
     """
     Ruft alle Status-Änderungen für einen bestimmten Auftrag ab.
@@ -898,16 +1164,16 @@ def get_order_statuses(request, order_id: int):
     statuses = OrderStatus.objects.filter(order=order)
     return queryset_to_schemas(statuses, OrderStatusOut)
 
-@api.get("/vehicles/customer/{customer_id}", response=List[VehicleOut])
+@api.get("/vehicles/customer/{int:customer_id}", response=List[VehicleOut])
 def get_vehicles_for_customer(request, customer_id: int):
     """
     Ruft alle Fahrzeuge eines bestimmten Kunden ab.
     """
     customer = get_object_or_404(Customer, id=customer_id)
-    vehicles = Vehicle.objects.filter(owner=customer)
+    vehicles = Vehicle.objects.filter(customer=customer).select_related("customer")
     return queryset_to_schemas(vehicles, VehicleOut)
 
-@api.get("/invoices/order/{order_id}", response=Optional[InvoiceOut])
+@api.get("/invoices/order/{int:order_id}", response=Optional[InvoiceOut])
 def get_invoice_for_order(request, order_id: int):
     """
     Ruft die Rechnung für einen bestimmten Auftrag ab (falls vorhanden).
@@ -920,16 +1186,35 @@ def get_invoice_for_order(request, order_id: int):
         return None  # Oder eine Fehlerantwort, je nach Bedarf
 
 @api.get("/parts/search", response=List[PartOut])
-def search_parts(request, query: str):
+def search_parts(request, query: str, limit: int = Query(20, ge=1, le=100)):
     """
-    Sucht Teile anhand des Namens oder der Teilenummer.
+    Sucht Teile anhand von Name, Teilenummer und Beschreibung, die besten Treffer zuerst.
+    Jedes Wort wird als Präfix gesucht, Teilenummern auch als Ganzes (z. B. "OF-12").
     """
-    parts = Part.objects.filter(
-        Q(name__icontains=query) | Q(part_number__icontains=query)
-    )
-    return queryset_to_schemas(parts, PartOut)
+    return queryset_to_schemas(search.search_parts(query, limit), PartOut)
+
+@api.get("/parts/reorder", response=List[ReorderOut])
+def get_reorder_report(
+    request,
+    window_days: int = Query(30, ge=1, le=365),
+    threshold_days: int = Query(14, ge=1, le=365),
+    cover_days: int = Query(30, ge=1, le=365),
+    limit: int = Query(100, ge=1, le=1000),
+):
+    """
+    Liefert die Teile, deren Bestand beim Verbrauch der letzten `window_days` Tage in weniger als `threshold_days`
+    Tagen aufgebraucht ist, die dringendsten zuerst, mit Vorschlag für die Nachbestellmenge (Bedarf für `cover_days` Tage).
+    """
+    return inventory.reorder_report(window_days, threshold_days, cover_days, limit)
+
+@api.get("/search", response=List[SearchHitOut])
+def search_customers_and_vehicles(request, query: str, limit: int = Query(20, ge=1, le=100)):
+    """
+    Sucht Kunden (Name, E-Mail, Telefon) und Fahrzeuge (FIN, Marke, Modell), die besten Treffer zuerst.
+    """
+    return search.lookup(query, limit)
 
-@api.post("/orders/{order_id}/add_service/{service_id}", response={201: OrderServiceOut, 404: dict})
+@api.post("/orders/{int:order_id}/add_service/{int:service_id}", response={201: OrderServiceOut, 404: dict})
 def add_service_to_order(request, order_id: int, service_id: int, quantity: int = 1):
     """
     Fügt eine Dienstleistung zu einem Auftrag hinzu.
@@ -939,23 +1224,24 @@ def add_service_to_order(request, order_id: int, service_id: int, quantity: int
     order_service = OrderService.objects.create(order=order, service=service, quantity=quantity)
     return Response(OrderServiceOut.from_orm(order_service), status=201)
 
-@api.post("/orders/{order_id}/add_part/{part_id}", response={201: OrderPartOut, 404: dict})
+@api.post("/orders/{int:order_id}/add_part/{int:part_id}", response={201: OrderPartOut, 400: dict, 404: dict})
 def add_part_to_order(request, order_id: int, part_id: int, quantity: int = 1):
     """
     Fügt ein Teil zu einem Auftrag hinzu.
     """
     order = get_object_or_404(Order, id=order_id)
     part = get_object_or_404(Part, id=part_id)
-    order_part = OrderPart.objects.create(order=order, part=part, quantity=quantity)
+    order_part = OrderPart(order=order, part=part, quantity=quantity)
+    save_with_reservation(order_part)
     return Response(OrderPartOut.from_orm(order_part), status=201)
 
-@api.put("/invoices/{invoice_id}/mark_paid", response={200: InvoiceOut, 404: dict})
+@api.put("/invoices/{int:invoice_id}/mark_paid", response={200: InvoiceOut, 404: dict})
 def mark_invoice_as_paid(request, invoice_id: int):
     """
-    Markiert eine Rechnung als bezahlt.
+    Markiert eine Rechnung als bezahlt, unabhängig von ihren Zahlungen (z. B. Abschreibung).
     """
     invoice = get_object_or_404(Invoice, id=invoice_id)
-    invoice.is_paid = True
+    settlement.mark_paid(invoice)
     invoice.save()
     return InvoiceOut.from_orm(invoice)
 
@@ -964,8 +1250,275 @@ def get_available_mechanics(request):
     """
     Ruft alle aktiven Mechaniker ab, die derzeit keinem Auftrag zugewiesen sind.  (Annahme: mechanic Feld in Order kann Null sein, wenn kein Mechaniker zugewiesen ist)
     """
-    # Finde Mechaniker, die nicht in einem noch offenen Auftrag sind
-    assigned_mechanic_ids = Order.objects.filter(is_closed=False, mechanic__isnull=False).values_list('mechanic_id', flat=True).distinct()
-    available_mechanics = Mechanic.objects.filter(is_active=True).exclude(id__in=assigned_mechanic_ids)
+    available_mechanics = Mechanic.objects.filter(is_active=True, open_orders=0)
     return queryset_to_schemas(available_mechanics, MechanicOut)
 
+@api.get("/mechanics/workload", response=List[WorkloadOut])
+def get_mechanic_workload(request):
+    """
+    Ruft die Auslastung aller aktiven Mechaniker ab: offene Aufträge, deren geschätzte Stunden und die freie Kapazität,
+    am wenigsten ausgelastete zuerst.
+    """
+    return workload.workload()
+
+@api.post("/orders/{int:order_id}/assign", response={200: OrderOut, 404: dict, 409: dict})
+@transaction.atomic
+def assign_order(request, order_id: int):
+    """
+    Weist einen offenen Auftrag ohne Mechaniker dem aktiven Mechaniker mit der geringsten Auslastung zu,
+    der noch Kapazität für die geschätzten Stunden des Auftrags hat.
+    """
+    order = get_object_or_404(Order.objects.select_for_update(), id=order_id)
+    if order.is_closed:
+        return Response({"detail": "Order is closed"}, status=409)
+    if order.mechanic_id is not None:
+        return Response({"detail": f"Order is already assigned to mechanic {order.mechanic_id}"}, status=409)
+    mechanic = workload.pick_mechanic(workload.order_hours(order.id))
+    if mechanic is None:
+        return Response({"detail": "No active mechanic has capacity for this order"}, status=409)
+    order.mechanic = mechanic
+    order.save()
+    return OrderOut.from_orm(order)
+
+### Dashboard ###
+@api.get("/dashboard", response=DashboardOut)
+def get_dashboard(request, days: int = Query(30, ge=1, le=3660)):
+    """
+    Liefert die Kennzahlen für das Werkstatt-Dashboard: offene Aufträge je Mechaniker und Status, offene Rechnungen,
+    Umsatz, Durchlaufzeit (received bis delivered) und Teileverbrauch der letzten `days` Tage inklusive Tageswerten.
+    """
+    return dashboard.dashboard(days)
+
+### Receivables ###
+@api.get("/receivables", response=List[ReceivableOut])
+@sparse_fields(ReceivableOut)
+@paginate(CursorPagination, ordering=("due_date", "id"))
+def get_receivables(request, filters: ReceivableFilter = Query(...)):
+    """
+    Ruft alle offenen Rechnungen mit Restbetrag ab, die am längsten fälligen zuerst, mit bereits gezahltem Betrag,
+    offenem Betrag und Altersklasse (`current`, `0_30`, `31_60`, `61_90`, `over_90` Tage überfällig).
+    """
+    return filters.apply(receivables.open_invoices())
+
+@api.get("/receivables/summary", response=ReceivablesSummaryOut)
+def get_receivables_summary(request):
+    """
+    Liefert die Summe aller offenen Beträge und ihre Verteilung auf die Altersklassen.
+    """
+    return receivables.aging_summary()
+
+@api.get("/receivables/customers", response=List[CustomerReceivablesOut])
+def get_receivables_per_customer(request, limit: int = Query(100, ge=1, le=1000)):
+    """
+    Liefert die offenen Beträge je Kunde und Altersklasse, die höchsten zuerst.
+    """
+    return receivables.aging_by_customer(limit=limit)
+
+### Timeline ###
+def timeline_page(scope, pagination):
+    cursor = None
+    if pagination.cursor:
+        values = decode_cursor(pagination.cursor)
+        try:
+            timestamp, kind, event_id = values
+            cursor = (parse_datetime(timestamp), kind, int(event_id))
+        except (TypeError, ValueError):
+            raise HttpError(400, "Invalid cursor")
+        if cursor[0] is None or kind not in timeline.KINDS:
+            raise HttpError(400, "Invalid cursor")
+
+    items = timeline.events(scope, pagination.limit + 1, cursor)
+    next_cursor = None
+    if len(items) > pagination.limit:
+        items = items[:pagination.limit]
+        next_cursor = encode_cursor([items[-1]["timestamp"], items[-1]["kind"], items[-1]["id"]])
+    return {"items": items, "limit": pagination.limit, "next_cursor": next_cursor}
+
+@api.get("/vehicles/{int:vehicle_id}/history", response=TimelinePageOut)
+def get_vehicle_history(request, vehicle_id: int, pagination: CursorPagination.Input = Query(...)):
+    """
+    Ruft die Servicehistorie eines Fahrzeugs ab, das Neueste zuerst: Aufträge, Statuswechsel, verbaute Teile,
+    Dienstleistungen, Rechnungen und Zahlungen. Weitere Seiten über `next_cursor`.
+    """
+    get_object_or_404(Vehicle.objects.only("id"), id=vehicle_id)
+    return timeline_page({"vehicle_id": vehicle_id}, pagination)
+
+@api.get("/customers/{int:customer_id}/timeline", response=TimelinePageOut)
+def get_customer_timeline(request, customer_id: int, pagination: CursorPagination.Input = Query(...)):
+    """
+    Ruft die Ereignisse aller Aufträge eines Kunden über alle seine Fahrzeuge ab, das Neueste zuerst.
+    Weitere Seiten über `next_cursor`.
+    """
+    get_object_or_404(Customer.objects.only("id"), id=customer_id)
+    return timeline_page({"customer_id": customer_id}, pagination)
+
+### Export ###
+
+# Rows fetched per round trip from the server-side cursor
+EXPORT_CHUNK_SIZE = 2000
+
+EXPORT_RESOURCES = {
+    "customers": (Customer.objects.all(), CustomerOut),
+    "vehicles": (Vehicle.objects.select_related("customer"), VehicleOut),
+    "mechanics": (Mechanic.objects.all(), MechanicOut),
+    "parts": (Part.objects.all(), PartOut),
+    "services": (Service.objects.all(), ServiceOut),
+    "orders": (Order.objects.all(), OrderOut),
+    "orderstatuses": (OrderStatus.objects.all(), OrderStatusOut),
+    "orderservices": (OrderService.objects.all(), OrderServiceOut),
+    "orderparts": (OrderPart.objects.all(), OrderPartOut),
+    "invoices": (Invoice.objects.all(), InvoiceOut),
+    "payments": (Payment.objects.all(), PaymentOut),
+    "notifications": (Notification.objects.all(), NotificationOut),
+}
+
+def stream_rows(queryset, SchemaClass, format):
+    """
+    Serializes a queryset row by row while it is read from a server-side cursor,
+    so memory stays flat regardless of the table size.
+    """
+    rows = queryset.order_by("id").iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    if format == "json":
+        yield "["
+    buffer = []
+    first = True
+    for item in rows:
+        line = SchemaClass.from_orm(item).model_dump_json()
+        if format == "json":
+            line = line if first else "," + line
+        else:
+            line += "\n"
+        first = False
+        buffer.append(line)
+        if len(buffer) >= 100:
+            yield "".join(buffer)
+            buffer = []
+    if buffer:
+        yield "".join(buffer)
+    if format == "json":
+        yield "]"
+
+@api.get("/export/{resource}")
+def export_resource(request, resource: str, format: Literal["ndjson", "json"] = "ndjson"):
+    """
+    Exportiert eine komplette Tabelle als Stream (NDJSON oder JSON-Array).
+    """
+    if resource not in EXPORT_RESOURCES:
+        return Response({"detail": f"Unknown resource {resource}"}, status=404)
+
+    queryset, SchemaClass = EXPORT_RESOURCES[resource]
+    # the rows are read after the view has returned, so fix the database routed to now (see routers.py)
+    queryset = queryset.using(queryset.db)
+    content_type = "application/x-ndjson" if format == "ndjson" else "application/json"
+    response = StreamingHttpResponse(stream_rows(queryset, SchemaClass, format), content_type=content_type)
+    response["Content-Disposition"] = f'attachment; filename="{resource}.{format}"'
+    return response
+
+### Bulk ###
+
+def _prepare_invoice(invoice, data):
+    if invoice.total_amount is None:
+        invoice.total_amount = invoice.order.total_amount
+    # an explicit is_paid marks the invoice paid by hand or takes that back
+    if data.get("is_paid") is not None:
+        settlement.mark_paid(invoice, data["is_paid"])
+        return ["paid_manually", "is_paid"]
+
+def _reserve_order_parts(order_parts):
+    inventory.reserve_line_items(order_parts)
+    return ["reserved_quantity", "consumed_quantity"]
+
+add_bulk_endpoints(api, "/customers", Customer, CustomerCreate, CustomerUpdate, CustomerOut)
+add_bulk_endpoints(api, "/vehicles", Vehicle, VehicleCreate, VehicleUpdate, VehicleOut)
+add_bulk_endpoints(api, "/mechanics", Mechanic, MechanicCreate, MechanicUpdate, MechanicOut)
+add_bulk_endpoints(api, "/parts", Part, PartCreate, PartUpdate, PartOut)
+add_bulk_endpoints(api, "/services", Service, ServiceCreate, ServiceUpdate, ServiceOut)
+add_bulk_endpoints(api, "/orders", Order, OrderCreate, OrderUpdate, OrderOut)
+add_bulk_endpoints(api, "/orderstatuses", OrderStatus, OrderStatusCreate, OrderStatusUpdate, OrderStatusOut)
+add_bulk_endpoints(api, "/orderservices", OrderService, OrderServiceCreate, OrderServiceUpdate, OrderServiceOut)
+add_bulk_endpoints(api, "/orderparts", OrderPart, OrderPartCreate, OrderPartUpdate, OrderPartOut, before_save=_reserve_order_parts)
+add_bulk_endpoints(api, "/invoices", Invoice, InvoiceCreate, InvoiceUpdate, InvoiceOut, prepare=_prepare_invoice)
+add_bulk_endpoints(api, "/payments", Payment, PaymentCreate, PaymentUpdate, PaymentOut)
+add_bulk_endpoints(api, "/notifications", Notification, NotificationCreate, NotificationUpdate, NotificationOut)
+
+### Async ###
+
+add_async_read_endpoints(api, "/customers", Customer.objects.all(), CustomerOut)
+add_async_read_endpoints(api, "/vehicles", Vehicle.objects.select_related("customer"), VehicleOut)
+add_async_read_endpoints(api, "/mechanics", Mechanic.objects.all(), MechanicOut)
+add_async_read_endpoints(api, "/parts", Part.objects.all(), PartOut)
+add_async_read_endpoints(api, "/services", Service.objects.all(), ServiceOut)
+add_async_read_endpoints(api, "/orders", Order.objects.all(), OrderOut)
+add_async_read_endpoints(api, "/orderstatuses", OrderStatus.objects.all(), OrderStatusOut)
+add_async_read_endpoints(api, "/orderservices", OrderService.objects.all(), OrderServiceOut)
+add_async_read_endpoints(api, "/orderparts", OrderPart.objects.all(), OrderPartOut)
+add_async_read_endpoints(api, "/invoices", Invoice.objects.all(), InvoiceOut)
+add_async_read_endpoints(api, "/payments", Payment.objects.all(), PaymentOut)
+add_async_read_endpoints(api, "/notifications", Notification.objects.all(), NotificationOut)
+
+class OrderFullPage(Schema):
+    items: List[OrderFullOut]
+    limit: int
+    next_cursor: Optional[str] = None
+
+def job_card(order, statuses, services, parts, invoice, payments):
+    """
+    Builds the OrderFullOut payload from separately loaded rows.
+    """
+    related = {"customer", "vehicle", "mechanic", "statuses", "services", "parts", "invoice"}
+    card = {name: getattr(order, name) for name in OrderFullOut.model_fields if name not in related}
+    card.update(customer=order.customer, vehicle=order.vehicle, mechanic=order.mechanic,
+                statuses=statuses, services=services, parts=parts, invoice=None)
+    if invoice is not None:
+        card["invoice"] = {name: getattr(invoice, name) for name in InvoiceOut.model_fields}
+        card["invoice"]["payments"] = payments
+    return card
+
+def _group_by(rows, key):
+    groups = {}
+    for row in rows:
+        groups.setdefault(getattr(row, key), []).append(row)
+    return groups
+
+@api.get("/async/orders/{int:order_id}/full", response=OrderFullOut)
+async def async_get_order_full(request, order_id: int):
+    """
+    Wie /orders/{order_id}/full, die Teilabfragen laufen jedoch gleichzeitig.
+    """
+    order, statuses, services, parts, invoice, payments = await run_concurrently(
+        lambda: Order.objects.select_related("customer", "vehicle__customer", "mechanic").filter(id=order_id).first(),
+        lambda: list(OrderStatus.objects.filter(order_id=order_id).order_by("timestamp", "id")),
+        lambda: list(OrderService.objects.filter(order_id=order_id).select_related("service")),
+        lambda: list(OrderPart.objects.filter(order_id=order_id).select_related("part")),
+        lambda: Invoice.objects.filter(order_id=order_id).first(),
+        lambda: list(Payment.objects.filter(invoice__order_id=order_id)),
+    )
+    if order is None:
+        raise Http404
+    return job_card(order, statuses, services, parts, invoice, payments)
+
+@api.get("/async/orders/full", response=OrderFullPage)
+async def async_get_orders_full(request, pagination: CursorPagination.Input = Query(...)):
+    """
+    Wie /orders/full, die Teilabfragen einer Seite laufen jedoch gleichzeitig.
+    """
+    page = await akeyset_paginate(
+        Order.objects.select_related("customer", "vehicle__customer", "mechanic"),
+        ("id",), pagination.limit, pagination.cursor,
+    )
+    ids = [order.id for order in page["items"]]
+    statuses, services, parts, invoices, payments = await run_concurrently(
+        lambda: _group_by(OrderStatus.objects.filter(order_id__in=ids).order_by("timestamp", "id"), "order_id"),
+        lambda: _group_by(OrderService.objects.filter(order_id__in=ids).select_related("service"), "order_id"),
+        lambda: _group_by(OrderPart.objects.filter(order_id__in=ids).select_related("part"), "order_id"),
+        lambda: {invoice.order_id: invoice for invoice in Invoice.objects.filter(order_id__in=ids)},
+        lambda: _group_by(Payment.objects.filter(invoice__order_id__in=ids), "invoice_id"),
+    )
+    page["items"] = [
+        job_card(
+            order, statuses.get(order.id, []), services.get(order.id, []), parts.get(order.id, []),
+            invoices.get(order.id), payments.get(invoices[order.id].id, []) if order.id in invoices else [],
+        )
+        for order in page["items"]
+    ]
+    return page
@@ -12,5 +12,8 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'pitlanebackend.settings')
+# Each ASGI request runs its sync code in a thread of its own, so a persistent
+# connection would never be reused; DB_POOL is the way to reuse them here.
+os.environ.setdefault('DB_CONN_MAX_AGE', '0')
 
 application = get_asgi_application()
@@ -0,0 +1,78 @@
+"""
+Helpers for the async (ASGI-native) read endpoints under ``/async``.
+
+Django's async ORM methods (``aget``, ``async for``, ``acount``) run through
+one thread-sensitive worker per request, so awaiting several of them with
+``asyncio.gather`` still executes them one after another on one connection.
+With ``DB_POOL``, ``run_concurrently`` instead runs each query function in its
+own worker thread with a connection from the pool, so independent queries (an
+order, its statuses, its invoice, ...) really overlap. The queries do not share
+a transaction snapshot. The worker threads come from one executor of
+``ASYNC_DB_WORKERS`` threads, so all requests together never take more
+connections from the pool for it than that, and every query function hands its
+connection back when it is done.
+
+Without a pool every connection of a worker thread would have to be opened for
+a single query, which costs more than the overlap saves. The query functions
+then run one after another in the request's own thread and connection.
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import cache
+from typing import List
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.shortcuts import aget_object_or_404
+from ninja.pagination import paginate
+
+from .pagination import CursorPagination
+
+
+@cache
+def _executor():
+    return ThreadPoolExecutor(max_workers=settings.ASYNC_DB_WORKERS, thread_name_prefix="pitlane-async-db")
+
+
+def _with_pooled_connection(func):
+    def run():
+        try:
+            return func()
+        finally:
+            # back to the pool
+            connections.close_all()
+    return run
+
+
+async def run_concurrently(*funcs):
+    """
+    Runs sync query functions at the same time, at most ``ASYNC_DB_WORKERS``
+    across all requests, and returns their results in order. Without
+    ``DB_POOL`` they run one after another on the request's connection.
+    """
+    if not settings.DB_POOL:
+        return await sync_to_async(lambda: [func() for func in funcs])()
+    return await asyncio.gather(
+        *[sync_to_async(_with_pooled_connection(func), thread_sensitive=False, executor=_executor())() for func in funcs]
+    )
+
+
+def add_async_read_endpoints(api, path: str, queryset, out_schema):
+    """
+    Registers ``GET /async{path}`` (paginated) and ``GET /async{path}/{id}``.
+    ``queryset`` should select_related everything ``out_schema`` nests, since
+    lazy relation loads are not allowed in async code.
+    """
+    name = path.strip("/")
+
+    async def alist(request):
+        return queryset.all()
+
+    async def aget(request, item_id: int):
+        return await aget_object_or_404(queryset, id=item_id)
+
+    alist.__name__ = f"async_list_{name}"
+    aget.__name__ = f"async_get_{name}"
+    api.get(f"/async{path}", response=List[out_schema], operation_id=alist.__name__)(paginate(CursorPagination)(alist))
+    api.get(f"/async{path}/{{int:item_id}}", response=out_schema, operation_id=aget.__name__)(aget)
@@ -0,0 +1,259 @@
+"""
+Batch create/update/delete endpoints.
+
+``add_bulk_endpoints`` registers for one resource:
+
+    POST   /<resource>/bulk   body: [<Create>, ...]        -> 201 [<Out>, ...]
+    PATCH  /<resource>/bulk   body: [{"id": .., <Update>}] -> 200 [<Out>, ...]
+    DELETE /<resource>/bulk   body: {"ids": [..]}          -> 200 {"deleted": n}
+
+The whole payload is validated before anything is written. Foreign keys are
+resolved with one ``in_bulk`` per referenced model and unique columns are
+checked with one query per column. If any row is invalid nothing is written and
+the response is a 400 listing the errors per row; otherwise all rows are
+written with ``bulk_create``/``bulk_update`` in chunks inside one transaction.
+"""
+from collections import defaultdict
+from typing import List, Optional, Type
+
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, models, transaction
+from django.db.models.signals import post_save
+from ninja import Schema
+from ninja.responses import Response
+from pydantic import create_model
+
+from pitlane.signals import batched
+
+# Rows per INSERT/UPDATE statement
+BULK_BATCH_SIZE = 500
+
+
+class BulkError(Schema):
+    index: Optional[int]  # position in the payload, null for errors of the whole batch
+    detail: str
+
+
+class BulkErrors(Schema):
+    errors: List[BulkError]
+
+
+class BulkDelete(Schema):
+    ids: List[int]
+
+
+class BulkDeleted(Schema):
+    deleted: int
+
+
+def _model_field(model, name):
+    """Maps a payload key ("customer" or "customer_id") to the model field."""
+    for field in model._meta.concrete_fields:
+        if name in (field.name, field.attname):
+            return field
+    return None
+
+
+def _normalize(model, data):
+    # Optional text fields arrive as None but are stored as "" (NOT NULL columns)
+    for name, value in data.items():
+        field = _model_field(model, name)
+        if value is None and isinstance(field, (models.CharField, models.TextField)) and not field.null:
+            data[name] = ""
+    return data
+
+
+class _Validator:
+    def __init__(self, model, rows):
+        self.model = model
+        self.rows = rows
+        self.errors = defaultdict(list)
+
+    def error(self, index, detail):
+        self.errors[index].append(detail)
+
+    def resolve_foreign_keys(self):
+        """Replaces foreign key ids by instances, one in_bulk per referenced model."""
+        ids = defaultdict(set)
+        for data in self.rows:
+            for name, value in data.items():
+                field = _model_field(self.model, name)
+                if field is not None and field.is_relation and value is not None:
+                    ids[field].add(value)
+
+        instances = {field: field.related_model.objects.in_bulk(values) for field, values in ids.items()}
+
+        for index, data in enumerate(self.rows):
+            for name in list(data):
+                field = _model_field(self.model, name)
+                if field is None or not field.is_relation or data[name] is None:
+                    continue
+                value = data.pop(name)
+                related = instances[field].get(value)
+                if related is None:
+                    self.error(index, f"{name}: {field.related_model.__name__} with id {value} not found")
+                else:
+                    data[field.name] = related
+
+    def check_unique(self, exclude_ids=()):
+        """Checks unique columns against the payload itself and the table, one query per column."""
+        for field in self.model._meta.concrete_fields:
+            if not field.unique or field.primary_key:
+                continue
+            values = defaultdict(list)
+            for index, data in enumerate(self.rows):
+                if field.name in data:
+                    value = data[field.name]
+                    values[value.pk if isinstance(value, models.Model) else value].append(index)
+            if not values:
+                continue
+            taken = set(
+                self.model.objects.filter(**{f"{field.attname}__in": list(values)})
+                .exclude(id__in=exclude_ids)
+                .values_list(field.attname, flat=True)
+            )
+            for value, indexes in values.items():
+                if value in taken:
+                    for index in indexes:
+                        self.error(index, f"{field.name}: {value} already exists")
+                elif len(indexes) > 1:
+                    for index in indexes:
+                        self.error(index, f"{field.name}: {value} occurs more than once in the payload")
+
+    def clean(self, index, obj, names):
+        """Runs the model field validation (choices, lengths, formats) without queries."""
+        exclude = [field.name for field in self.model._meta.concrete_fields if field.name not in names or field.is_relation]
+        try:
+            obj.clean_fields(exclude=exclude)
+        except ValidationError as exc:
+            for name, messages in exc.message_dict.items():
+                for message in messages:
+                    self.error(index, f"{name}: {message}")
+
+    def response(self):
+        errors = [BulkError(index=index, detail=detail) for index in sorted(self.errors) for detail in self.errors[index]]
+        return Response(BulkErrors(errors=errors).dict(), status=400)
+
+
+def _integrity_error(exc):
+    return Response(BulkErrors(errors=[BulkError(index=None, detail=str(exc))]).dict(), status=400)
+
+
+def _batch_error(exc):
+    return Response(BulkErrors(errors=[BulkError(index=None, detail=message) for message in exc.messages]).dict(), status=400)
+
+
+def _send_post_save(model, objs, created):
+    for obj in objs:
+        post_save.send(sender=model, instance=obj, created=created, update_fields=None, raw=False, using=obj._state.db)
+
+
+def add_bulk_endpoints(api, path: str, model: Type[models.Model], create_schema: Type[Schema],
+                       update_schema: Type[Schema], out_schema: Type[Schema], prepare=None, before_save=None):
+    """
+    Registers POST/PATCH/DELETE ``{path}/bulk`` for ``model``.
+
+    ``prepare(obj, data)`` may fill in computed values on new and updated instances before they
+    are validated, given the payload of the row. It returns the names of further fields it set,
+    or None.
+    ``before_save(objs)`` runs in the write transaction right before the rows are written and
+    may raise ValidationError to abort the batch. It returns the names of the fields it set
+    on the instances (written by the update as well), or None.
+    """
+    name = path.strip("/")
+    update_row_schema = create_model(f"{update_schema.__name__}Row", __base__=update_schema, id=(int, ...))
+
+    def bulk_create(request, payload: List[create_schema]):
+        rows = [_normalize(model, row.dict()) for row in payload]
+        validator = _Validator(model, rows)
+        validator.resolve_foreign_keys()
+        validator.check_unique()
+
+        objs = []
+        for index, data in enumerate(rows):
+            obj = model(**data)
+            if prepare is not None and index not in validator.errors:
+                prepare(obj, data)
+            validator.clean(index, obj, data)
+            objs.append(obj)
+        if validator.errors:
+            return validator.response()
+
+        try:
+            with transaction.atomic(), batched():
+                if before_save is not None:
+                    before_save(objs)
+                objs = model.objects.bulk_create(objs, batch_size=BULK_BATCH_SIZE)
+                # bulk_create skips the signals that maintain denormalized data
+                _send_post_save(model, objs, created=True)
+        except IntegrityError as exc:
+            return _integrity_error(exc)
+        except ValidationError as exc:
+            return _batch_error(exc)
+        return Response([out_schema.from_orm(obj).dict() for obj in objs], status=201)
+
+    def bulk_update(request, payload: List[update_row_schema]):
+        rows = [_normalize(model, row.dict(exclude_unset=True)) for row in payload]
+        ids = [data.pop("id") for data in rows]
+        validator = _Validator(model, rows)
+
+        existing = model.objects.in_bulk(ids)
+        seen = set()
+        for index, pk in enumerate(ids):
+            if pk not in existing:
+                validator.error(index, f"id: {model.__name__} with id {pk} not found")
+            elif pk in seen:
+                validator.error(index, f"id: {pk} occurs more than once in the payload")
+            seen.add(pk)
+        validator.resolve_foreign_keys()
+        validator.check_unique(exclude_ids=ids)
+
+        objs, fields = [], set()
+        for index, (pk, data) in enumerate(zip(ids, rows)):
+            obj = existing.get(pk)
+            if obj is None:
+                continue
+            for attr, value in data.items():
+                setattr(obj, attr, value)
+            if prepare is not None and index not in validator.errors:
+                fields.update(prepare(obj, data) or ())
+            validator.clean(index, obj, data)
+            objs.append(obj)
+            fields.update(data)
+        if validator.errors:
+            return validator.response()
+
+        try:
+            with transaction.atomic(), batched():
+                if before_save is not None:
+                    fields.update(before_save(objs) or ())
+                if fields:
+                    model.objects.bulk_update(objs, sorted(fields), batch_size=BULK_BATCH_SIZE)
+                _send_post_save(model, objs, created=False)
+        except IntegrityError as exc:
+            return _integrity_error(exc)
+        except ValidationError as exc:
+            return _batch_error(exc)
+        return [out_schema.from_orm(obj).dict() for obj in objs]
+
+    def bulk_delete(request, payload: BulkDelete):
+        validator = _Validator(model, [])
+        found = set(model.objects.filter(id__in=payload.ids).values_list("id", flat=True))
+        for index, pk in enumerate(payload.ids):
+            if pk not in found:
+                validator.error(index, f"id: {model.__name__} with id {pk} not found")
+        if validator.errors:
+            return validator.response()
+
+        with transaction.atomic(), batched():
+            _, deleted = model.objects.filter(id__in=found).delete()
+        # the total also counts cascaded rows of other models
+        return {"deleted": deleted.get(model._meta.label, 0)}
+
+    for func, method, response in (
+        (bulk_create, api.post, {201: List[out_schema], 400: BulkErrors}),
+        (bulk_update, api.patch, {200: List[out_schema], 400: BulkErrors}),
+        (bulk_delete, api.delete, {200: BulkDeleted, 400: BulkErrors}),
+    ):
+        func.__name__ = f"{func.__name__}_{name}"
+        method(f"{path}/bulk", response=response, operation_id=func.__name__)(func)
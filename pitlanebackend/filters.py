@@ -0,0 +1,125 @@
+"""
+Filtering and ordering for the list endpoints.
+
+Every filter class turns its fields into query parameters and those into ORM
+lookups, combined with AND; parameters that are left out do not filter. Only
+columns with an index behind them are offered, so the database narrows the
+rows before pagination instead of the client after downloading all of them.
+
+``?ordering=-order_date`` sorts by one of the ``ordering_fields`` of the
+filter (a leading ``-`` sorts descending, the id is added as tie breaker).
+CursorPagination pages by the ordering of the queryset, so a ``next_cursor``
+is only valid together with the ordering and filters it was issued for:
+
+    @api.get("/orders", response=List[OrderOut])
+    @sparse_fields(OrderOut)
+    @paginate(CursorPagination)
+    def get_orders(request, filters: OrderFilter = Query(...)):
+        return filters.apply(Order.objects.all())
+"""
+from datetime import datetime
+from typing import ClassVar, List, Optional, Tuple
+
+from django.db.models import Q, QuerySet
+from ninja import Field, FilterSchema
+from ninja.errors import HttpError
+
+
+class ListFilter(FilterSchema):
+    ordering: Optional[str] = Field(None, description="Sort key, e.g. `-id`.")
+
+    # columns ?ordering= may sort by; all of them must be NOT NULL for keyset paging
+    ordering_fields: ClassVar[Tuple[str, ...]] = ("id",)
+
+    def filter_ordering(self, value: Optional[str]) -> Q:
+        return Q()  # applied by apply(), not as a filter
+
+    def order_by(self) -> List[str]:
+        if self.ordering is None:
+            return []
+        names = [name.strip() for name in self.ordering.split(",") if name.strip()]
+        unknown = [name for name in names if name.lstrip("-") not in self.ordering_fields]
+        if unknown or not names:
+            allowed = ", ".join(self.ordering_fields)
+            raise HttpError(400, f"ordering: unknown or not sortable {', '.join(unknown) or '(empty)'}; choose from {allowed}")
+        return names
+
+    def apply(self, queryset: QuerySet) -> QuerySet:
+        """Filters ``queryset`` and orders it by ``?ordering=`` if given."""
+        queryset = self.filter(queryset)
+        ordering = self.order_by()
+        return queryset.order_by(*ordering) if ordering else queryset
+
+
+class CustomerFilter(ListFilter):
+    email: Optional[str] = None
+
+    def filter_email(self, value: Optional[str]) -> Q:
+        # indexed lower-case copy, so the match ignores case
+        return Q(email_lower=value.lower()) if value else Q()
+
+
+class VehicleFilter(ListFilter):
+    customer_id: Optional[int] = None
+
+
+class MechanicFilter(ListFilter):
+    is_active: Optional[bool] = None
+
+
+class OrderFilter(ListFilter):
+    customer_id: Optional[int] = None
+    vehicle_id: Optional[int] = None
+    mechanic_id: Optional[int] = None
+    is_closed: Optional[bool] = None
+    status: Optional[str] = Field(None, q="current_status")
+    order_date_from: Optional[datetime] = Field(None, q="order_date__gte")
+    order_date_to: Optional[datetime] = Field(None, q="order_date__lt")
+
+    ordering_fields: ClassVar[Tuple[str, ...]] = ("id", "order_date")
+
+
+class OrderStatusFilter(ListFilter):
+    order_id: Optional[int] = None
+    status: Optional[str] = None
+
+    ordering_fields: ClassVar[Tuple[str, ...]] = ("id", "timestamp")
+
+
+class OrderItemFilter(ListFilter):
+    order_id: Optional[int] = None
+
+
+class OrderPartFilter(OrderItemFilter):
+    part_id: Optional[int] = None
+
+
+class InvoiceFilter(ListFilter):
+    order_id: Optional[int] = None
+    is_paid: Optional[bool] = None
+    due_date_from: Optional[datetime] = Field(None, q="due_date__gte")
+    due_date_to: Optional[datetime] = Field(None, q="due_date__lt")
+
+    ordering_fields: ClassVar[Tuple[str, ...]] = ("id", "due_date")
+
+
+class PaymentFilter(ListFilter):
+    invoice_id: Optional[int] = None
+    payment_method: Optional[str] = None
+    payment_date_from: Optional[datetime] = Field(None, q="payment_date__gte")
+    payment_date_to: Optional[datetime] = Field(None, q="payment_date__lt")
+
+    ordering_fields: ClassVar[Tuple[str, ...]] = ("id", "payment_date")
+
+
+class ReceivableFilter(ListFilter):
+    customer_id: Optional[int] = Field(None, q="order__customer_id")
+    bucket: Optional[str] = None
+
+    ordering_fields: ClassVar[Tuple[str, ...]] = ("id", "due_date")
+
+
+class NotificationFilter(ListFilter):
+    since: Optional[datetime] = Field(None, q="timestamp__gte")
+
+    ordering_fields: ClassVar[Tuple[str, ...]] = ("id", "timestamp")
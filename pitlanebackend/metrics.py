@@ -0,0 +1,287 @@
+"""
+Per-route request metrics.
+
+``MetricsMiddleware`` measures every request: wall time, number and duration
+of the SQL queries, time spent encoding the response (reported by the
+renderer, see renderers.py) and response size. Queries are counted by an
+execute wrapper installed on every connection, which adds them to the
+recorder of the request in a context variable; the variable follows the
+request into the threads that run the queries of async views, so sync and
+async requests are measured alike. Each response carries the figures as a
+``Server-Timing`` header, so they show up in the browser's network panel:
+
+    Server-Timing: db;dur=12.4;desc="7 queries", serialize;dur=1.9, total;dur=18.0
+
+and they are aggregated per method and URL pattern into fixed-bucket
+histograms, served in the Prometheus text format by ``metrics_view`` at
+``/internal/metrics``. The p50/p95/p99 estimated from the buckets are included
+for reading the page by hand. Recording a request costs a few counters and
+one bisect per histogram under a lock, cheap enough to leave on.
+
+The figures live in the memory of the process: with several worker processes
+every worker reports its own, which Prometheus sums up when scraping them all.
+
+With ``METRICS_TOKEN`` set, the page requires it as a bearer token. Without
+one, only the addresses in ``METRICS_ALLOWED_IPS`` may read it, and requests
+carrying forwarding headers are refused: behind a reverse proxy on the same
+host every client would arrive from 127.0.0.1.
+"""
+import hmac
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse, HttpResponseForbidden
+
+# Upper bounds of the histogram buckets; larger values fall into +Inf
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class Histogram:
+    __slots__ = ("bounds", "counts", "sum")
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+    @property
+    def count(self):
+        return sum(self.counts)
+
+    def quantile(self, q):
+        """Estimates a quantile by interpolating inside its bucket, like Prometheus' histogram_quantile."""
+        rank = q * self.count
+        cumulative = 0
+        for i, count in enumerate(self.counts):
+            if count and cumulative + count >= rank:
+                if i == len(self.bounds):
+                    return self.bounds[-1]
+                lower = self.bounds[i - 1] if i else 0.0
+                return lower + (self.bounds[i] - lower) * (rank - cumulative) / count
+            cumulative += count
+        return None
+
+
+class RouteStats:
+    __slots__ = ("duration", "db", "queries", "serialize", "response_bytes", "statuses")
+
+    def __init__(self):
+        self.duration = Histogram(SECONDS_BUCKETS)
+        self.db = Histogram(SECONDS_BUCKETS)
+        self.queries = Histogram(QUERY_BUCKETS)
+        self.serialize = Histogram(SECONDS_BUCKETS)
+        self.response_bytes = 0
+        self.statuses = {}
+
+
+# name, RouteStats attribute, help text
+HISTOGRAMS = (
+    ("pitlane_http_request_duration_seconds", "duration", "Wall time of the request."),
+    ("pitlane_http_request_db_seconds", "db", "Time spent in SQL queries per request."),
+    ("pitlane_http_request_queries", "queries", "SQL queries per request."),
+    ("pitlane_http_response_serialize_seconds", "serialize", "Time spent encoding the response body."),
+)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"')
+
+
+def _labels(**labels):
+    return ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items())
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.routes = {}
+
+    def observe(self, method, route, status, duration, db, queries, serialize, size):
+        with self.lock:
+            stats = self.routes.get((method, route))
+            if stats is None:
+                stats = self.routes[method, route] = RouteStats()
+            stats.duration.observe(duration)
+            stats.db.observe(db)
+            stats.queries.observe(queries)
+            stats.serialize.observe(serialize)
+            stats.response_bytes += size
+            stats.statuses[status] = stats.statuses.get(status, 0) + 1
+
+    def reset(self):
+        with self.lock:
+            self.routes = {}
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format."""
+        with self.lock:
+            routes = sorted(self.routes.items())
+            lines = []
+            for name, attr, help_text in HISTOGRAMS:
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+                for (method, route), stats in routes:
+                    histogram = getattr(stats, attr)
+                    labels = _labels(method=method, route=route)
+                    cumulative = 0
+                    for bound, count in zip((*histogram.bounds, "+Inf"), histogram.counts):
+                        cumulative += count
+                        lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+                    lines.append(f"{name}_sum{{{labels}}} {_number(histogram.sum)}")
+                    lines.append(f"{name}_count{{{labels}}} {cumulative}")
+
+            name = "pitlane_http_request_duration_quantile_seconds"
+            lines += [f"# HELP {name} p50/p95/p99 of the request wall time, estimated from the histogram.", f"# TYPE {name} gauge"]
+            for (method, route), stats in routes:
+                for q in QUANTILES:
+                    lines.append(f"{name}{{{_labels(method=method, route=route, quantile=q)}}} {_number(stats.duration.quantile(q))}")
+
+            name = "pitlane_http_response_bytes_total"
+            lines += [f"# HELP {name} Bytes of response bodies, without streamed responses.", f"# TYPE {name} counter"]
+            for (method, route), stats in routes:
+                lines.append(f"{name}{{{_labels(method=method, route=route)}}} {stats.response_bytes}")
+
+            name = "pitlane_http_responses_total"
+            lines += [f"# HELP {name} Responses per status code.", f"# TYPE {name} counter"]
+            for (method, route), stats in routes:
+                for status, count in sorted(stats.statuses.items()):
+                    lines.append(f"{name}{{{_labels(method=method, route=route, status=status)}}} {count}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+
+class QueryRecorder:
+    """Counts the queries of a request and adds up their time."""
+
+    __slots__ = ("count", "time", "lock")
+
+    def __init__(self):
+        self.count = 0
+        self.time = 0.0
+        # the concurrent queries of an async view report from several threads
+        self.lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            with self.lock:
+                self.count += 1
+                self.time += elapsed
+
+
+# recorder of the current request, None outside of one
+_recorder = ContextVar("pitlane_query_recorder", default=None)
+
+
+def _record_query(execute, sql, params, many, context):
+    recorder = _recorder.get()
+    if recorder is None:
+        return execute(sql, params, many, context)
+    return recorder(execute, sql, params, many, context)
+
+
+def _install_recorder(connection, **kwargs):
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+connection_created.connect(_install_recorder)
+
+
+# anything else is counted as "OTHER", so clients cannot create label values at will
+METHODS = {"GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"}
+
+
+def _route(request):
+    match = getattr(request, "resolver_match", None)
+    return match.route if match is not None else "unmatched"
+
+
+class MetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        # connections opened before this module was imported
+        for connection in connections.all(initialized_only=True):
+            _install_recorder(connection)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        recorder = QueryRecorder()
+        token = _recorder.set(recorder)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _recorder.reset(token)
+        return self.observe(request, response, recorder, time.perf_counter() - start)
+
+    async def __acall__(self, request):
+        recorder = QueryRecorder()
+        token = _recorder.set(recorder)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _recorder.reset(token)
+        return self.observe(request, response, recorder, time.perf_counter() - start)
+
+    def observe(self, request, response, recorder, duration):
+        serialize = getattr(request, "render_time", 0.0)
+
+        response["Server-Timing"] = (
+            f'db;dur={recorder.time * 1000:.1f};desc="{recorder.count} queries", '
+            f"serialize;dur={serialize * 1000:.1f}, total;dur={duration * 1000:.1f}"
+        )
+        size = 0 if response.streaming else len(response.content)
+        method = request.method if request.method in METHODS else "OTHER"
+        registry.observe(method, _route(request), response.status_code, duration, recorder.time, recorder.count, serialize, size)
+        return response
+
+
+# set by reverse proxies; REMOTE_ADDR is then the proxy's address
+FORWARDED_HEADERS = ("HTTP_FORWARDED", "HTTP_X_FORWARDED_FOR", "HTTP_X_REAL_IP")
+
+
+def _may_read_metrics(request):
+    if settings.METRICS_TOKEN:
+        return hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {settings.METRICS_TOKEN}")
+    if any(header in request.META for header in FORWARDED_HEADERS):
+        return False
+    return request.META.get("REMOTE_ADDR") in settings.METRICS_ALLOWED_IPS
+
+
+def metrics_view(request):
+    """The aggregated metrics for Prometheus; see the module docstring for who may read them."""
+    if not _may_read_metrics(request):
+        return HttpResponseForbidden()
+    return HttpResponse(registry.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,200 @@
+"""
+Keyset (cursor) pagination for the list endpoints.
+
+Instead of skipping rows with OFFSET, every page continues right after the sort
+key of the last row of the previous page. The database can seek directly into
+the index that backs the ordering, so page N costs the same as page 1.
+
+Usage:
+
+    @api.get("/orders", response=List[OrderOut])
+    @paginate(CursorPagination)
+    def get_orders(request):
+        return Order.objects.all()
+
+    # or ordered by a timestamp with the primary key as tie breaker
+    @paginate(CursorPagination, ordering=("-timestamp", "-id"))
+
+A queryset that the view ordered itself is paged by that ordering instead.
+"""
+import base64
+import binascii
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from math import inf
+from typing import Any, List, Optional, Sequence, Tuple
+
+from django.core.exceptions import FieldError, ValidationError
+from django.db.models import Q, QuerySet
+from ninja import Field, Schema
+from ninja.conf import settings
+from ninja.errors import HttpError
+from ninja.pagination import AsyncPaginationBase
+
+
+def _to_json_value(value: Any) -> Any:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """
+    Packs the sort key of a row into an opaque, url-safe cursor string.
+    """
+    raw = json.dumps([_to_json_value(v) for v in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> List[Any]:
+    """
+    Reverses encode_cursor. Raises a 400 for tampered or foreign cursors.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except (ValueError, binascii.Error):
+        raise HttpError(400, "Invalid cursor")
+    if not isinstance(values, list):
+        raise HttpError(400, "Invalid cursor")
+    return values
+
+
+def parse_ordering(ordering: Sequence[str]) -> List[Tuple[str, bool]]:
+    """
+    Turns ("-timestamp", "id") into [("timestamp", True), ("id", False)].
+    The primary key is appended as tie breaker so the key is always unique.
+    """
+    keys = [(name.lstrip("-"), name.startswith("-")) for name in ordering]
+    names = {name for name, _ in keys}
+    if "id" not in names and "pk" not in names:
+        keys.append(("id", keys[-1][1] if keys else False))
+    return keys
+
+
+def keyset_filter(keys: List[Tuple[str, bool]], values: Sequence[Any]) -> Q:
+    """
+    Builds the "row comes after (v1, v2, ...)" predicate for the given keys:
+
+        k1 > v1 OR (k1 = v1 AND k2 > v2) OR ...
+
+    Descending keys use "<" instead of ">".
+    """
+    expression = Q()
+    for i, (name, descending) in enumerate(keys):
+        lookup = {keys[j][0]: values[j] for j in range(i)}
+        lookup[f"{name}__{'lt' if descending else 'gt'}"] = values[i]
+        expression |= Q(**lookup)
+    return expression
+
+
+def _row_value(row: Any, name: str) -> Any:
+    if isinstance(row, dict):
+        return row[name]
+    return getattr(row, name)
+
+
+def _page_queryset(queryset: QuerySet, keys: List[Tuple[str, bool]], limit: int, cursor: Optional[str],
+                   fields: Optional[Sequence[str]] = None) -> QuerySet:
+    queryset = queryset.order_by(*[f"-{name}" if desc else name for name, desc in keys])
+    if fields:
+        # only the selected columns, plus the sort key for the next cursor
+        try:
+            queryset = queryset.values(*dict.fromkeys([*fields, *[name for name, _ in keys]]))
+        except FieldError as exc:
+            raise HttpError(400, f"fields: {exc}")
+
+    if cursor:
+        values = decode_cursor(cursor)
+        if len(values) != len(keys):
+            raise HttpError(400, "Invalid cursor")
+        model = queryset.model
+        try:
+            values = [
+                model._meta.pk.to_python(v) if name == "pk" else model._meta.get_field(name).to_python(v)
+                for (name, _), v in zip(keys, values)
+            ]
+        except (ValidationError, TypeError, ValueError):
+            # to_python lets some wrongly typed values through as TypeError/ValueError
+            raise HttpError(400, "Invalid cursor")
+        # sort keys are never NULL in a cursor we issued, and NULL cannot be compared
+        if any(v is None for v in values):
+            raise HttpError(400, "Invalid cursor")
+        queryset = queryset.filter(keyset_filter(keys, values))
+
+    # one extra row tells us whether there is a next page without a COUNT(*)
+    return queryset[: limit + 1]
+
+
+def _page(items: List[Any], keys: List[Tuple[str, bool]], limit: int) -> dict:
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        next_cursor = encode_cursor([_row_value(items[-1], name) for name, _ in keys])
+    return {"items": items, "limit": limit, "next_cursor": next_cursor}
+
+
+def keyset_paginate(queryset: QuerySet, ordering: Sequence[str], limit: int, cursor: Optional[str] = None,
+                    fields: Optional[Sequence[str]] = None) -> dict:
+    """
+    Returns one page of ``queryset`` plus the cursor pointing at the next page.
+    With ``fields`` the items are dicts holding only these columns (and the sort key).
+    """
+    keys = parse_ordering(ordering)
+    return _page(list(_page_queryset(queryset, keys, limit, cursor, fields)), keys, limit)
+
+
+async def akeyset_paginate(queryset: QuerySet, ordering: Sequence[str], limit: int, cursor: Optional[str] = None,
+                           fields: Optional[Sequence[str]] = None) -> dict:
+    """
+    Async variant of keyset_paginate.
+    """
+    keys = parse_ordering(ordering)
+    return _page([item async for item in _page_queryset(queryset, keys, limit, cursor, fields)], keys, limit)
+
+
+class CursorPagination(AsyncPaginationBase):
+    """
+    Ninja paginator that pages by keyset instead of OFFSET.
+
+    The response carries ``limit`` and ``next_cursor``; pass ``next_cursor`` back
+    as ``?cursor=`` to get the following page. ``next_cursor`` is null on the
+    last page.
+    """
+
+    class Input(Schema):
+        limit: int = Field(
+            settings.PAGINATION_PER_PAGE,
+            ge=1,
+            le=(
+                settings.PAGINATION_MAX_LIMIT
+                if settings.PAGINATION_MAX_LIMIT != inf
+                else None
+            ),
+        )
+        cursor: Optional[str] = None
+
+    class Output(Schema):
+        items: List[Any]
+        limit: int
+        next_cursor: Optional[str] = None
+
+    def __init__(self, ordering: Sequence[str] = ("id",), **kwargs: Any) -> None:
+        self.ordering = tuple(ordering)
+        super().__init__(**kwargs)
+
+    def get_ordering(self, queryset: QuerySet) -> Sequence[str]:
+        # an explicit order_by of the view (e.g. ?ordering= from filters.py) wins
+        return queryset.query.order_by or self.ordering
+
+    def paginate_queryset(self, queryset: QuerySet, pagination: Input, **params: Any) -> Any:
+        # sparse_fields (fields.py) asks for a subset of the columns through the request
+        fields = getattr(params.get("request"), "sparse_fields", None)
+        return keyset_paginate(queryset, self.get_ordering(queryset), pagination.limit, pagination.cursor, fields)
+
+    async def apaginate_queryset(self, queryset: QuerySet, pagination: Input, **params: Any) -> Any:
+        fields = getattr(params.get("request"), "sparse_fields", None)
+        return await akeyset_paginate(queryset, self.get_ordering(queryset), pagination.limit, pagination.cursor, fields)
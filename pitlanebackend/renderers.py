@@ -0,0 +1,66 @@
+"""
+JSON rendering for the API.
+
+``orjson`` is an optional dependency. When it is installed, ``renderer`` encodes
+the responses with it; otherwise it falls back to ninja's ``JSONRenderer``.
+Both produce the same JSON apart from whitespace. Datetimes, dates and Decimals
+are passed through to ``NinjaJSONEncoder``, so timestamps keep Django's
+millisecond format whichever encoder is used.
+
+The time spent encoding is added up in ``request.render_time`` for the
+request metrics (see metrics.py).
+"""
+import time
+from typing import Any
+
+from django.http import HttpResponse
+from ninja.renderers import BaseRenderer, JSONRenderer
+from ninja.responses import NinjaJSONEncoder
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is optional
+    orjson = None
+
+
+class ORJSONRenderer(BaseRenderer):
+    media_type = "application/json"
+
+    def __init__(self) -> None:
+        self.encoder = NinjaJSONEncoder()
+
+    def render(self, request, data: Any, *, response_status: int) -> bytes:
+        return orjson.dumps(
+            data,
+            default=self.encoder.default,
+            option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS,
+        )
+
+
+class TimedRenderer(BaseRenderer):
+    """Delegates to ``inner`` and records how long the encoding took."""
+
+    def __init__(self, inner: BaseRenderer) -> None:
+        self.inner = inner
+        self.media_type = inner.media_type
+        self.charset = inner.charset
+
+    def render(self, request, data: Any, *, response_status: int) -> Any:
+        start = time.perf_counter()
+        try:
+            return self.inner.render(request, data, response_status=response_status)
+        finally:
+            if request is not None:
+                request.render_time = getattr(request, "render_time", 0.0) + time.perf_counter() - start
+
+
+renderer = TimedRenderer(ORJSONRenderer() if orjson is not None else JSONRenderer())
+
+
+def render_response(request, data: Any, status: int = 200) -> HttpResponse:
+    """Renders ``data`` like the API renders a view's return value, minus the validation."""
+    return HttpResponse(
+        renderer.render(request, data, response_status=status),
+        status=status,
+        content_type=f"{renderer.media_type}; charset={renderer.charset}",
+    )
@@ -0,0 +1,88 @@
+"""
+Read replica routing.
+
+When a replica is configured (``READ_REPLICA``, see settings.py),
+``ReplicaMiddleware`` marks the requests with a safe method (GET, HEAD,
+OPTIONS) and ``ReplicaRouter`` sends their reads to the replica. Writes, and
+reads inside a transaction, always go to ``default``.
+
+A replica lags behind by a moment, so a client that has just written would
+not find its own change. The response to a POST/PUT/PATCH/DELETE therefore
+sets a cookie that expires after ``READ_REPLICA_STICKY_SECONDS``; while the
+client sends it back, its reads go to ``default``. The pin belongs to the
+client alone, also behind a shared proxy address, and needs no shared state
+between worker processes. A client that drops cookies reads from the replica
+right away.
+"""
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS, connections
+
+SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+# set after a write; reads go to default while the client sends it back
+PIN_COOKIE = "pitlane_replica_pin"
+
+# alias to read from in the current request, None for default
+_read_alias = ContextVar("pitlane_read_alias", default=None)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        alias = _read_alias.get()
+        if alias is None or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return None
+        return alias
+
+    def db_for_write(self, model, **hints):
+        # explicit, or Django would write an instance back to the database it was read from
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # the replica holds the same rows as default
+        return True
+
+
+class ReplicaMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.READ_REPLICA:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if request.method not in SAFE_METHODS:
+            return self.pin(self.get_response(request))
+
+        if PIN_COOKIE in request.COOKIES:
+            return self.get_response(request)
+        token = _read_alias.set(settings.READ_REPLICA)
+        try:
+            return self.get_response(request)
+        finally:
+            _read_alias.reset(token)
+
+    async def __acall__(self, request):
+        if request.method not in SAFE_METHODS:
+            return self.pin(await self.get_response(request))
+
+        if PIN_COOKIE in request.COOKIES:
+            return await self.get_response(request)
+        token = _read_alias.set(settings.READ_REPLICA)
+        try:
+            return await self.get_response(request)
+        finally:
+            _read_alias.reset(token)
+
+    def pin(self, response):
+        response.set_cookie(PIN_COOKIE, "1", max_age=settings.READ_REPLICA_STICKY_SECONDS, httponly=True, samesite="Lax")
+        return response
@@ -50,6 +50,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # first, so the timings cover the other middleware as well
+    'pitlanebackend.metrics.MetricsMiddleware',
+    'pitlanebackend.routers.ReplicaMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -64,6 +67,17 @@ CORS_ALLOWED_ORIGINS = [
     "http://localhost:5173"
 ]  
 
+# Keyset pagination of the list endpoints (see pitlanebackend/pagination.py)
+NINJA_PAGINATION_PER_PAGE = env.int('PAGINATION_PER_PAGE', default=100)
+NINJA_PAGINATION_MAX_LIMIT = env.int('PAGINATION_MAX_LIMIT', default=1000)
+
+# Request metrics: Server-Timing headers and /internal/metrics (see pitlanebackend/metrics.py)
+METRICS_ENABLED = env.bool('METRICS_ENABLED', default=True)
+# Bearer token required to read /internal/metrics; without one, only direct
+# (not proxied) requests from METRICS_ALLOWED_IPS, e.g. the Prometheus server
+METRICS_TOKEN = env('METRICS_TOKEN', default=None)
+METRICS_ALLOWED_IPS = env.list('METRICS_ALLOWED_IPS', default=['127.0.0.1', '::1'])
+
 ROOT_URLCONF = 'pitlanebackend.urls'
 
 TEMPLATES = [
@@ -87,17 +101,77 @@ WSGI_APPLICATION = 'pitlanebackend.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# Connections are kept open for DB_CONN_MAX_AGE seconds and reused by the
+# following requests of the same worker thread, after a health check when they
+# are reused. Under ASGI that never happens, so asgi.py turns persistent
+# connections off by default. DB_POOL=true uses psycopg 3's connection pool
+# instead, which needs `pip install "psycopg[binary,pool]"` in place of
+# psycopg2; under ASGI it is the way to reuse connections.
+DB_POOL = env.bool('DB_POOL', default=False)
+DB_POOL_MAX_SIZE = env.int('DB_POOL_MAX_SIZE', default=10)
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql_psycopg2',
+        'ENGINE': 'django.db.backends.postgresql',
         'NAME': env('DB_NAME'),
         'USER': env('DB_USER'),
         'PASSWORD': env('DB_PASSWORD'),
         'HOST': env('DB_HOST'),
-        'PORT': env('DB_PORT')
+        'PORT': env('DB_PORT'),
+        # persistent connections and the pool exclude each other
+        'CONN_MAX_AGE': 0 if DB_POOL else env.int('DB_CONN_MAX_AGE', default=60),
+        'CONN_HEALTH_CHECKS': env.bool('DB_CONN_HEALTH_CHECKS', default=True),
+        'OPTIONS': {
+            'pool': {
+                'min_size': env.int('DB_POOL_MIN_SIZE', default=2),
+                'max_size': DB_POOL_MAX_SIZE,
+                # seconds a request waits for a free connection before failing
+                'timeout': env.float('DB_POOL_TIMEOUT', default=10.0),
+            },
+        } if DB_POOL else {},
     }
 }
 
+# Threads running the concurrent queries of the /async endpoints with DB_POOL
+# (see pitlanebackend/async_reads.py), shared by all requests; each holds a
+# pooled connection while it runs. Half of the pool by default, the rest is
+# left for the other views.
+ASYNC_DB_WORKERS = env.int('ASYNC_DB_WORKERS', default=max(DB_POOL_MAX_SIZE // 2, 1))
+
+# Optional read replica (see pitlanebackend/routers.py): set DB_REPLICA_HOST
+# and/or DB_REPLICA_NAME; the other DB_REPLICA_* values default to the primary's.
+if env('DB_REPLICA_HOST', default=None) or env('DB_REPLICA_NAME', default=None):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'NAME': env('DB_REPLICA_NAME', default=DATABASES['default']['NAME']),
+        'USER': env('DB_REPLICA_USER', default=DATABASES['default']['USER']),
+        'PASSWORD': env('DB_REPLICA_PASSWORD', default=DATABASES['default']['PASSWORD']),
+        'HOST': env('DB_REPLICA_HOST', default=DATABASES['default']['HOST']),
+        'PORT': env('DB_REPLICA_PORT', default=DATABASES['default']['PORT']),
+        # tests run against default only
+        'TEST': {'MIRROR': 'default'},
+    }
+
+# Alias the reads of GET/HEAD/OPTIONS requests go to, None to read from default
+READ_REPLICA = 'replica' if 'replica' in DATABASES else None
+# Seconds a client reads from default after it has written
+READ_REPLICA_STICKY_SECONDS = env.int('DB_REPLICA_STICKY_SECONDS', default=5)
+
+DATABASE_ROUTERS = ['pitlanebackend.routers.ReplicaRouter']
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Local memory by default; use a shared backend in production, e.g.
+# CACHE_URL=redis://127.0.0.1:6379/1 or CACHE_URL=pymemcache://127.0.0.1:11211
+
+CACHES = {
+    'default': env.cache('CACHE_URL', default='locmemcache://pitlane')
+}
+
+# Seconds a cached catalog response (parts, services, mechanics) is kept at most
+CATALOG_CACHE_TIMEOUT = env.int('CATALOG_CACHE_TIMEOUT', default=60 * 60)
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
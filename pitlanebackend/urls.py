@@ -17,8 +17,10 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path
 from .api import api
+from .metrics import metrics_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path("api/", api.urls),
+    path("internal/metrics", metrics_view),
 ]